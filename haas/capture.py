@@ -0,0 +1,296 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2013-2014 Simon Jagoe
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the 3-clause BSD license.  See the LICENSE.txt file for details.
+from collections import deque
+import io
+import logging
+import os
+import sys
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+#: The default number of characters kept in memory from each of the
+#: start and the end of the output of a test.
+DEFAULT_BUFFER_LIMIT = 64 * 1024
+
+SPILL_LINE = '\n[... {0} characters omitted; full output in {1} ...]\n'
+
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        logger.warning('Unable to remove %r', path, exc_info=True)
+
+
+class CaptureBuffer(io.TextIOBase):
+    """A text stream capturing the output of a test, with bounded
+    memory use.
+
+    Up to ``limit`` characters from the start of the output are kept in
+    memory.  Once that is exceeded, the complete output is written to a
+    temporary spill file, and only the last ``limit`` characters are
+    kept in memory as well.  Spill files are removed when the buffer is
+    closed.
+
+    Parameters
+    ----------
+    limit : int
+        The number of characters kept in memory from each of the start
+        and the end of the output.
+
+    """
+
+    def __init__(self, limit=DEFAULT_BUFFER_LIMIT):
+        super(CaptureBuffer, self).__init__()
+        self.limit = limit
+        self._kept_spill_paths = []
+        self._clear()
+
+    def _clear(self):
+        self._head = []
+        self._head_length = 0
+        self._tail = deque()
+        self._tail_length = 0
+        self._length = 0
+        self._spill_file = None
+        self._spill_path = None
+        self._keep_spill_file = False
+
+    @property
+    def spill_path(self):
+        """The path of the spill file, or ``None`` if the output has
+        not exceeded the limit.
+
+        """
+        return self._spill_path
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        if not isinstance(text, str):
+            raise TypeError(
+                'string argument expected, got {0!r}'.format(
+                    type(text).__name__))
+        length = len(text)
+        self._length += length
+        if self._spill_file is None:
+            room = self.limit - self._head_length
+            if length <= room:
+                self._head.append(text)
+                self._head_length += length
+                return length
+            self._head.append(text[:room])
+            self._head_length = self.limit
+            self._start_spill()
+            text = text[room:]
+        self._spill_file.write(text)
+        self._add_tail(text)
+        return length
+
+    def _start_spill(self):
+        # NamedTemporaryFile only accepts errors from Python 3.8
+        fd, self._spill_path = tempfile.mkstemp(
+            prefix='haas-output-', suffix='.txt')
+        self._spill_file = io.TextIOWrapper(
+            os.fdopen(fd, 'wb'), encoding='utf-8', errors='backslashreplace')
+        logger.debug('Spilling test output to %r', self._spill_path)
+        self._spill_file.write(''.join(self._head))
+
+    def _add_tail(self, text):
+        if self.limit <= 0:
+            return
+        if len(text) > self.limit:
+            text = text[-self.limit:]
+        self._tail.append(text)
+        self._tail_length += len(text)
+        while self._tail_length - len(self._tail[0]) >= self.limit:
+            self._tail_length -= len(self._tail.popleft())
+
+    def getvalue(self):
+        """Return the captured output, with the middle replaced by a
+        note of the number of characters omitted and the path of the
+        spill file holding the complete output if it exceeded the limit.
+
+        The spill file is kept until the buffer is closed once its path
+        has been returned.
+
+        """
+        head = ''.join(self._head)
+        if self._spill_file is None:
+            return head
+        self._spill_file.flush()
+        self._keep_spill_file = True
+        tail = ''.join(self._tail)[-self.limit:] if self.limit > 0 else ''
+        omitted = self._length - len(head) - len(tail)
+        return head + SPILL_LINE.format(omitted, self.spill_path) + tail
+
+    def reset(self):
+        """Discard the captured output, removing the spill file unless
+        its path has been returned by :meth:`getvalue`.
+
+        """
+        spill_file = self._spill_file
+        spill_path = self._spill_path
+        keep_spill_file = self._keep_spill_file
+        self._clear()
+        if spill_file is not None:
+            spill_file.close()
+            if keep_spill_file:
+                self._kept_spill_paths.append(spill_path)
+            else:
+                _remove_file(spill_path)
+
+    def close(self):
+        """Discard the captured output and remove all spill files.
+
+        """
+        self.reset()
+        kept_spill_paths = self._kept_spill_paths
+        self._kept_spill_paths = []
+        for spill_path in kept_spill_paths:
+            _remove_file(spill_path)
+        super(CaptureBuffer, self).close()
+
+
+FD_SPILL_LINE = '\n[... {0} bytes omitted; full output in {1} ...]\n'
+
+
+def _flush_std_streams():
+    # Write out output buffered by Python before the file descriptors
+    # are redirected or read.
+    for stream in (sys.stdout, sys.stderr):
+        try:
+            stream.flush()
+        except (AttributeError, OSError, ValueError):
+            pass
+
+
+class FdCapture:
+    """Capture everything written to a file descriptor, including output
+    from C extensions and child processes, by redirecting it to a
+    temporary file with :func:`os.dup2`.
+
+    The captured output is only read back by :meth:`getvalue`, so output
+    that is never reported costs little more than writing it to disk.
+    The temporary files are removed when the capture is closed.
+
+    Parameters
+    ----------
+    fd : int
+        The file descriptor to capture, such as ``1`` for stdout.
+    limit : int
+        The number of bytes returned by :meth:`getvalue` from each of
+        the start and the end of the output.
+
+    """
+
+    def __init__(self, fd, limit=DEFAULT_BUFFER_LIMIT):
+        self.fd = fd
+        self.limit = limit
+        self._file = None
+        self._saved_fd = None
+        self._keep_file = False
+        self._kept_paths = []
+
+    @property
+    def path(self):
+        """The path of the temporary file holding the captured output.
+
+        """
+        if self._file is None:
+            return None
+        return self._file.name
+
+    @property
+    def is_started(self):
+        """``True`` while the file descriptor is being redirected.
+
+        """
+        return self._saved_fd is not None
+
+    def start(self):
+        """Start redirecting the file descriptor to the temporary file.
+
+        """
+        if self._file is None:
+            self._file = tempfile.NamedTemporaryFile(
+                prefix='haas-output-', suffix='.txt', delete=False)
+        _flush_std_streams()
+        self._saved_fd = os.dup(self.fd)
+        os.dup2(self._file.fileno(), self.fd)
+
+    def stop(self):
+        """Restore the file descriptor.
+
+        """
+        if self._saved_fd is None:
+            return
+        _flush_std_streams()
+        os.dup2(self._saved_fd, self.fd)
+        os.close(self._saved_fd)
+        self._saved_fd = None
+
+    def getvalue(self):
+        """Return the captured output, with the middle replaced by a
+        note of the number of bytes omitted and the path of the file
+        holding the complete output if it exceeds twice the limit.
+
+        The file is kept until the capture is closed once its path has
+        been returned.
+
+        """
+        if self._file is None:
+            return ''
+        _flush_std_streams()
+        # Read through a separate file object, as the file offset is
+        # shared with the redirected file descriptor.
+        with open(self._file.name, 'rb') as fh:
+            size = os.fstat(fh.fileno()).st_size
+            if size <= 2 * self.limit:
+                return fh.read().decode('utf-8', errors='replace')
+            head = fh.read(self.limit)
+            fh.seek(size - self.limit)
+            tail = fh.read()
+        self._keep_file = True
+        return '{0}{1}{2}'.format(
+            head.decode('utf-8', errors='replace'),
+            FD_SPILL_LINE.format(size - 2 * self.limit, self.path),
+            tail.decode('utf-8', errors='replace'))
+
+    def reset(self):
+        """Discard the captured output, keeping the temporary file only
+        if its path has been returned by :meth:`getvalue`.
+
+        """
+        if self._file is None:
+            return
+        if self._keep_file:
+            self._file.close()
+            self._kept_paths.append(self._file.name)
+            self._file = None
+            self._keep_file = False
+        else:
+            fileno = self._file.fileno()
+            os.ftruncate(fileno, 0)
+            os.lseek(fileno, 0, os.SEEK_SET)
+
+    def close(self):
+        """Restore the file descriptor and remove the temporary files.
+
+        """
+        self.stop()
+        if self._file is not None:
+            self._file.close()
+            _remove_file(self._file.name)
+            self._file = None
+            self._keep_file = False
+        kept_paths = self._kept_paths
+        self._kept_paths = []
+        for path in kept_paths:
+            _remove_file(path)
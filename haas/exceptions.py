@@ -16,3 +16,7 @@ class DotInModuleNameError(HaasException):
 
 class PluginError(HaasException):
     pass
+
+
+class ChangedFilesError(HaasException):
+    pass
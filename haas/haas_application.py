@@ -4,37 +4,123 @@
 #
 # This software may be modified and distributed under the terms
 # of the 3-clause BSD license.  See the LICENSE.txt file for details.
+from importlib import invalidate_caches
+from itertools import chain
 import argparse
 import os
+import sqlite3
+import sys
 
 import haas
+from .exceptions import ChangedFilesError
+from .history import DEFAULT_RUN_COUNT, HISTORY_FILENAME, HistoryDatabase
+from .import_graph import ImportGraph
 from .loader import Loader
 from .plugin_context import PluginContext
 from .plugin_manager import PluginManager
+from .plugins.discoverer import find_project_directory, match_path
+from .plugins.result_log import ResultLogReader
 from .result import ResultCollector
-from .utils import configure_logging
+from .selection import (
+    get_changed_files, get_changed_lines, get_listed_files,
+    select_changed_tests, select_covered_tests)
+from .suite import LazyTestSuite, TestSuite, group_by_fixture, unique_tests
+from .utils import CACHE_DIRECTORY, configure_logging
+from .watcher import create_watcher
 
 
 def create_argument_parser():
     """Creates the argument parser for haas.
 
     """
-    parser = argparse.ArgumentParser(prog='haas')
+    parser = argparse.ArgumentParser(
+        prog='haas',
+        epilog=('Use "haas replay FILE" to report the results written by '
+                '--result-log again, and "haas history" to query the '
+                'results recorded with --history'))
     parser.add_argument('--version', action='version',
                         version='%(prog)s {0}'.format(haas.__version__))
-    verbosity = parser.add_mutually_exclusive_group()
-    verbosity.add_argument('-v', '--verbose', action='store_const', default=1,
-                           dest='verbosity', const=2, help='Verbose output')
-    verbosity.add_argument('-q', '--quiet', action='store_const', const=0,
-                           dest='verbosity', help='Quiet output')
+    _add_verbosity_options(parser)
     parser.add_argument('-f', '--failfast', action='store_true', default=False,
                         help='Stop on first fail or error')
     parser.add_argument('-c', '--catch', dest='catch_interrupt',
                         action='store_true', default=False,
                         help=('(Ignored) Catch ctrl-C and display results so '
                               'far'))
-    parser.add_argument('-b', '--buffer', action='store_true', default=False,
+    parser.add_argument('-b', '--buffer', action='store_const', const='sys',
+                        default=False,
                         help='Buffer stdout and stderr during tests')
+    parser.add_argument('--buffer-mode', choices=['sys', 'fd'], default=None,
+                        help=('Buffer stdout and stderr during tests, by '
+                              'replacing sys.stdout and sys.stderr (sys), or '
+                              'by redirecting file descriptors 1 and 2 to '
+                              'capture output from C extensions and child '
+                              'processes too (fd).  Implies --buffer'))
+    parser.add_argument('--buffer-limit', type=int, default=64,
+                        metavar='KB',
+                        help=('Keep at most KB kilobytes from the start and '
+                              'from the end of the buffered output of each '
+                              'test in memory, writing the complete output '
+                              'to a temporary file if it is longer (default '
+                              '64)'))
+    parser.add_argument('--traceback-frames', type=int, default=100,
+                        metavar='N',
+                        help=('Show at most the N innermost frames of each '
+                              'traceback (default 100, 0 for no limit)'))
+    parser.add_argument('--traceback-size', type=int, default=64,
+                        metavar='KB',
+                        help=('Shorten each traceback, excluding buffered '
+                              'output, to at most KB kilobytes (default 64, '
+                              '0 for no limit)'))
+    parser.add_argument('--async-result-handlers', action='store_true',
+                        default=False,
+                        help=('Report results from a background thread, so '
+                              'that running tests does not wait for result '
+                              'handlers (not with --buffer-mode=fd)'))
+    parser.add_argument('--stream', action='store_true', default=False,
+                        help=('Start running tests while test discovery is '
+                              'still in progress'))
+    parser.add_argument('--no-imported-cases', action='store_false',
+                        default=True, dest='load_imported_cases',
+                        help=('Only load TestCase classes defined in the '
+                              'test module being loaded, not classes it '
+                              'imports'))
+    parser.add_argument('--lazy-test-cases', action='store_true',
+                        default=False,
+                        help=('Only create each TestCase instance when the '
+                              'test is run, and release it afterwards, to '
+                              'reduce memory use with very many tests'))
+    parser.add_argument('--release-tests', action='store_true',
+                        default=False,
+                        help=('Release each test from its suite once it has '
+                              'run, so that it can be garbage collected '
+                              'before the test run ends'))
+    parser.add_argument('--group-by-fixture', action='store_true',
+                        default=False,
+                        help=('Run the tests of each module, and of each '
+                              'class, together so that their fixtures are '
+                              'only set up once (not with --stream)'))
+    parser.add_argument('--watch', action='store_true', default=False,
+                        help=('Keep running, and re-run the tests affected '
+                              'by each change to the project source files'))
+    changed = parser.add_mutually_exclusive_group()
+    changed.add_argument('--changed-since', default=None, metavar='REVISION',
+                         help=('Only run tests in modules that import, '
+                               'directly or indirectly, a file changed since '
+                               'a git revision'))
+    changed.add_argument('--changed-files', default=None, metavar='FILES',
+                         help=('Only run tests in modules that import, '
+                               'directly or indirectly, one of a '
+                               'comma-separated list of files'))
+    parser.add_argument('--select-by', choices=['imports', 'coverage'],
+                        default='imports',
+                        help=('How --changed-since and --changed-files '
+                              'select tests: by the modules they import, or '
+                              'by the lines they executed when recorded with '
+                              '--coverage-test-contexts (default imports)'))
+    parser.add_argument('--coverage-data-file', default='.coverage',
+                        help=('Coverage data file with per-test contexts used '
+                              'by --select-by=coverage (default .coverage)'))
     parser.add_argument(
         'start', nargs='*', default=[os.getcwd()],
         help=('One or more directories or dotted package/module names from '
@@ -48,6 +134,66 @@ def create_argument_parser():
     return parser
 
 
+def create_replay_argument_parser():
+    """Creates the argument parser for ``haas replay``.
+
+    """
+    parser = argparse.ArgumentParser(
+        prog='haas replay',
+        description=('Report the test results written by --result-log '
+                     'again, without running the tests'))
+    _add_verbosity_options(parser)
+    parser.add_argument('result_log_file', metavar='FILE',
+                        help='The result log to replay')
+    _add_log_level_option(parser)
+    # Result handlers can tell replayed results from a test run
+    parser.set_defaults(replaying=True)
+    return parser
+
+
+def create_history_argument_parser():
+    """Creates the argument parser for ``haas history``.
+
+    """
+    parser = argparse.ArgumentParser(
+        prog='haas history',
+        description='Query the test results recorded with --history')
+    parser.add_argument('--db', default=None, metavar='FILE',
+                        help=('The history database (default '
+                              '.haas_cache/history.sqlite in the top-level '
+                              'directory)'))
+    parser.add_argument('-t', '--top-level-directory', default=None,
+                        help=('Top level directory of the project (default '
+                              'found from the current directory)'))
+    parser.add_argument('--runs', type=int, default=DEFAULT_RUN_COUNT,
+                        metavar='N',
+                        help=('Only consider the last N runs (default '
+                              '{0})'.format(DEFAULT_RUN_COUNT)))
+    queries = parser.add_subparsers(dest='query', metavar='QUERY')
+    queries.required = True
+    slowest = queries.add_parser(
+        'slowest', help='The tests with the longest mean duration')
+    slowest.add_argument('-n', '--count', type=int, default=10,
+                         help='The number of tests to show (default 10)')
+    queries.add_parser(
+        'flaky', help='The tests that both passed and failed')
+    trend = queries.add_parser(
+        'trend', help='The duration and status of a test in each run')
+    trend.add_argument('test_id', metavar='TEST_ID',
+                       help='The id of the test, e.g. package.module.'
+                            'TestCase.test_method')
+    _add_log_level_option(parser)
+    return parser
+
+
+def _add_verbosity_options(parser):
+    verbosity = parser.add_mutually_exclusive_group()
+    verbosity.add_argument('-v', '--verbose', action='store_const', default=1,
+                           dest='verbosity', const=2, help='Verbose output')
+    verbosity.add_argument('-q', '--quiet', action='store_const', const=0,
+                           dest='verbosity', help='Quiet output')
+
+
 def _create_log_level_parser():
     parser = argparse.ArgumentParser(prog='haas', add_help=False)
     _add_log_level_option(parser)
@@ -92,9 +238,22 @@ class HaasApplication:
         """
         if plugin_manager is None:
             plugin_manager = PluginManager()
+        if self.argv[1:2] == ['replay']:
+            return self._replay(plugin_manager)
+        if self.argv[1:2] == ['history']:
+            return self._history()
         plugin_manager.add_plugin_arguments(self.parser)
 
         args = self.parser.parse_args(self.argv[1:])
+        if args.buffer_mode is not None:
+            args.buffer = args.buffer_mode
+        if args.stream and args.group_by_fixture:
+            self.parser.error(
+                '--group-by-fixture cannot be used with --stream')
+        if args.async_result_handlers and args.buffer == 'fd':
+            self.parser.error(
+                '--async-result-handlers cannot be used with '
+                '--buffer-mode=fd')
 
         environment_plugins = plugin_manager.get_enabled_hook_plugins(
             plugin_manager.ENVIRONMENT_HOOK, args)
@@ -102,30 +261,240 @@ class HaasApplication:
             plugin_manager.TEST_RUNNER, args)
 
         with PluginContext(environment_plugins):
-            loader = Loader()
+            loader = Loader(load_imported_cases=args.load_imported_cases,
+                            lazy_test_cases=args.lazy_test_cases)
             discoverer = plugin_manager.get_driver(
                 plugin_manager.TEST_DISCOVERY, args, loader=loader)
-            suites = [
-                discoverer.discover(
-                    start=start,
-                    top_level_directory=args.top_level_directory,
-                    pattern=args.pattern,
-                )
-                for start in args.start
+            suites = self._discover(discoverer, args, args.start)
+            if args.changed_since is not None or \
+                    args.changed_files is not None:
+                try:
+                    suites = self._select_changed_tests(args, suites)
+                except ChangedFilesError as exc:
+                    self.parser.error(str(exc))
+            result = self._run_tests(
+                plugin_manager, args, runner, suites)
+            if args.watch:
+                result = self._watch(
+                    plugin_manager, args, runner, discoverer, result)
+            return not result.wasSuccessful()
+
+    def _replay(self, plugin_manager):
+        """Pass the results saved in a result log to the result
+        handlers, as if the tests had just been run.
+
+        """
+        parser = create_replay_argument_parser()
+        plugin_manager.add_hook_plugin_arguments(
+            plugin_manager.RESULT_HANDLERS, parser)
+        args = parser.parse_args(self.argv[2:])
+        try:
+            stream = open(args.result_log_file, encoding='utf-8')
+        except OSError as exc:
+            parser.error(str(exc))
+        with stream:
+            try:
+                reader = ResultLogReader(stream)
+            except ValueError as exc:
+                parser.error(str(exc))
+            result_handlers = plugin_manager.get_enabled_hook_plugins(
+                plugin_manager.RESULT_HANDLERS, args,
+                test_count=reader.test_count)
+            result_collector = ResultCollector()
+            for result_handler in result_handlers:
+                result_collector.add_result_handler(result_handler)
+            reader.replay(result_collector)
+        return not result_collector.wasSuccessful()
+
+    def _history(self, stream=None):
+        """Print the results of a query of the history database.
+
+        """
+        if stream is None:
+            stream = sys.stdout
+        parser = create_history_argument_parser()
+        args = parser.parse_args(self.argv[2:])
+        path = args.db
+        if path is None:
+            top_level_directory = find_project_directory(
+                args.top_level_directory, [os.getcwd()])
+            path = os.path.join(
+                top_level_directory, CACHE_DIRECTORY, HISTORY_FILENAME)
+        if not os.path.isfile(path):
+            parser.error('No history database at {0!r}'.format(path))
+        try:
+            database = HistoryDatabase(path)
+        except (ValueError, sqlite3.Error) as exc:
+            parser.error(str(exc))
+        with database:
+            if args.query == 'slowest':
+                for test_id, mean_duration, run_count in \
+                        database.get_slowest_tests(args.count, args.runs):
+                    stream.write('{0}  {1:>4} runs  {2}\n'.format(
+                        mean_duration, run_count, test_id))
+            elif args.query == 'flaky':
+                for test_id, passed, failed in \
+                        database.get_flaky_tests(args.runs):
+                    stream.write('{0:>4} passed  {1:>4} failed  {2}\n'.format(
+                        passed, failed, test_id))
+            else:
+                for run_id, start_time, status, duration in \
+                        database.get_duration_trend(args.test_id, args.runs):
+                    stream.write('{0:>6}  {1}  {2}  {3}\n'.format(
+                        run_id, start_time, duration, status.name))
+        return 0
+
+    def _discover(self, discoverer, args, starts):
+        return [
+            discoverer.discover(
+                start=start,
+                top_level_directory=args.top_level_directory,
+                pattern=args.pattern,
+            )
+            for start in starts
+        ]
+
+    def _select_changed_tests(self, args, suites):
+        top_level_directory = find_project_directory(
+            args.top_level_directory, args.start)
+        import_graph = ImportGraph(top_level_directory)
+        if args.select_by == 'coverage':
+            if args.changed_files is not None:
+                # Listed files are considered changed throughout
+                changed_lines = dict.fromkeys(
+                    get_listed_files(args.changed_files))
+            else:
+                changed_lines = get_changed_lines(
+                    args.changed_since, top_level_directory)
+            return [
+                select_covered_tests(
+                    suite, import_graph, changed_lines,
+                    args.coverage_data_file)
+                for suite in suites
             ]
+        if args.changed_files is not None:
+            changed_files = get_listed_files(args.changed_files)
+        else:
+            changed_files = get_changed_files(
+                args.changed_since, top_level_directory)
+        return [
+            select_changed_tests(suite, import_graph, changed_files)
+            for suite in suites
+        ]
+
+    def _run_tests(self, plugin_manager, args, runner, suites):
+        """Run the tests of the discovered suites.
+
+        The ``suites`` list is emptied as its suites are used, so that
+        it does not keep every test case alive while the tests run.
+
+        """
+        if args.stream:
+            # The number of tests is not known until discovery
+            # completes while running the tests.
+            test_count = None
+        else:
+            # Overlapping start paths and re-exported TestCase
+            # classes would otherwise run the same tests repeatedly.
             if len(suites) == 1:
-                suite = suites[0]
+                tests = unique_tests(suites[0])
             else:
-                suite = loader.create_suite(suites)
+                tests = unique_tests(suites)
+            if args.group_by_fixture:
+                tests = group_by_fixture(tests)
+            suite = TestSuite(tests, release_tests=args.release_tests)
+            del suites[:]
             test_count = suite.countTestCases()
-            result_handlers = plugin_manager.get_enabled_hook_plugins(
-                plugin_manager.RESULT_HANDLERS, args, test_count=test_count)
+        result_handlers = plugin_manager.get_enabled_hook_plugins(
+            plugin_manager.RESULT_HANDLERS, args, test_count=test_count)
 
-            result_collector = ResultCollector(
-                buffer=args.buffer, failfast=args.failfast)
+        result_collector = ResultCollector(
+            buffer=args.buffer, failfast=args.failfast,
+            buffer_limit=args.buffer_limit * 1024,
+            traceback_frame_limit=args.traceback_frames or None,
+            traceback_size_limit=args.traceback_size * 1024 or None,
+            async_handlers=args.async_result_handlers)
 
-            for result_handler in result_handlers:
-                result_collector.add_result_handler(result_handler)
+        for result_handler in result_handlers:
+            result_collector.add_result_handler(result_handler)
 
-            result = runner.run(result_collector, suite)
-            return not result.wasSuccessful()
+        if args.stream:
+            def on_complete(suite):
+                result_collector.update_test_count(
+                    suite.countTestCases())
+            suite = LazyTestSuite(
+                unique_tests(chain.from_iterable(_take_all(suites))),
+                on_complete=on_complete, release_tests=args.release_tests)
+
+        return runner.run(result_collector, suite)
+
+    def _watch(self, plugin_manager, args, runner, discoverer, result):
+        """Re-run the tests affected by each change to the project
+        source files until interrupted, returning the result of the
+        last run.
+
+        """
+        start_directories = [
+            os.path.abspath(start) for start in args.start
+            if os.path.isdir(start)]
+        # Starts given as dotted names or test name filters cannot be
+        # narrowed to the changed files, so they are re-run in full,
+        # re-importing only the modules affected by the change.
+        narrow = len(start_directories) == len(args.start)
+        top_level_directory = find_project_directory(
+            args.top_level_directory, args.start)
+        import_graph = ImportGraph(top_level_directory)
+
+        with create_watcher(top_level_directory) as watcher:
+            try:
+                while True:
+                    sys.stderr.write(
+                        'Watching {0} for changes (Ctrl-C to stop)\n'.format(
+                            top_level_directory))
+                    changed = watcher.wait()
+                    affected = import_graph.get_dependents(
+                        import_graph.update(changed))
+                    _unload_modules(affected)
+                    if narrow:
+                        starts = sorted(
+                            path for path in map(import_graph.get_path,
+                                                 affected)
+                            if path is not None and _is_test_module(
+                                path, start_directories, args.pattern))
+                    else:
+                        starts = args.start
+                    if len(starts) == 0:
+                        continue
+                    suites = self._discover(discoverer, args, starts)
+                    result = self._run_tests(
+                        plugin_manager, args, runner, suites)
+            except KeyboardInterrupt:
+                sys.stderr.write('\n')
+        return result
+
+
+def _take_all(items):
+    """Generate the items of a list, removing each from the list as it
+    is generated.
+
+    """
+    while items:
+        yield items.pop(0)
+
+
+def _is_test_module(path, start_directories, pattern):
+    filename = os.path.basename(path)
+    if not match_path(filename, path, pattern):
+        return False
+    return any(path.startswith(directory + os.sep)
+               for directory in start_directories)
+
+
+def _unload_modules(module_names):
+    """Remove modules from ``sys.modules`` so that the next import
+    executes their current source.
+
+    """
+    for module_name in module_names:
+        sys.modules.pop(module_name, None)
+    invalidate_caches()
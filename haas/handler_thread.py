@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2013-2014 Simon Jagoe
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the 3-clause BSD license.  See the LICENSE.txt file for details.
+import logging
+import queue
+import threading
+
+from .plugins.i_result_handler_plugin import IResultHandlerPlugin
+
+logger = logging.getLogger(__name__)
+
+#: The default number of pending events held for the result handler
+#: thread before the test loop waits for it to catch up.
+DEFAULT_QUEUE_SIZE = 1024
+
+_RESULTS = 'results'
+_FIXTURE_RESULT = 'fixture_result'
+_TEST_COUNT = 'test_count'
+_FLUSH = 'flush'
+_STOP = 'stop'
+
+
+def _get_batch_handler(handler):
+    batch_handler = getattr(handler, 'handle_results', None)
+    if getattr(batch_handler, '__func__', None) is \
+            IResultHandlerPlugin.handle_results:
+        # The default implementation creates a test case per result
+        return None
+    return batch_handler
+
+
+def handle_results(handler, results, tests=None):
+    """Hand many test results to a result handler, falling back to
+    handling them one at a time if the handler does not implement
+    ``handle_results``.
+
+    Parameters
+    ----------
+    handler : haas.plugins.i_result_handler_plugin.IResultHandlerPlugin
+        The result handler.
+    results : list
+        The :class:`~haas.result.TestResult` objects.
+    tests : list
+        [Optional] The test case that produced each result, or ``None``
+        where it is not known.  These are passed to ``start_test`` and
+        ``stop_test`` when handling results one at a time; otherwise a
+        new test case is created from the result.
+
+    """
+    batch_handler = _get_batch_handler(handler)
+    if batch_handler is not None:
+        batch_handler(results)
+        return
+    if tests is None:
+        tests = [None] * len(results)
+    for result, test in zip(results, tests):
+        if result.is_fixture_error:
+            # Fixture errors are reported without starting a test
+            handler(result)
+            continue
+        if test is None:
+            test = result.test
+        handler.start_test(test)
+        handler(result)
+        handler.stop_test(test)
+
+
+class HandlerThread:
+    """Run result handlers in a background thread, so that the test
+    loop does not wait for them.
+
+    Events are put on a bounded queue, which the thread drains in order,
+    passing consecutive test results to the handlers as a batch.  The
+    test loop only waits when the queue is full.
+
+    Parameters
+    ----------
+    handlers : list
+        The result handlers.
+    maxsize : int
+        The maximum number of pending events.
+
+    """
+
+    def __init__(self, handlers, maxsize=DEFAULT_QUEUE_SIZE):
+        self._handlers = handlers
+        self._queue = queue.Queue(maxsize)
+        self._thread = None
+        self._error = None
+
+    @property
+    def is_running(self):
+        return self._thread is not None
+
+    def start(self):
+        """Start the handler thread.
+
+        """
+        self._error = None
+        self._thread = threading.Thread(
+            target=self._run, name='haas-result-handlers', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Wait for the handler thread to handle all pending events and
+        stop.
+
+        Any exception raised by a result handler is raised again here.
+
+        """
+        if self._thread is None:
+            return
+        self._queue.put((_STOP, None))
+        self._thread.join()
+        self._thread = None
+        error, self._error = self._error, None
+        if error is not None:
+            raise error
+
+    def put_results(self, results, tests=None):
+        if tests is None:
+            tests = [None] * len(results)
+        self._queue.put((_RESULTS, (results, tests)))
+
+    def put_fixture_result(self, fixture_result):
+        self._queue.put((_FIXTURE_RESULT, fixture_result))
+
+    def put_test_count(self, test_count):
+        self._queue.put((_TEST_COUNT, test_count))
+
+    def flush(self):
+        """Wait for the handler thread to handle the events put so far,
+        so that output written next follows the output of the handlers.
+
+        """
+        if self._thread is None:
+            return
+        flushed = threading.Event()
+        self._queue.put((_FLUSH, flushed))
+        flushed.wait()
+
+    def _get_events(self):
+        events = [self._queue.get()]
+        while True:
+            try:
+                events.append(self._queue.get_nowait())
+            except queue.Empty:
+                return events
+
+    def _run(self):
+        while True:
+            results, tests = [], []
+            for kind, value in self._get_events():
+                if kind == _RESULTS:
+                    results.extend(value[0])
+                    tests.extend(value[1])
+                    continue
+                self._dispatch(_RESULTS, (results, tests))
+                results, tests = [], []
+                if kind == _STOP:
+                    return
+                if kind == _FLUSH:
+                    value.set()
+                    continue
+                self._dispatch(kind, value)
+            self._dispatch(_RESULTS, (results, tests))
+
+    def _dispatch(self, kind, value):
+        if self._error is not None or (kind == _RESULTS and not value[0]):
+            # After a handler fails, pending events are discarded so
+            # that the test loop is not blocked by a full queue.
+            return
+        try:
+            for handler in self._handlers:
+                if kind == _RESULTS:
+                    handle_results(handler, *value)
+                elif kind == _FIXTURE_RESULT:
+                    handle_fixture_result = getattr(
+                        handler, 'handle_fixture_result', None)
+                    if handle_fixture_result is not None:
+                        handle_fixture_result(value)
+                elif kind == _TEST_COUNT:
+                    update_test_count = getattr(
+                        handler, 'update_test_count', None)
+                    if update_test_count is not None:
+                        update_test_count(value)
+        except Exception as exc:
+            logger.debug('Result handler failed', exc_info=True)
+            self._error = exc
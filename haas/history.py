@@ -0,0 +1,292 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2013-2014 Simon Jagoe
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the 3-clause BSD license.  See the LICENSE.txt file for details.
+import os
+import sqlite3
+
+import haas
+from .result import TestCompletionStatus, TestDuration, datetime_utcnow
+from .utils import get_cache_directory
+
+HISTORY_FILENAME = 'history.sqlite'
+
+#: The number of most recent runs considered by the history queries
+#: by default.
+DEFAULT_RUN_COUNT = 10
+
+_PASSED = (TestCompletionStatus.success.name,)
+_FAILED = (TestCompletionStatus.failure.name, TestCompletionStatus.error.name)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    start_time TEXT NOT NULL,
+    stop_time TEXT,
+    test_count INTEGER,
+    successful INTEGER,
+    haas_version TEXT
+);
+CREATE TABLE IF NOT EXISTS results (
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    test_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    duration_ns INTEGER NOT NULL,
+    start_time TEXT,
+    worker TEXT
+);
+CREATE INDEX IF NOT EXISTS results_test_id ON results (test_id, run_id);
+CREATE INDEX IF NOT EXISTS results_run_id ON results (run_id);
+"""
+
+
+def get_default_history_path(top_level_directory=None):
+    """Return the path of the history database in the haas cache
+    directory of a project, creating the directory if required.
+
+    Parameters
+    ----------
+    top_level_directory : str
+        [Optional] The path to the top-level directory of the project.
+        Defaults to the current directory.
+
+    """
+    if top_level_directory is None:
+        top_level_directory = os.getcwd()
+    return os.path.join(
+        get_cache_directory(top_level_directory), HISTORY_FILENAME)
+
+
+def _isoformat(value):
+    if value is None:
+        return None
+    return value.isoformat()
+
+
+class HistoryDatabase:
+    """A local SQLite database of the outcome of each test in past test
+    runs, indexed by test id.
+
+    Each run records its start and stop times, test count and overall
+    success; each result records the test id, status name, duration in
+    nanoseconds, start time and the worker process that ran it.
+
+    Parameters
+    ----------
+    path : str
+        The path of the database file, which is created if it does not
+        exist.
+
+    Raises
+    ------
+    ValueError
+        If the database was created by a newer version of haas.
+
+    """
+
+    VERSION = 1
+
+    def __init__(self, path):
+        self.path = path
+        # Results may be added from the result handler thread, but the
+        # connection is never used by two threads at once.
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        try:
+            self._create_schema()
+        except Exception:
+            self._connection.close()
+            raise
+
+    def _create_schema(self):
+        connection = self._connection
+        version, = connection.execute('PRAGMA user_version').fetchone()
+        if version > self.VERSION:
+            raise ValueError(
+                'Unsupported history database version: {0}'.format(version))
+        with connection:
+            connection.executescript(_SCHEMA)
+            connection.execute(
+                'PRAGMA user_version = {0:d}'.format(self.VERSION))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Commit any pending results and close the database.
+
+        """
+        self._connection.commit()
+        self._connection.close()
+
+    def commit(self):
+        """Commit the results added since the last commit.
+
+        """
+        self._connection.commit()
+
+    def start_run(self, test_count=None, start_time=None):
+        """Record the start of a test run, returning its id.
+
+        Parameters
+        ----------
+        test_count : int
+            [Optional] The number of tests to run, if known.
+        start_time : datetime.datetime
+            [Optional] The start time of the run.  Defaults to now.
+
+        """
+        if start_time is None:
+            start_time = datetime_utcnow()
+        with self._connection:
+            cursor = self._connection.execute(
+                'INSERT INTO runs (start_time, test_count, haas_version) '
+                'VALUES (?, ?, ?)',
+                (start_time.isoformat(), test_count, haas.__version__))
+        return cursor.lastrowid
+
+    def add_results(self, run_id, results):
+        """Record the results of tests in a run.
+
+        The results are committed by :meth:`commit`,
+        :meth:`finish_run` or :meth:`close`.  Errors raised by class and
+        module fixtures are not tests, and are not recorded.
+
+        Parameters
+        ----------
+        run_id : int
+            The id of the run returned by :meth:`start_run`.
+        results : list
+            The :class:`~haas.result.TestResult` objects.
+
+        """
+        self._connection.executemany(
+            'INSERT INTO results (run_id, test_id, status, duration_ns, '
+            'start_time, worker) VALUES (?, ?, ?, ?, ?, ?)',
+            [(run_id, result.test_id, result.status.name,
+              result.duration.nanoseconds,
+              _isoformat(result.duration.start_time), result.worker)
+             for result in results if not result.is_fixture_error])
+
+    def finish_run(self, run_id, successful, test_count=None,
+                   stop_time=None):
+        """Record the end of a test run, and commit its results.
+
+        Parameters
+        ----------
+        run_id : int
+            The id of the run returned by :meth:`start_run`.
+        successful : bool
+            Whether all tests of the run were successful.
+        test_count : int
+            [Optional] The number of tests run.
+        stop_time : datetime.datetime
+            [Optional] The stop time of the run.  Defaults to now.
+
+        """
+        if stop_time is None:
+            stop_time = datetime_utcnow()
+        with self._connection:
+            self._connection.execute(
+                'UPDATE runs SET stop_time = ?, successful = ?, '
+                'test_count = coalesce(?, test_count) WHERE id = ?',
+                (stop_time.isoformat(), successful, test_count, run_id))
+
+    def get_runs(self, runs=DEFAULT_RUN_COUNT):
+        """Return ``(run_id, start_time, stop_time, test_count,
+        successful)`` tuples for the most recent runs, oldest first.
+
+        Parameters
+        ----------
+        runs : int
+            The number of runs.
+
+        """
+        rows = self._connection.execute(
+            'SELECT id, start_time, stop_time, test_count, successful '
+            'FROM runs ORDER BY id DESC LIMIT ?', (runs,)).fetchall()
+        return [
+            (run_id, start_time, stop_time, test_count,
+             None if successful is None else bool(successful))
+            for run_id, start_time, stop_time, test_count, successful
+            in reversed(rows)
+        ]
+
+    def get_slowest_tests(self, count=10, runs=DEFAULT_RUN_COUNT):
+        """Return ``(test_id, mean_duration, run_count)`` tuples for the
+        tests with the longest mean duration over the most recent runs,
+        slowest first.
+
+        Parameters
+        ----------
+        count : int
+            The number of tests.
+        runs : int
+            The number of runs.
+
+        """
+        rows = self._connection.execute(
+            'SELECT test_id, avg(duration_ns), count(DISTINCT run_id) '
+            'FROM results WHERE run_id IN ('
+            '    SELECT id FROM runs ORDER BY id DESC LIMIT ?) '
+            'GROUP BY test_id ORDER BY avg(duration_ns) DESC, test_id '
+            'LIMIT ?', (runs, count)).fetchall()
+        return [
+            (test_id, TestDuration.from_nanoseconds(round(mean)), run_count)
+            for test_id, mean, run_count in rows
+        ]
+
+    def get_flaky_tests(self, runs=DEFAULT_RUN_COUNT):
+        """Return ``(test_id, passed, failed)`` tuples for the tests that
+        both passed and failed or raised an error over the most recent
+        runs, with the number of results of each kind, most failures
+        first.
+
+        Parameters
+        ----------
+        runs : int
+            The number of runs.
+
+        """
+        query = (
+            'SELECT test_id, '
+            '    sum(status IN ({passed})), sum(status IN ({failed})) '
+            'FROM results WHERE run_id IN ('
+            '    SELECT id FROM runs ORDER BY id DESC LIMIT ?) '
+            'GROUP BY test_id '
+            'HAVING sum(status IN ({passed})) > 0 '
+            '    AND sum(status IN ({failed})) > 0 '
+            'ORDER BY 3 DESC, test_id'
+        ).format(passed=', '.join('?' * len(_PASSED)),
+                 failed=', '.join('?' * len(_FAILED)))
+        parameters = (_PASSED + _FAILED + (runs,) + _PASSED + _FAILED)
+        return self._connection.execute(query, parameters).fetchall()
+
+    def get_duration_trend(self, test_id, runs=DEFAULT_RUN_COUNT):
+        """Return ``(run_id, start_time, status, duration)`` tuples for a
+        test in each of the most recent runs that included it, oldest
+        first.
+
+        Parameters
+        ----------
+        test_id : str
+            The id of the test.
+        runs : int
+            The number of runs.
+
+        """
+        rows = self._connection.execute(
+            'SELECT results.run_id, runs.start_time, status, duration_ns '
+            'FROM results JOIN runs ON runs.id = results.run_id '
+            'WHERE test_id = ? AND run_id IN ('
+            '    SELECT id FROM runs ORDER BY id DESC LIMIT ?) '
+            'ORDER BY results.run_id', (test_id, runs)).fetchall()
+        return [
+            (run_id, start_time, TestCompletionStatus[status],
+             TestDuration.from_nanoseconds(duration_ns))
+            for run_id, start_time, status, duration_ns in rows
+        ]
@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2013-2014 Simon Jagoe
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the 3-clause BSD license.  See the LICENSE.txt file for details.
+from collections import defaultdict
+import ast
+import logging
+import os
+
+from .plugins.discoverer import DEFAULT_EXCLUDE, is_build_directory
+
+logger = logging.getLogger(__name__)
+
+
+def _resolve_relative(module_name, is_package, level, name):
+    """Resolve the target of a relative ``from`` import to an absolute
+    module name.
+
+    """
+    parts = module_name.split('.')
+    if not is_package:
+        parts = parts[:-1]
+    if level > 1:
+        parts = parts[:-(level - 1)]
+    if name:
+        parts.append(name)
+    return '.'.join(parts)
+
+
+def _with_parents(module_name):
+    """Return a module name and the names of all its parent packages,
+    which are imported along with it.
+
+    """
+    parts = module_name.split('.')
+    return ['.'.join(parts[:index + 1]) for index in range(len(parts))]
+
+
+def parse_imports(path, module_name, is_package=False):
+    """Return the names of the modules imported by a Python source file.
+
+    Names are returned as written (resolved to absolute names for
+    relative imports), together with their parent packages.  For
+    ``from package import name`` statements ``package.name`` is also
+    returned, as ``name`` may be a submodule.
+
+    Parameters
+    ----------
+    path : str
+        The path to the Python source file.
+    module_name : str
+        The dotted name of the module in the file.
+    is_package : bool
+        ``True`` if the file is the ``__init__.py`` of a package.
+
+    """
+    try:
+        with open(path, 'rb') as fh:
+            tree = ast.parse(fh.read(), path)
+    except (OSError, SyntaxError, ValueError):
+        logger.debug('Unable to parse imports of %r', path, exc_info=True)
+        return set()
+    imported = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                imported.update(_with_parents(alias.name))
+        elif isinstance(node, ast.ImportFrom):
+            if node.level:
+                base = _resolve_relative(
+                    module_name, is_package, node.level, node.module)
+            else:
+                base = node.module
+            if not base:
+                continue
+            imported.update(_with_parents(base))
+            imported.update(
+                '{0}.{1}'.format(base, alias.name) for alias in node.names
+                if alias.name != '*')
+    return imported
+
+
+class ImportGraph:
+    """A static graph of the imports between the Python modules of a
+    project, built by parsing the ``import`` statements of each module
+    with :mod:`ast`.
+
+    Only modules inside the top-level directory are included: modules
+    at the top level and in packages (directories containing an
+    ``__init__.py``) below it.
+
+    """
+
+    def __init__(self, top_level_directory, exclude=DEFAULT_EXCLUDE):
+        self.top_level_directory = os.path.abspath(top_level_directory)
+        self._exclude = frozenset(exclude)
+        self._paths = {}
+        self._imports = {}
+        self._importers = None
+        for module_name, path in self._find_modules():
+            self._add(module_name, path)
+
+    def _find_modules(self):
+        stack = [(self.top_level_directory, ())]
+        while stack:
+            directory, parts = stack.pop()
+            try:
+                entries = list(os.scandir(directory))
+            except OSError:
+                continue
+            for entry in entries:
+                name = entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    if '.' in name or name in self._exclude:
+                        continue
+                    init = os.path.join(entry.path, '__init__.py')
+                    if os.path.isfile(init):
+                        stack.append((entry.path, parts + (name,)))
+                elif name.endswith('.py') and entry.is_file():
+                    yield self._get_module_name(parts, name), entry.path
+
+    def _get_module_name(self, parts, filename):
+        module = os.path.splitext(filename)[0]
+        if module == '__init__':
+            return '.'.join(parts)
+        return '.'.join(parts + (module,))
+
+    def _add(self, module_name, path):
+        is_package = os.path.basename(path) == '__init__.py'
+        self._paths[module_name] = path
+        self._imports[module_name] = parse_imports(
+            path, module_name, is_package)
+        self._importers = None
+
+    def _remove(self, module_name):
+        self._paths.pop(module_name, None)
+        self._imports.pop(module_name, None)
+        self._importers = None
+
+    def get_module_name(self, path):
+        """Return the dotted name of the project module in a file, or
+        ``None`` if the file is not a module of the project.
+
+        Parameters
+        ----------
+        path : str
+            The path to the Python source file.
+
+        """
+        path = os.path.abspath(path)
+        relpath = os.path.relpath(path, self.top_level_directory)
+        if relpath.startswith(os.pardir) or not relpath.endswith('.py'):
+            return None
+        parts = tuple(relpath.split(os.sep))
+        if any(part.startswith('.') or part in self._exclude
+               for part in parts[:-1]):
+            return None
+        directory = self.top_level_directory
+        for part in parts[:-1]:
+            directory = os.path.join(directory, part)
+            if is_build_directory(directory):
+                return None
+        module_name = self._get_module_name(parts[:-1], parts[-1])
+        if not module_name:
+            return None
+        return module_name
+
+    def get_path(self, module_name):
+        """Return the path to the file of a project module.
+
+        Parameters
+        ----------
+        module_name : str
+            The dotted name of the module.
+
+        """
+        return self._paths.get(module_name)
+
+    def update(self, paths):
+        """Re-parse project files that have been created, modified or
+        deleted, returning the names of the affected modules.
+
+        Parameters
+        ----------
+        paths : iterable
+            The paths of the files that changed.
+
+        """
+        module_names = set()
+        for path in paths:
+            module_name = self.get_module_name(path)
+            if module_name is None:
+                continue
+            module_names.add(module_name)
+            if os.path.isfile(path):
+                self._add(module_name, os.path.abspath(path))
+            else:
+                self._remove(module_name)
+        return module_names
+
+    def _get_importers(self):
+        if self._importers is None:
+            importers = defaultdict(set)
+            for module_name, imported in self._imports.items():
+                for name in imported:
+                    importers[name].add(module_name)
+            self._importers = importers
+        return self._importers
+
+    def get_dependents(self, module_names):
+        """Return the given modules and all project modules that import
+        any of them, directly or transitively.
+
+        Parameters
+        ----------
+        module_names : iterable
+            The dotted names of the modules.
+
+        """
+        importers = self._get_importers()
+        dependents = set(module_names)
+        stack = list(dependents)
+        while stack:
+            module_name = stack.pop()
+            for importer in importers.get(module_name, ()):
+                if importer not in dependents:
+                    dependents.add(importer)
+                    stack.append(importer)
+        return dependents
@@ -5,21 +5,57 @@
 # This software may be modified and distributed under the terms
 # of the 3-clause BSD license.  See the LICENSE.txt file for details.
 import unittest
-
-from .suite import TestSuite
+import weakref
+
+from .suite import TestCaseHandle, TestSuite
+
+#: Test method names found in each class, keyed by the test method
+#: prefix.  Classes are only weakly referenced, so that reloaded test
+#: modules do not keep their old classes alive.
+_test_method_names = weakref.WeakKeyDictionary()
+
+
+def _find_test_method_names(testcase, prefix):
+    try:
+        names_by_prefix = _test_method_names[testcase]
+    except KeyError:
+        names_by_prefix = _test_method_names[testcase] = {}
+    except TypeError:
+        names_by_prefix = {}
+    try:
+        return names_by_prefix[prefix]
+    except KeyError:
+        pass
+    # Only the attributes matching the prefix are looked up, in the
+    # class __dict__s along the MRO rather than with dir().
+    candidates = set()
+    for klass in testcase.__mro__:
+        candidates.update(
+            name for name in vars(klass) if name.startswith(prefix))
+    names = tuple(sorted(
+        name for name in candidates
+        if callable(getattr(testcase, name, None))))
+    names_by_prefix[prefix] = names
+    return names
 
 
 class Loader:
     """Load individual test cases from modules and wrap them in the
     :class:`~haas.suite.Suite` container.
 
+    If the loader is created with ``lazy_test_cases=True``, tests are
+    loaded as :class:`~haas.suite.TestCaseHandle` objects, which only
+    create the ``TestCase`` instance when the test is run.
+
     """
 
     def __init__(self, test_suite_class=None, test_case_class=None,
-                 test_method_prefix='test',
-                 **kwargs):
+                 test_method_prefix='test', load_imported_cases=True,
+                 lazy_test_cases=False, **kwargs):
         super(Loader, self).__init__(**kwargs)
         self._test_method_prefix = test_method_prefix
+        self._load_imported_cases = load_imported_cases
+        self._lazy_test_cases = lazy_test_cases
 
         if test_suite_class is None:
             test_suite_class = TestSuite
@@ -29,6 +65,17 @@ class Loader:
             test_case_class = unittest.TestCase
         self._test_case_class = test_case_class
 
+    @property
+    def options(self):
+        """The settings that determine which tests the loader finds in a
+        module, as a dictionary of JSON values.
+
+        """
+        return {
+            'test_method_prefix': self._test_method_prefix,
+            'load_imported_cases': self._load_imported_cases,
+        }
+
     def create_suite(self, tests=()):
         """Create a test suite using the confugured test suite class.
 
@@ -56,11 +103,8 @@ class Loader:
             Subclass of :class:`unittest.TestCase`
 
         """
-        prefix = self._test_method_prefix
-        names = [name for name in dir(testcase)
-                 if name.startswith(prefix) and
-                 hasattr(getattr(testcase, name), '__call__')]
-        return names
+        return list(_find_test_method_names(
+            testcase, self._test_method_prefix))
 
     def load_test(self, testcase, method_name):
         """Create and return an instance of :class:`unittest.TestCase` for the
@@ -76,6 +120,11 @@ class Loader:
             raise TypeError(
                 'Test case must be a subclass of '
                 '{0.__module__}.{0.__name__}'.format(self._test_case_class))
+        if self._lazy_test_cases:
+            if not hasattr(testcase, method_name):
+                raise ValueError('no such test method in {0}: {1}'.format(
+                    testcase, method_name))
+            return TestCaseHandle(testcase, method_name)
         return testcase(method_name)
 
     def load_case(self, testcase):
@@ -96,16 +145,23 @@ class Loader:
         """Return a list of TestCase subclasses contained in the provided
         module object.
 
+        If the loader was created with ``load_imported_cases=False``,
+        only the classes defined in the module itself are returned.
+
         Parameters
         ----------
         module : module
             A module object containing ``TestCases``
 
         """
-        module_items = (getattr(module, name) for name in dir(module))
-        return [item for item in module_items
-                if isinstance(item, type)
-                and self.is_test_case(item)]
+        module_items = (item for name, item in sorted(vars(module).items()))
+        cases = [item for item in module_items
+                 if isinstance(item, type)
+                 and self.is_test_case(item)]
+        if not self._load_imported_cases:
+            cases = [case for case in cases
+                     if case.__module__ == module.__name__]
+        return cases
 
     def load_module(self, module):
         """Create and return a test suite containing all cases loaded from the
@@ -104,10 +104,8 @@ class PluginManager:
             The main haas ArgumentParser.
 
         """
-        for manager in self.hook_managers.values():
-            if len(list(manager)) == 0:
-                continue
-            manager.map(self._add_hook_extension_arguments, parser)
+        for hook in self.hook_managers:
+            self.add_hook_plugin_arguments(hook, parser)
         for namespace, manager in self.driver_managers.items():
             choices = list(sorted(manager.names()))
             if len(choices) == 0:
@@ -121,6 +119,23 @@ class PluginManager:
             manager.map(self._add_driver_extension_arguments,
                         parser, option_prefix, dest_prefix)
 
+    def add_hook_plugin_arguments(self, hook, parser):
+        """Add the arguments of the plugins for one hook to an argument
+        parser.
+
+        Parameters
+        ----------
+        hook : str
+            The name of the hook, such as ``RESULT_HANDLERS``.
+        parser : argparse.ArgumentParser
+            The ArgumentParser to extend.
+
+        """
+        manager = self.hook_managers[hook]
+        if len(list(manager)) == 0:
+            return
+        manager.map(self._add_hook_extension_arguments, parser)
+
     def get_enabled_hook_plugins(self, hook, args, **kwargs):
         """Get enabled plugins for specified hook name.
 
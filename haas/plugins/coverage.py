@@ -4,21 +4,121 @@
 #
 # This software may be modified and distributed under the terms
 # of the 3-clause BSD license.  See the LICENSE.txt file for details.
+from multiprocessing import util
+import logging
+import os
+import signal
+import unittest
+
 import coverage
 
 from .base_hook_plugin import BaseHookPlugin
+from .parallel_runner import (
+    register_worker_initializer, unregister_worker_initializer)
+
+logger = logging.getLogger(__name__)
+
+_TEST_CASE_RUN_CODE = unittest.TestCase.run.__code__
+
+
+class PerTestContextPlugin(coverage.CoveragePlugin):
+    """A coverage.py dynamic context plugin labelling the lines executed
+    by each test, including its ``setUp`` and ``tearDown``, with the id
+    of the test.
+
+    """
+
+    def dynamic_context(self, frame):
+        if frame.f_code is _TEST_CASE_RUN_CODE:
+            test = frame.f_locals.get('self')
+            if test is not None:
+                return test.id()
+        return None
+
+
+def _register_test_context_plugin(registry):
+    registry.add_dynamic_context(PerTestContextPlugin())
 
 
 class Coverage(BaseHookPlugin):
 
     def __init__(self, *args, **kwargs):
+        test_contexts = kwargs.pop('test_contexts', False)
         super(Coverage, self).__init__(*args, **kwargs)
+        self.test_contexts = test_contexts
         self._coverage = None
 
+    @classmethod
+    def add_parser_arguments(cls, parser, name, option_prefix, dest_prefix):
+        super(Coverage, cls).add_parser_arguments(
+            parser, name, option_prefix, dest_prefix)
+        parser.add_argument(
+            '--coverage-test-contexts', action='store_true', default=False,
+            help=('Enable the {0} plugin and record which tests executed '
+                  'each line, for use with --select-by=coverage').format(
+                      name))
+
+    @classmethod
+    def from_args(cls, args, name, dest_prefix):
+        enabling_option, enabling_dest = cls._get_enabling_option_string(
+            name, dest_prefix)
+        test_contexts = getattr(args, 'coverage_test_contexts', False)
+        enabled = getattr(args, enabling_dest, False) or test_contexts
+        return cls(name=name, enabled=enabled, enabling_option=enabling_dest,
+                   test_contexts=test_contexts)
+
+    def _create_coverage(self, **kwargs):
+        if self.test_contexts:
+            kwargs['plugins'] = [_register_test_context_plugin]
+        return coverage.coverage(**kwargs)
+
     def setup(self):
-        self._coverage = coverage.coverage()
+        self._coverage = self._create_coverage()
+        self._coverage.start()
+        if self.test_contexts:
+            # The worker initializer runs whichever start method the
+            # parallel runner's processes use.
+            register_worker_initializer(self._start_in_worker)
+
+    def __getstate__(self):
+        # Spawned worker processes receive a copy of the plugin without
+        # the measurement of the parent process.
+        state = self.__dict__.copy()
+        state['_coverage'] = None
+        return state
+
+    def _start_in_worker(self):
+        # Test processes forked by the parallel runner inherit the
+        # running measurement.  Replace it with one that saves to its
+        # own data file, to be combined when the test run ends.
+        if self._coverage is not None:
+            self._coverage.stop()
+        self._coverage = self._create_coverage(data_suffix=True)
         self._coverage.start()
+        util.Finalize(self, Coverage._save_in_worker, exitpriority=100)
+        # The parallel runner terminates its worker processes.
+        signal.signal(signal.SIGTERM, self._handle_sigterm)
+
+    def _save_in_worker(self):
+        if self._coverage is not None:
+            coverage_ = self._coverage
+            self._coverage = None
+            coverage_.stop()
+            coverage_.save()
+
+    def _handle_sigterm(self, signum, frame):
+        self._save_in_worker()
+        signal.signal(signum, signal.SIG_DFL)
+        os.kill(os.getpid(), signum)
 
     def teardown(self):
         self._coverage.stop()
         self._coverage.save()
+        if self.test_contexts:
+            unregister_worker_initializer(self._start_in_worker)
+            try:
+                self._coverage.combine()
+            except coverage.CoverageException:
+                logger.debug('No parallel coverage data to combine')
+            else:
+                self._coverage.save()
@@ -4,23 +4,56 @@
 #
 # This software may be modified and distributed under the terms
 # of the 3-clause BSD license.  See the LICENSE.txt file for details.
-from fnmatch import fnmatch
+from fnmatch import translate
+from functools import lru_cache
 from importlib import import_module
+from importlib.util import find_spec
 from os import getcwd
 from pathlib import Path
 import logging
 import os
+import re
 import sys
 import traceback
 import unittest
 
 from haas.exceptions import DotInModuleNameError
 from haas.module_import_error import ModuleImportError
-from haas.suite import find_test_cases
+from haas.suite import LazyTestSuite, find_test_cases, get_test_case_class
+from haas.utils import get_cache_directory
+from .discovery_index import DiscoveryIndex
 from .i_discoverer_plugin import IDiscovererPlugin
+from .import_profiler import ImportProfiler
 
 logger = logging.getLogger(__name__)
 
+#: Directory names that are skipped during discovery without touching
+#: the filesystem.  A ``!name`` rule in a ``.haasignore`` file can be
+#: used to re-include one of these.  Directories whose names contain a
+#: dot (e.g. ``.git``, ``.tox``, ``*.egg-info``) are always skipped as
+#: they can never be imported as packages.
+DEFAULT_EXCLUDE = ('__pycache__', 'node_modules', 'venv')
+
+#: Directory names of build tool output, which holds copies of the
+#: project source.  They are skipped when watching the project for
+#: changes unless they are packages.  Discovery only ever enters
+#: packages, so it needs no special case for them.
+BUILD_DIRECTORIES = ('build', 'dist')
+
+#: The name of the file listing glob patterns to exclude from discovery.
+IGNORE_FILENAME = '.haasignore'
+
+IMPORT_PROFILE_FILENAME = 'import-profile.txt'
+
+
+def is_build_directory(path):
+    """Return ``True`` if ``path`` is a build tool output directory
+    (see :data:`BUILD_DIRECTORIES`) rather than a package.
+
+    """
+    return os.path.basename(path) in BUILD_DIRECTORIES and \
+        not os.path.isfile(os.path.join(path, '__init__.py'))
+
 
 def _is_import_error_test(test):
     return isinstance(test, ModuleImportError)
@@ -50,8 +83,63 @@ def get_relpath(top_level_directory, fullpath):
     return relpath
 
 
+@lru_cache(maxsize=None)
+def _compile_pattern(pattern):
+    return re.compile(translate(pattern)).match
+
+
 def match_path(filename, filepath, pattern):
-    return fnmatch(filename, pattern)
+    match = _compile_pattern(os.path.normcase(pattern))
+    return match(os.path.normcase(filename)) is not None
+
+
+class _IgnoreRule:
+    """A single exclusion rule, as found in a ``.haasignore`` file.
+
+    The rules follow a subset of the ``.gitignore`` syntax: a leading
+    ``!`` re-includes a previously excluded path, a trailing ``/``
+    restricts the rule to directories and a pattern containing a ``/``
+    is matched against the path relative to the directory containing
+    the ignore file rather than against the name alone.
+
+    """
+
+    def __init__(self, pattern, depth=0):
+        self.negate = pattern.startswith('!')
+        if self.negate:
+            pattern = pattern[1:]
+        self.directory_only = pattern.endswith('/')
+        pattern = pattern.rstrip('/')
+        self.anchored = '/' in pattern
+        self.depth = depth
+        self._match = _compile_pattern(pattern.lstrip('/'))
+
+    def matches(self, parts, name, is_dir):
+        if self.directory_only and not is_dir:
+            return False
+        if self.anchored:
+            name = '/'.join(parts[self.depth:] + (name,))
+        return self._match(name) is not None
+
+
+def _is_excluded(rules, parts, name, is_dir):
+    # The last matching rule wins; only rules that would change the
+    # current state need to be evaluated.
+    excluded = False
+    for rule in rules:
+        if rule.negate == excluded and rule.matches(parts, name, is_dir):
+            excluded = not rule.negate
+    return excluded
+
+
+def _read_ignore_file(path, depth):
+    rules = []
+    with open(path) as fh:
+        for line in fh:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                rules.append(_IgnoreRule(line, depth))
+    return tuple(rules)
 
 
 def get_module_name(top_level_directory, filepath):
@@ -74,21 +162,66 @@ def assert_start_importable(top_level_directory, start_directory):
             raise ImportError('Start directory is not importable')
 
 
-def find_module_by_name(full_name):
-    module_name = full_name
-    module_attributes = []
-    while True:
-        try:
-            module = import_module(module_name)
-        except ImportError:
-            if '.' in module_name:
-                module_name, attribute = module_name.rsplit('.', 1)
-                module_attributes.append(attribute)
-            else:
-                raise
-        else:
+def _get_module_kind(module_name):
+    """Return a tuple ``(is_module, is_package)`` for a dotted name.  Only
+    the parent packages of ``module_name`` are imported.
+
+    """
+    module = sys.modules.get(module_name)
+    if module is not None:
+        return True, hasattr(module, '__path__')
+    spec = find_spec(module_name)
+    if spec is None:
+        return False, False
+    return True, spec.submodule_search_locations is not None
+
+
+def _find_module_boundary(full_name):
+    parts = full_name.split('.')
+    module_name = parts[0]
+    is_module, is_package = _get_module_kind(module_name)
+    if not is_module:
+        raise ModuleNotFoundError(
+            'No module named {0!r}'.format(module_name), name=module_name)
+    for part in parts[1:]:
+        if not (is_package and part):
+            break
+        candidate = '{0}.{1}'.format(module_name, part)
+        is_module, is_package = _get_module_kind(candidate)
+        if not is_module:
             break
-    return module, list(reversed(module_attributes))
+        module_name = candidate
+    return module_name
+
+
+# Map of dotted names to the longest prefix that names a module
+_module_boundaries = {}
+
+
+def find_module_by_name(full_name):
+    """Import the module named by the longest importable prefix of a
+    dotted name, and return it along with the remaining attribute
+    names.
+
+    The module/attribute boundary is located with
+    :func:`importlib.util.find_spec`, so only the parent packages of
+    the module are imported while searching for it.
+
+    Parameters
+    ----------
+    full_name : str
+        The dotted name of a package, module, or attribute in a module.
+
+    """
+    module_name = _module_boundaries.get(full_name)
+    if module_name is None or module_name not in sys.modules:
+        module_name = _find_module_boundary(full_name)
+        _module_boundaries[full_name] = module_name
+    module = import_module(module_name)
+    attributes = full_name[len(module_name) + 1:]
+    if not attributes:
+        return module, []
+    return module, attributes.split('.')
 
 
 def find_top_level_directory(start_directory):
@@ -109,6 +242,29 @@ def find_top_level_directory(start_directory):
     return os.path.abspath(top_level)
 
 
+def find_project_directory(top_level_directory=None, starts=()):
+    """Return the top-level directory of the project being tested, in
+    which the haas cache directory is kept.
+
+    Parameters
+    ----------
+    top_level_directory : str
+        [Optional] The top-level directory given on the command line.
+    starts : list
+        [Optional] The directories or dotted package/module names from
+        which discovery starts.  Without a ``top_level_directory``, it
+        is found from the first start directory, or is the current
+        directory.
+
+    """
+    if top_level_directory is not None:
+        return top_level_directory
+    for start in starts:
+        if os.path.isdir(start):
+            return find_top_level_directory(os.path.abspath(start))
+    return getcwd()
+
+
 def filter_test_suite(suite, filter_name):
     """Filter test cases in a test suite by a substring in the full dotted
     test name.
@@ -124,26 +280,66 @@ def filter_test_suite(suite, filter_name):
     """
     filtered_cases = []
     for test in find_test_cases(suite):
-        type_ = type(test)
-        name = '{0}.{1}.{2}'.format(
-            type_.__module__, type_.__name__, test._testMethodName)
-        filter_internal = '.{0}.'.format(filter_name)
         if _is_import_error_test(test) or \
-                filter_internal in name or \
-                name.endswith(filter_internal[:-1]):
+                _matches_filter(_get_test_name(test), filter_name):
             filtered_cases.append(test)
     return filtered_cases
 
 
+def _get_test_name(test):
+    type_ = get_test_case_class(test)
+    return '{0}.{1}.{2}'.format(
+        type_.__module__, type_.__name__, test._testMethodName)
+
+
+def _matches_filter(name, filter_name):
+    filter_internal = '.{0}.'.format(filter_name)
+    return filter_internal in name or name.endswith(filter_internal[:-1])
+
+
+def _get_project_files(top_level_directory, module_name, classes):
+    """Return the files within the project that define the module
+    ``module_name`` and the classes in the MRO of each class in
+    ``classes``.
+
+    """
+    prefix = os.path.join(os.path.abspath(top_level_directory), '')
+    module_names = set([module_name])
+    for class_ in classes:
+        module_names.update(klass.__module__ for klass in class_.__mro__)
+    files = set()
+    for name in module_names:
+        filename = getattr(sys.modules.get(name), '__file__', None)
+        if filename is not None:
+            filename = os.path.abspath(filename)
+            if filename.startswith(prefix):
+                files.add(filename)
+    return files
+
+
 class Discoverer(IDiscovererPlugin):
     """The ``Discoverer`` is responsible for finding tests that can be
     loaded by a :class:`~haas.loader.Loader`.
 
     """
 
-    def __init__(self, loader, **kwargs):
+    def __init__(self, loader, exclude=None, use_cache=True, stream=False,
+                 profile_imports=None, import_profile_file=None, **kwargs):
         super(Discoverer, self).__init__(**kwargs)
         self._loader = loader
+        self._use_cache = use_cache
+        self._stream = stream
+        if profile_imports is None:
+            self._import_profiler = None
+        else:
+            self._import_profiler = ImportProfiler()
+        self._profile_imports = profile_imports
+        self._import_profile_file = import_profile_file
+        self._reported_imports = 0
+        if exclude is None:
+            exclude = DEFAULT_EXCLUDE
+        self._exclude_rules = tuple(
+            _IgnoreRule(pattern) for pattern in exclude)
 
     @classmethod
     def from_args(cls, args, arg_prefix, loader):
@@ -159,7 +355,12 @@ class Discoverer(IDiscovererPlugin):
             The test loader used to construct TestCase and TestSuite instances.
 
         """
-        return cls(loader)
+        exclude = DEFAULT_EXCLUDE
+        if args.exclude is not None:
+            exclude += tuple(args.exclude)
+        return cls(loader, exclude=exclude, use_cache=args.discovery_cache,
+                   stream=args.stream, profile_imports=args.profile_imports,
+                   import_profile_file=args.import_profile_file)
 
     @classmethod
     def add_parser_arguments(cls, parser, option_prefix, dest_prefix):
@@ -176,6 +377,27 @@ class Discoverer(IDiscovererPlugin):
             plugin should use.
 
         """
+        parser.add_argument(
+            '--exclude', action='append', default=None, metavar='PATTERN',
+            help=('Glob pattern of files or directories to skip during test '
+                  'discovery, in addition to those listed in {0} files.  '
+                  'May be given multiple times.').format(IGNORE_FILENAME))
+        parser.add_argument(
+            '--no-discovery-cache', action='store_false', default=True,
+            dest='discovery_cache',
+            help=('Do not use or update the index of test names used to '
+                  'avoid importing non-matching modules when discovering '
+                  'tests by name'))
+        parser.add_argument(
+            '--profile-imports', type=int, nargs='?', const=10,
+            default=None, metavar='N',
+            help=('Time the import of each test module, including its '
+                  'nested imports, and show the N slowest (default 10)'))
+        parser.add_argument(
+            '--import-profile-file', default=None, metavar='PATH',
+            help=('File to write the full import profile tree to '
+                  '(default {0} in the project cache '
+                  'directory)').format(IMPORT_PROFILE_FILENAME))
 
     def discover(self, start, top_level_directory=None, pattern='test*.py'):
         """Do test case discovery.
@@ -207,18 +429,37 @@ class Discoverer(IDiscovererPlugin):
         logger.debug('Starting test discovery')
         if os.path.isdir(start):
             start_directory = start
-            return self.discover_by_directory(
+            suite = self.discover_by_directory(
                 start_directory, top_level_directory=top_level_directory,
                 pattern=pattern)
         elif os.path.isfile(start):
             start_filepath = start
-            return self.discover_by_file(
+            suite = self.discover_by_file(
                 start_filepath, top_level_directory=top_level_directory)
         else:
             package_or_module = start
-            return self.discover_by_module(
+            suite = self.discover_by_module(
                 package_or_module, top_level_directory=top_level_directory,
                 pattern=pattern)
+        self._report_import_profile(top_level_directory)
+        return suite
+
+    def _report_import_profile(self, top_level_directory):
+        profiler = self._import_profiler
+        if profiler is None or \
+                len(profiler.timings) == self._reported_imports:
+            return
+        self._reported_imports = len(profiler.timings)
+        path = self._import_profile_file
+        if path is None:
+            if top_level_directory is None:
+                top_level_directory = getcwd()
+            try:
+                cache_directory = get_cache_directory(top_level_directory)
+            except OSError:
+                cache_directory = top_level_directory
+            path = os.path.join(cache_directory, IMPORT_PROFILE_FILENAME)
+        profiler.write_report(sys.stderr, self._profile_imports, path)
 
     def discover_by_module(self, module_name, top_level_directory=None,
                            pattern='test*.py'):
@@ -304,6 +545,10 @@ class Discoverer(IDiscovererPlugin):
                               pattern='test*.py'):
         """Run test discovery in a directory.
 
+        If the discoverer was created with ``stream=True``, a
+        :class:`~haas.suite.LazyTestSuite` is returned, which imports
+        each test module only when the suite is iterated.
+
         Parameters
         ----------
         start_directory : str
@@ -331,6 +576,8 @@ class Discoverer(IDiscovererPlugin):
             sys.path.insert(0, top_level_directory)
         tests = self._discover_tests(
             start_directory, top_level_directory, pattern)
+        if self._stream:
+            return LazyTestSuite(tests)
         return self._loader.create_suite(list(tests))
 
     def discover_by_file(self, start_filepath, top_level_directory=None):
@@ -365,9 +612,16 @@ class Discoverer(IDiscovererPlugin):
 
     def _load_from_file(self, filepath, top_level_directory):
         module_name = get_module_name(top_level_directory, filepath)
+        return self._load_from_module_name(module_name)
+
+    def _load_from_module_name(self, module_name):
         logger.debug('Loading tests from %r', module_name)
         try:
-            module = import_module(module_name)
+            if self._import_profiler is None:
+                module = import_module(module_name)
+            else:
+                with self._import_profiler.profile(module_name):
+                    module = import_module(module_name)
         except Exception:
             test = _create_import_error_test(module_name)
         else:
@@ -378,25 +632,90 @@ class Discoverer(IDiscovererPlugin):
         # Create the test suite containing handled exception on import
         return self._loader.create_suite((test,))
 
+    def _get_parent_ignore_rules(self, top_level_directory, parts):
+        # Ignore files between the top level directory and the start
+        # directory also apply to the start directory's contents.
+        rules = ()
+        path = top_level_directory
+        for depth in range(len(parts)):
+            ignore_file = os.path.join(path, IGNORE_FILENAME)
+            if os.path.isfile(ignore_file):
+                rules += _read_ignore_file(ignore_file, depth)
+            path = os.path.join(path, parts[depth])
+        return rules
+
     def _discover_tests(self, start_directory, top_level_directory, pattern):
-        for curdir, dirnames, filenames in os.walk(start_directory):
+        for module_name, filepath in self._find_test_modules(
+                start_directory, top_level_directory, pattern):
+            yield self._load_from_module_name(module_name)
+        if self._stream:
+            # Discovery is only complete once the suite has been run
+            self._report_import_profile(top_level_directory)
+
+    def _find_test_modules(self, start_directory, top_level_directory,
+                           pattern):
+        # The module names are built up from the directory names while
+        # walking the tree, so the project paths only need to be
+        # resolved once.
+        relpath = get_relpath(top_level_directory, start_directory)
+        package = tuple(
+            part for part in relpath.split(os.path.sep) if part != '.')
+        if any('.' in part for part in package):
+            logger.info(
+                'Unexpected dot in module or package name: %r',
+                start_directory)
+            return
+        is_match = _compile_pattern(os.path.normcase(pattern))
+        rules = self._exclude_rules + self._get_parent_ignore_rules(
+            top_level_directory, package)
+
+        # Depth-first walk with the same ordering as os.walk(), using
+        # the file type information cached on the DirEntry objects.
+        stack = [(start_directory, package, rules)]
+        while stack:
+            curdir, parts, rules = stack.pop()
             logger.debug('Discovering tests in %r', curdir)
-            dirnames[:] = [
-                dirname for dirname in dirnames
-                if os.path.exists(os.path.join(curdir, dirname, '__init__.py'))
-            ]
-            for filename in filenames:
-                filepath = os.path.join(curdir, filename)
-                if not match_path(filename, filepath, pattern):
-                    logger.debug('Skipping %r', filepath)
+            try:
+                with os.scandir(curdir) as iterator:
+                    entries = list(iterator)
+            except OSError:
+                logger.debug('Unable to list directory %r', curdir)
+                continue
+
+            directories = []
+            files = []
+            for entry in entries:
+                if entry.is_dir():
+                    directories.append(entry)
+                else:
+                    files.append(entry)
+                    if entry.name == IGNORE_FILENAME:
+                        rules += _read_ignore_file(entry.path, len(parts))
+
+            for entry in files:
+                filename = entry.name
+                if is_match(os.path.normcase(filename)) is None or \
+                        _is_excluded(rules, parts, filename, False):
+                    logger.debug('Skipping %r', entry.path)
                     continue
-                try:
-                    yield self._load_from_file(filepath, top_level_directory)
-                except DotInModuleNameError:
+                module_name = os.path.splitext(filename)[0]
+                if '.' in module_name:
                     logger.info(
                         'Unexpected dot in module or package name: %r',
-                        filepath)
+                        entry.path)
                     continue
+                yield '.'.join(parts + (module_name,)), entry.path
+
+            packages = []
+            for entry in directories:
+                dirname = entry.name
+                if '.' in dirname or entry.is_symlink() or \
+                        _is_excluded(rules, parts, dirname, True) or \
+                        not os.path.isfile(
+                            os.path.join(entry.path, '__init__.py')):
+                    continue
+                packages.append((entry.path, parts + (dirname,), rules))
+            stack.extend(reversed(packages))
 
     def discover_filtered_tests(self, filter_name, top_level_directory=None,
                                 pattern='test*.py'):
@@ -429,9 +748,48 @@ class Discoverer(IDiscovererPlugin):
                      'top_level_directory=%r, pattern=%r', top_level_directory,
                      top_level_directory, pattern)
 
-        suite = self.discover_by_directory(
-            top_level_directory, top_level_directory=top_level_directory,
-            pattern=pattern)
+        start_directory = os.path.abspath(top_level_directory)
+        if top_level_directory not in sys.path:
+            sys.path.insert(0, top_level_directory)
 
-        return self._loader.create_suite(
-            filter_test_suite(suite, filter_name=filter_name))
+        if self._use_cache:
+            index = DiscoveryIndex.load(
+                top_level_directory, self._loader.options)
+        else:
+            index = None
+
+        tests = []
+        for module_name, filepath in self._find_test_modules(
+                start_directory, top_level_directory, pattern):
+            if index is not None:
+                test_names = index.get_test_names(module_name)
+                if test_names is not None and not any(
+                        _matches_filter(name, filter_name)
+                        for name in test_names):
+                    logger.debug('No tests matching %r in indexed module %r',
+                                 filter_name, module_name)
+                    continue
+            suite = self._load_from_module_name(module_name)
+            module_tests = list(find_test_cases(suite))
+            if index is not None:
+                self._update_index(
+                    index, top_level_directory, module_name, module_tests)
+            tests.extend(filter_test_suite(module_tests, filter_name))
+
+        if index is not None:
+            index.save()
+        return self._loader.create_suite(tests)
+
+    def _update_index(self, index, top_level_directory, module_name, tests):
+        if any(_is_import_error_test(test) for test in tests):
+            # Always import modules with errors so they are reported
+            index.discard(module_name)
+            return
+        module = sys.modules.get(module_name)
+        if module is None:
+            classes = []
+        else:
+            classes = self._loader.get_test_cases_from_module(module)
+        files = _get_project_files(top_level_directory, module_name, classes)
+        index.update(
+            module_name, [_get_test_name(test) for test in tests], files)
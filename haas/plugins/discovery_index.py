@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2013-2014 Simon Jagoe
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the 3-clause BSD license.  See the LICENSE.txt file for details.
+import json
+import logging
+import os
+
+from haas.utils import CACHE_DIRECTORY, get_cache_directory
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILENAME = 'discovery-index.json'
+
+
+def _file_signature(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+class DiscoveryIndex:
+    """A persistent index of the names of the tests found in each test
+    module of a project.
+
+    Each entry records the signature (modification time and size) of
+    the module file and of every project file defining a class in the
+    MRO of its tests, so that an entry is only trusted while none of
+    the code it was built from has changed.
+
+    The index also records the options of the loader that found the
+    tests, and is only used by a loader with the same options.
+
+    """
+
+    VERSION = 2
+
+    def __init__(self, top_level_directory, modules=None,
+                 loader_options=None):
+        self.top_level_directory = top_level_directory
+        if modules is None:
+            modules = {}
+        self._modules = modules
+        self._loader_options = loader_options
+        self._dirty = False
+
+    @classmethod
+    def load(cls, top_level_directory, loader_options=None):
+        """Load the index of a project, returning an empty index if none
+        exists, it cannot be read or it was built with different loader
+        options.
+
+        Parameters
+        ----------
+        top_level_directory : str
+            The path to the top-level directory of the project.
+        loader_options : dict
+            [Optional] The :attr:`~haas.loader.Loader.options` of the
+            loader used to find tests.
+
+        """
+        path = os.path.join(
+            top_level_directory, CACHE_DIRECTORY, INDEX_FILENAME)
+        try:
+            with open(path) as fh:
+                data = json.load(fh)
+        except (OSError, ValueError):
+            logger.debug('No usable discovery index at %r', path)
+            return cls(top_level_directory, loader_options=loader_options)
+        if not isinstance(data, dict) or data.get('version') != cls.VERSION:
+            return cls(top_level_directory, loader_options=loader_options)
+        if data.get('loader_options') != loader_options:
+            logger.debug('Discovery index built with other loader options')
+            return cls(top_level_directory, loader_options=loader_options)
+        return cls(top_level_directory, data.get('modules'), loader_options)
+
+    def save(self):
+        """Write the index back to the project cache directory if it has
+        been modified.
+
+        """
+        if not self._dirty:
+            return
+        data = {
+            'version': self.VERSION,
+            'loader_options': self._loader_options,
+            'modules': self._modules,
+        }
+        try:
+            cache_directory = get_cache_directory(self.top_level_directory)
+            path = os.path.join(cache_directory, INDEX_FILENAME)
+            temp_path = '{0}.{1}.tmp'.format(path, os.getpid())
+            with open(temp_path, 'w') as fh:
+                json.dump(data, fh)
+            os.replace(temp_path, path)
+        except OSError:
+            logger.warning('Unable to write discovery index', exc_info=True)
+        else:
+            self._dirty = False
+
+    def get_test_names(self, module_name):
+        """Return the full dotted names of the tests in a module, or
+        ``None`` if the module is not indexed or any of the files its
+        entry was built from has changed.
+
+        Parameters
+        ----------
+        module_name : str
+            The dotted name of the test module.
+
+        """
+        entry = self._modules.get(module_name)
+        if entry is None:
+            return None
+        for path, signature in entry['files'].items():
+            if _file_signature(path) != signature:
+                return None
+        return entry['tests']
+
+    def update(self, module_name, test_names, files):
+        """Record the tests found in a module.
+
+        Parameters
+        ----------
+        module_name : str
+            The dotted name of the test module.
+        test_names : list
+            The full dotted names of the tests in the module.
+        files : iterable
+            The paths of the files the tests were loaded from.
+
+        """
+        self._modules[module_name] = {
+            'tests': list(test_names),
+            'files': {path: _file_signature(path) for path in files},
+        }
+        self._dirty = True
+
+    def discard(self, module_name):
+        """Remove a module from the index.
+
+        Parameters
+        ----------
+        module_name : str
+            The dotted name of the test module.
+
+        """
+        if self._modules.pop(module_name, None) is not None:
+            self._dirty = True
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2013-2014 Simon Jagoe
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the 3-clause BSD license.  See the LICENSE.txt file for details.
+import logging
+
+from haas.history import HistoryDatabase, get_default_history_path
+from haas.result import TestCompletionStatus
+from .discoverer import find_project_directory
+from .i_result_handler_plugin import IResultHandlerPlugin
+
+logger = logging.getLogger(__name__)
+
+_SUCCESSFUL = frozenset([
+    TestCompletionStatus.success,
+    TestCompletionStatus.expected_failure,
+    TestCompletionStatus.skipped,
+])
+
+
+class HistoryResultHandler(IResultHandlerPlugin):
+    """Record the status, duration and worker of each test of the run,
+    and the start and end of the run, in a
+    :class:`~haas.history.HistoryDatabase`.
+
+    Results are committed in batches, so that most of the history of an
+    interrupted run is kept without committing every test.
+
+    Parameters
+    ----------
+    path : str
+        The path of the history database.
+    test_count : int
+        The total number of tests, or ``None`` if it is not yet known.
+
+    """
+
+    #: The number of results added to the database between commits.
+    commit_interval = 1000
+
+    def __init__(self, path, test_count):
+        self.enabled = True
+        self.path = path
+        self._test_count = test_count
+        self._database = None
+        self._run_id = None
+        self._uncommitted = 0
+        self._successful = True
+
+    @classmethod
+    def from_args(cls, args, name, dest_prefix, test_count):
+        if args.history_db is None and not args.history:
+            return None
+        if getattr(args, 'replaying', False):
+            # The results were recorded when the tests were run
+            logger.warning(
+                'Replayed results are not recorded in the history')
+            return None
+        if args.history_db is not None:
+            return cls(args.history_db, test_count)
+        top_level_directory = find_project_directory(
+            getattr(args, 'top_level_directory', None),
+            getattr(args, 'start', ()))
+        return cls(get_default_history_path(top_level_directory), test_count)
+
+    @classmethod
+    def add_parser_arguments(cls, parser, name, option_prefix, dest_prefix):
+        parser.add_argument('--history', action='store_true', default=False,
+                            help=('Record the results of the run in a SQLite '
+                                  'database in the .haas_cache directory of '
+                                  'the project, to be queried with "haas '
+                                  'history"'))
+        parser.add_argument('--history-db', default=None, metavar='FILE',
+                            help=('Record the results of the run in the '
+                                  'SQLite database FILE'))
+
+    def start_test(self, test):
+        pass
+
+    def stop_test(self, test):
+        pass
+
+    def start_test_run(self):
+        self._database = HistoryDatabase(self.path)
+        self._run_id = self._database.start_run(self._test_count)
+        self._uncommitted = 0
+        self._successful = True
+
+    def stop_test_run(self):
+        self._database.finish_run(
+            self._run_id, self._successful, self._test_count)
+        self._database.close()
+        self._database = None
+
+    def update_test_count(self, test_count):
+        self._test_count = test_count
+
+    def __call__(self, result):
+        self.handle_results([result])
+
+    def handle_results(self, results):
+        self._database.add_results(self._run_id, results)
+        if self._successful and any(
+                result.status not in _SUCCESSFUL for result in results):
+            self._successful = False
+        self._uncommitted += len(results)
+        if self._uncommitted >= self.commit_interval:
+            self._database.commit()
+            self._uncommitted = 0
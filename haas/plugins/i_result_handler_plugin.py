@@ -23,7 +23,8 @@ class IResultHandlerPlugin(ABC):
             The prefix that ``dest`` strings for options added by this
             plugin should use.
         test_count : int
-            The totel number of tests discovered.
+            The totel number of tests discovered, or ``None`` if tests
+            are run while discovery is in progress.
 
         """
 
@@ -74,3 +75,50 @@ class IResultHandlerPlugin(ABC):
         """Handle the completed test result ``result``.
 
         """
+
+    def handle_results(self, results):
+        """Handle many completed test results at once, such as those
+        collected from a subprocess.
+
+        This is equivalent to calling :meth:`start_test`, the handler
+        itself and :meth:`stop_test` for each result (only the handler
+        itself for errors raised by class and module fixtures), which is
+        what the default implementation does.  Handlers may override it
+        to avoid the overhead of handling each result separately.
+
+        Parameters
+        ----------
+        results : list
+            The :class:`~haas.result.TestResult` objects, in the order
+            in which the tests completed.
+
+        """
+        for result in results:
+            if result.is_fixture_error:
+                # Fixture errors are reported without starting a test
+                self(result)
+                continue
+            test = result.test
+            self.start_test(test)
+            self(result)
+            self.stop_test(test)
+
+    def set_result_store(self, result_store):
+        """Receive the :class:`~haas.result.ResultStore` to which
+        the :class:`~haas.result.ResultCollector` adds every result of
+        the test run, so that the handler can query it rather than keep
+        its own copies of the results.
+
+        """
+
+    def update_test_count(self, test_count):
+        """Receive the total number of tests discovered, if it was not
+        known when the result handler was created.
+
+        """
+
+    def handle_fixture_result(self, fixture_result):
+        """Handle the :class:`~haas.result.FixtureResult` timing of a
+        module or class fixture.
+
+        """
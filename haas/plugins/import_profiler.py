@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2013-2014 Simon Jagoe
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the 3-clause BSD license.  See the LICENSE.txt file for details.
+from contextlib import contextmanager
+from importlib.abc import MetaPathFinder
+import logging
+import sys
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class ImportTiming:
+    """The time taken to import a module, including the modules it
+    imported in turn.
+
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.duration = 0.0
+        self.children = []
+
+    @property
+    def self_duration(self):
+        """The time spent importing the module itself, excluding the
+        time spent in nested imports.
+
+        """
+        return self.duration - sum(child.duration for child in self.children)
+
+    def format_tree(self, depth=0):
+        """Generate lines describing this import and its nested imports,
+        in the style of ``python -X importtime``.
+
+        """
+        yield '{0:10.1f} | {1:10.1f} | {2}{3}'.format(
+            self.self_duration * 1e3, self.duration * 1e3,
+            '  ' * depth, self.name)
+        for child in self.children:
+            for line in child.format_tree(depth + 1):
+                yield line
+
+
+class _TimedLoader:
+    """Wrap a module loader to time the execution of the module.
+
+    """
+
+    def __init__(self, loader, profiler, name):
+        self._loader = loader
+        self._profiler = profiler
+        self._name = name
+        self._create_duration = 0.0
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+    def create_module(self, spec):
+        # Extension modules do most of their work here.
+        start = time.perf_counter()
+        try:
+            return self._loader.create_module(spec)
+        finally:
+            self._create_duration = time.perf_counter() - start
+
+    def exec_module(self, module):
+        # Restore the real loader so the module is left exactly as it
+        # would be without profiling.
+        module.__loader__ = self._loader
+        if getattr(module, '__spec__', None) is not None:
+            module.__spec__.loader = self._loader
+        with self._profiler.timing(self._name) as timing:
+            self._loader.exec_module(module)
+        if timing is not None:
+            timing.duration += self._create_duration
+
+
+class _ProfilingFinder(MetaPathFinder):
+
+    def __init__(self, profiler):
+        self._profiler = profiler
+
+    def find_spec(self, fullname, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, 'find_spec'):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+        if hasattr(spec.loader, 'exec_module'):
+            spec.loader = _TimedLoader(spec.loader, self._profiler, fullname)
+        return spec
+
+
+class ImportProfiler:
+    """Record the time taken to import test modules during discovery,
+    attributing nested imports to the test module that triggered them.
+
+    """
+
+    def __init__(self):
+        self.timings = []
+        self._stack = []
+
+    @contextmanager
+    def timing(self, name):
+        """Time an import, nested within the import currently being
+        timed, if any.
+
+        Yields the new :class:`ImportTiming`, or ``None`` if ``name``
+        is the import currently being timed.
+
+        """
+        if self._stack and self._stack[-1].name == name:
+            # The module itself being executed by its own import.
+            yield None
+            return
+        timing = ImportTiming(name)
+        if self._stack:
+            self._stack[-1].children.append(timing)
+        else:
+            self.timings.append(timing)
+        self._stack.append(timing)
+        start = time.perf_counter()
+        try:
+            yield timing
+        finally:
+            timing.duration = time.perf_counter() - start
+            self._stack.pop()
+
+    @contextmanager
+    def profile(self, module_name):
+        """Profile the import of a test module and all modules it
+        imports that are not yet loaded.
+
+        Parameters
+        ----------
+        module_name : str
+            The dotted name of the test module.
+
+        """
+        finder = _ProfilingFinder(self)
+        sys.meta_path.insert(0, finder)
+        try:
+            with self.timing(module_name):
+                yield
+        finally:
+            sys.meta_path.remove(finder)
+
+    def get_slowest(self, count):
+        """Return the timings of the slowest test module imports.
+
+        Parameters
+        ----------
+        count : int
+            The number of timings to return.
+
+        """
+        return sorted(self.timings, key=lambda timing: timing.duration,
+                      reverse=True)[:count]
+
+    def write_tree(self, path):
+        """Write the full tree of import timings to a file.
+
+        Parameters
+        ----------
+        path : str
+            The path of the file to write.
+
+        """
+        with open(path, 'w') as fh:
+            fh.write('{0:>10} | {1:>10} | {2}\n'.format(
+                'self [ms]', 'cumulative', 'imported package'))
+            for timing in self.timings:
+                for line in timing.format_tree():
+                    fh.write(line + '\n')
+
+    def write_report(self, stream, count, path):
+        """Write a summary of the slowest test module imports, and the
+        full tree of import timings to a file.
+
+        Parameters
+        ----------
+        stream : file
+            The stream to write the summary to.
+        count : int
+            The number of slowest test module imports to show.
+        path : str
+            The path of the file to write the full tree to.
+
+        """
+        total = sum(timing.duration for timing in self.timings)
+        stream.write('Imported {0} test modules in {1:.3f}s\n'.format(
+            len(self.timings), total))
+        slowest = self.get_slowest(count)
+        if len(slowest) > 0:
+            stream.write('{0} slowest test module imports\n'.format(
+                len(slowest)))
+            for timing in slowest:
+                stream.write('({0:.3f}s) {1}\n'.format(
+                    timing.duration, timing.name))
+        try:
+            self.write_tree(path)
+        except OSError:
+            logger.warning(
+                'Unable to write import profile to %r', path, exc_info=True)
+        else:
+            stream.write('Full import profile written to {0}\n'.format(path))
@@ -4,20 +4,52 @@
 #
 # This software may be modified and distributed under the terms
 # of the 3-clause BSD license.  See the LICENSE.txt file for details.
+from collections import deque
 from importlib import import_module
-from multiprocessing import Pool
+from multiprocessing import Pool, current_process
 import time
 
 from haas.module_import_error import ModuleImportError
-from haas.suite import find_test_cases
-from haas.result import ResultCollector
+from haas.suite import TestSuite, find_test_cases
+from haas.result import (
+    DEFAULT_FRAME_LIMIT, DEFAULT_TRACEBACK_SIZE_LIMIT, ResultCollector)
 from .i_result_handler_plugin import IResultHandlerPlugin
 from .runner import BaseTestRunner
 
+_worker_initializers = []
+
+
+def register_worker_initializer(initializer, *args):
+    """Register a function to be called with ``args`` in each worker
+    process of the :class:`~.ParallelTestRunner`, before any
+    ``--process-init`` function.
+
+    The function and its arguments are passed to the worker processes,
+    so they must be picklable when workers are not started by forking.
+
+    """
+    _worker_initializers.append((initializer, args))
+
+
+def unregister_worker_initializer(initializer, *args):
+    """Remove a function registered with
+    :func:`register_worker_initializer`.
+
+    """
+    _worker_initializers.remove((initializer, args))
+
+
+def _initialize_worker(initializers, initializer=None):
+    for registered_initializer, args in initializers:
+        registered_initializer(*args)
+    if initializer is not None:
+        initializer()
+
 
 class ChildResultHandler(IResultHandlerPlugin):
     """A result handler that simply collects :class`TestResults
-    <haas.result.TestResult>` for returning to the parent process.
+    <haas.result.TestResult>` and :class:`FixtureResults
+    <haas.result.FixtureResult>` for returning to the parent process.
 
     """
 
@@ -25,6 +57,7 @@ class ChildResultHandler(IResultHandlerPlugin):
         self.start_time = None
         self.stop_time = None
         self.results = []
+        self.fixture_results = []
 
     # To keep the interface happy
     @classmethod
@@ -51,14 +84,30 @@ class ChildResultHandler(IResultHandlerPlugin):
     def __call__(self, result):
         self.results.append(result)
 
+    def handle_results(self, results):
+        self.results.extend(results)
 
-def _run_test_in_process(test_case):
+    def handle_fixture_result(self, fixture_result):
+        self.fixture_results.append(fixture_result)
+
+
+def _run_test_in_process(test_case, buffer=True, clock=None,
+                         traceback_limits=(DEFAULT_FRAME_LIMIT,
+                                           DEFAULT_TRACEBACK_SIZE_LIMIT)):
+    frame_limit, size_limit = traceback_limits
     result_handler = ChildResultHandler()
-    result_collector = ResultCollector(buffer=True)
+    result_collector = ResultCollector(
+        buffer=buffer, clock=clock, traceback_frame_limit=frame_limit,
+        traceback_size_limit=size_limit)
     result_collector.add_result_handler(result_handler)
     runner = BaseTestRunner()
-    runner.run(result_collector, test_case)
-    return result_handler.results
+    # The suite runs, and times, the class and module fixtures of the
+    # test case in this process.
+    runner.run(result_collector, TestSuite([test_case]))
+    worker = current_process().name
+    for result in result_handler.results:
+        result.worker = worker
+    return result_handler.results, result_handler.fixture_results
 
 
 class ParallelTestRunner(BaseTestRunner):
@@ -115,34 +164,57 @@ class ParallelTestRunner(BaseTestRunner):
             type=int, default=None,
         )
 
-    def _handle_result(self, result, collected_result):
-        for test_result in collected_result:
-            test = test_result.test
-            result.startTest(test, test_result.duration.start_time)
-            result.add_result(test_result)
-            result.stopTest(test)
+    def _handle_results(self, result, pending):
+        # Results are handed to the result handlers in batches from the
+        # main thread, rather than one at a time from the pool's result
+        # thread.
+        results = []
+        for _ in range(len(pending)):
+            test_results, fixture_results = pending.popleft()
+            for fixture_result in fixture_results:
+                result.add_fixture_result(fixture_result)
+            results.extend(test_results)
+        result.add_results(results)
 
     def _run_tests(self, result, test):
-        pool = Pool(processes=self.process_count,
-                    initializer=self.initializer,
-                    maxtasksperchild=self.maxtasksperchild)
+        if _worker_initializers:
+            pool = Pool(processes=self.process_count,
+                        initializer=_initialize_worker,
+                        initargs=(list(_worker_initializers),
+                                  self.initializer),
+                        maxtasksperchild=self.maxtasksperchild)
+        else:
+            pool = Pool(processes=self.process_count,
+                        initializer=self.initializer,
+                        maxtasksperchild=self.maxtasksperchild)
 
+        pending = deque()
         try:
             def callback(collected_result):
-                self._handle_result(result, collected_result)
+                pending.append(collected_result)
+            # Output is always buffered so that it is not interleaved
+            buffer = 'fd' if result.buffer == 'fd' else True
+            traceback_limits = (
+                result.traceback_frame_limit, result.traceback_size_limit)
             error_tests = []
             call_results = []
             for test_case in find_test_cases(test):
                 if isinstance(test_case, ModuleImportError):
                     error_tests.append(test_case)
                 else:
+                    # The performance counter is system-wide, so the
+                    # subprocesses share the clock anchor of the run.
                     call_result = pool.apply_async(
-                        _run_test_in_process, args=(test_case,),
+                        _run_test_in_process,
+                        args=(test_case, buffer, result.clock,
+                              traceback_limits),
                         callback=callback)
                     call_results.append(call_result)
 
             for test_case in error_tests:
-                collected_result = _run_test_in_process(test_case)
+                collected_result = _run_test_in_process(
+                    test_case, clock=result.clock,
+                    traceback_limits=traceback_limits)
                 callback(collected_result)
         finally:
             pool.close()
@@ -155,10 +227,12 @@ class ParallelTestRunner(BaseTestRunner):
             # pool.terminate() before pool.join().
             while len(call_results) > 0:
                 call_results[0].wait(0.25)
+                self._handle_results(result, pending)
                 call_results = [call_result for call_result in call_results
                                 if not call_result.ready()]
             pool.terminate()
             pool.join()
+            self._handle_results(result, pending)
 
     def run(self, result_collector, test_to_run):
         """Run the tests in subprocesses.
@@ -4,11 +4,13 @@
 #
 # This software may be modified and distributed under the terms
 # of the 3-clause BSD license.  See the LICENSE.txt file for details.
+from datetime import timezone
 import statistics
 import sys
 import time
 
-from haas.result import TestCompletionStatus, TestDuration, separator2
+from haas.result import (
+    ResultStore, TestCompletionStatus, TestDuration, separator2)
 from .i_result_handler_plugin import IResultHandlerPlugin
 
 
@@ -20,6 +22,38 @@ def get_test_description(test, descriptions=True):
         return str(test)
 
 
+def get_result_description(result, descriptions=True):
+    """Return the description of the test of a
+    :class:`~haas.result.TestResult`, as :func:`get_test_description`
+    returns for the test case, without creating the test case.
+
+    """
+    if result.is_fixture_error:
+        return result.test_method_name
+    test_class = result.test_class
+    method_name = result.test_method_name
+    if sys.version_info >= (3, 11):
+        name = '{0} ({1})'.format(method_name, result.test_id)
+    else:
+        name = '{0} ({1}.{2})'.format(
+            method_name, test_class.__module__, test_class.__qualname__)
+    doc = getattr(getattr(test_class, method_name, None), '__doc__', None)
+    if descriptions and doc:
+        return '\n'.join((name, doc.strip().split('\n')[0].strip()))
+    return name
+
+
+def _format_timestamp(start_time):
+    """Format the start time of a test as :func:`time.ctime` does.
+
+    """
+    if start_time is None:
+        return time.ctime()
+    if start_time.tzinfo is None:
+        start_time = start_time.replace(tzinfo=timezone.utc)
+    return start_time.astimezone().ctime()
+
+
 class _WritelnDecorator:
     """Used to decorate file-like objects with a handy 'writeln' method"""
     def __init__(self, stream):
@@ -71,18 +105,9 @@ class QuietTestResultHandler(IResultHandlerPlugin):
         self._test_count = test_count
         self.tests_run = 0
         self.descriptions = True
-        self.expectedFailures = expectedFailures = []
-        self.unexpectedSuccesses = unexpectedSuccesses = []
-        self.skipped = skipped = []
-        self.failures = failures = []
-        self.errors = errors = []
-        self._collectors = {
-            TestCompletionStatus.failure: failures,
-            TestCompletionStatus.error: errors,
-            TestCompletionStatus.unexpected_success: unexpectedSuccesses,
-            TestCompletionStatus.expected_failure: expectedFailures,
-            TestCompletionStatus.skipped: skipped,
-        }
+        # Results are recorded here until a shared store is provided
+        self._result_store = ResultStore()
+        self._records_results = True
         self.start_time = None
         self.stop_time = None
 
@@ -95,9 +120,38 @@ class QuietTestResultHandler(IResultHandlerPlugin):
     def add_parser_arguments(self, parser, name, option_prefix, dest_prefix):
         pass
 
+    @property
+    def errors(self):
+        return self._result_store.get_results(TestCompletionStatus.error)
+
+    @property
+    def failures(self):
+        return self._result_store.get_results(TestCompletionStatus.failure)
+
+    @property
+    def skipped(self):
+        return self._result_store.get_results(TestCompletionStatus.skipped)
+
+    @property
+    def expectedFailures(self):
+        return self._result_store.get_results(
+            TestCompletionStatus.expected_failure)
+
+    @property
+    def unexpectedSuccesses(self):
+        return self._result_store.get_results(
+            TestCompletionStatus.unexpected_success)
+
     def get_test_description(self, test):
         return get_test_description(test, descriptions=self.descriptions)
 
+    def set_result_store(self, result_store):
+        self._result_store = result_store
+        self._records_results = False
+
+    def update_test_count(self, test_count):
+        self._test_count = test_count
+
     def start_test(self, test):
         self.tests_run += 1
 
@@ -149,15 +203,16 @@ class QuietTestResultHandler(IResultHandlerPlugin):
                             (run, run != 1 and "s" or "", time_taken))
         self.stream.writeln()
 
-        selfs = map(len, (self.expectedFailures,
-                          self.unexpectedSuccesses,
-                          self.skipped))
-        expectedFails, unexpectedSuccesses, skipped = selfs
+        count = self._result_store.count
+        expectedFails = count(TestCompletionStatus.expected_failure)
+        unexpectedSuccesses = count(TestCompletionStatus.unexpected_success)
+        skipped = count(TestCompletionStatus.skipped)
 
         infos = []
         if not self.was_successful():
             self.stream.write("FAILED")
-            failed, errored = len(self.failures), len(self.errors)
+            failed = count(TestCompletionStatus.failure)
+            errored = count(TestCompletionStatus.error)
             if failed:
                 infos.append("failures=%d" % failed)
             if errored:
@@ -176,14 +231,21 @@ class QuietTestResultHandler(IResultHandlerPlugin):
             self.stream.write("\n")
 
     def was_successful(self):
-        return (len(self.errors) == 0 and
-                len(self.failures) == 0 and
-                len(self.unexpectedSuccesses) == 0)
+        count = self._result_store.count
+        return (count(TestCompletionStatus.error) == 0 and
+                count(TestCompletionStatus.failure) == 0 and
+                count(TestCompletionStatus.unexpected_success) == 0)
 
     def __call__(self, result):
-        collector = self._collectors.get(result.status)
-        if collector is not None:
-            collector.append(result)
+        if self._records_results:
+            self._result_store.add(result)
+
+    def handle_results(self, results):
+        for result in results:
+            if not result.is_fixture_error:
+                # As in start_test, which is not called for fixtures
+                self.tests_run += 1
+            QuietTestResultHandler.__call__(self, result)
 
 
 class StandardTestResultHandler(QuietTestResultHandler):
@@ -207,6 +269,12 @@ class StandardTestResultHandler(QuietTestResultHandler):
         self.stream.write(self._result_formats[result.status])
         self.stream.flush()
 
+    def handle_results(self, results):
+        super(StandardTestResultHandler, self).handle_results(results)
+        self.stream.write(''.join(
+            self._result_formats[result.status] for result in results))
+        self.stream.flush()
+
 
 class VerboseTestResultHandler(StandardTestResultHandler):
 
@@ -224,26 +292,49 @@ class VerboseTestResultHandler(StandardTestResultHandler):
         if args.verbosity == 2:
             return cls(test_count=test_count)
 
-    def start_test(self, test):
-        super(VerboseTestResultHandler, self).start_test(test)
-        padding = len(str(self._test_count))
-        prefix = '[{timestamp}] ({run: >{padding}d}/{total:d}) '.format(
-            timestamp=time.ctime(),
+    def _format_start(self, description, timestamp):
+        if self._test_count is None:
+            total = '?'
+        else:
+            total = str(self._test_count)
+        prefix = '[{timestamp}] ({run: >{padding}d}/{total}) '.format(
+            timestamp=timestamp,
             run=self.tests_run,
-            padding=padding,
-            total=self._test_count,
+            padding=len(total),
+            total=total,
         )
-        self.stream.write(prefix)
-        description = self.get_test_description(test)
-        self.stream.write(description)
-        self.stream.write(' ... ')
+        return '{0}{1} ... '.format(prefix, description)
+
+    def _format_end(self, result):
+        if result.message is not None:
+            return " '{0}'\n".format(result.message)
+        return '\n'
+
+    def start_test(self, test):
+        super(VerboseTestResultHandler, self).start_test(test)
+        self.stream.write(self._format_start(
+            self.get_test_description(test), time.ctime()))
         self.stream.flush()
 
     def __call__(self, result):
         super(VerboseTestResultHandler, self).__call__(result)
-        if result.message is not None:
-            self.stream.write(" '{0}'".format(result.message))
-        self.stream.writeln()
+        self.stream.write(self._format_end(result))
+        self.stream.flush()
+
+    def handle_results(self, results):
+        lines = []
+        for result in results:
+            QuietTestResultHandler.__call__(self, result)
+            if not result.is_fixture_error:
+                # As in start_test, which is not called for fixtures
+                self.tests_run += 1
+                lines.append(self._format_start(
+                    get_result_description(
+                        result, descriptions=self.descriptions),
+                    _format_timestamp(result.duration.start_time)))
+            lines.append(self._result_formats[result.status])
+            lines.append(self._format_end(result))
+        self.stream.write(''.join(lines))
         self.stream.flush()
 
 
@@ -258,7 +349,10 @@ class TimingResultHandler(IResultHandlerPlugin):
         self.stream = _WritelnDecorator(sys.stderr)
         self.descriptions = True
         self.number_to_summarize = number_to_summarize
-        self._test_results = []
+        # Results are recorded here until a shared store is provided
+        self._result_store = ResultStore()
+        self._records_results = True
+        self._fixture_results = []
 
     @classmethod
     def from_args(cls, args, name, dest_prefix, test_count):
@@ -287,21 +381,21 @@ class TimingResultHandler(IResultHandlerPlugin):
     def stop_test_run(self):
         self.print_summary()
 
+    def set_result_store(self, result_store):
+        self._result_store = result_store
+        self._records_results = False
+
     def print_summary(self):
-        tests_by_time = sorted(
-            self._test_results,
-            key=lambda item: item.duration,
+        durations = sorted(
+            (duration / 1e9 for duration in self._result_store.durations),
             reverse=True,
         )
-        tests_count = len(tests_by_time)
+        tests_count = len(durations)
 
-        durations = [t.duration for t in tests_by_time]
-        median = statistics.median(durations)
-        mean = statistics.mean(durations)
+        median = TestDuration(statistics.median(durations))
+        mean = TestDuration(statistics.mean(durations))
         if len(durations) > 1:
-            stdev = statistics.stdev(
-                duration.total_seconds for duration in durations)
-            stdev = TestDuration(stdev)
+            stdev = TestDuration(statistics.stdev(durations))
         else:
             stdev = '-'
 
@@ -316,7 +410,8 @@ class TimingResultHandler(IResultHandlerPlugin):
 
         template = '  {0} {1}'
 
-        for test_result in tests_by_time[:self.number_to_summarize]:
+        slowest = self._result_store.get_slowest(self.number_to_summarize)
+        for test_result in slowest:
             description = get_test_description(
                 test_result.test, descriptions=self.descriptions)
             line = template.format(str(test_result.duration), description)
@@ -324,20 +419,61 @@ class TimingResultHandler(IResultHandlerPlugin):
 
         stream.writeln()
 
+        def percentile(index):
+            return str(TestDuration(durations[index])).strip()
+
         pairs = [
             ['Mean', str(mean).strip()],
             ['Std Dev', str(stdev).strip()],
             ['Median', str(median).strip()],
-            ['80%', str(tests_by_time[percentile_80_index].duration).strip()],
-            ['90%', str(tests_by_time[percentile_90_index].duration).strip()],
-            ['95%', str(tests_by_time[percentile_95_index].duration).strip()],
-            ['99%', str(tests_by_time[percentile_99_index].duration).strip()],
+            ['80%', percentile(percentile_80_index)],
+            ['90%', percentile(percentile_90_index)],
+            ['95%', percentile(percentile_95_index)],
+            ['99%', percentile(percentile_99_index)],
         ]
         stat_table = _format_stat_table(pairs)
         stream.writeln(stat_table)
 
+        self.print_fixture_summary()
+
+    def print_fixture_summary(self):
+        if len(self._fixture_results) == 0:
+            return
+        fixtures_by_time = sorted(
+            self._fixture_results,
+            key=lambda item: item.duration,
+            reverse=True,
+        )
+
+        stream = self.stream
+        stream.writeln('\n\nFixture timing report')
+        stream.writeln(self.separator2)
+
+        template = '  {0} {1}'
+
+        for fixture_result in fixtures_by_time[:self.number_to_summarize]:
+            line = template.format(
+                str(fixture_result.duration), fixture_result.description)
+            stream.writeln(line)
+
+        total = sum(
+            (fixture_result.duration for fixture_result in fixtures_by_time),
+            TestDuration(0))
+        stream.writeln()
+        stream.writeln('  {0} total in {1} fixtures'.format(
+            str(total).strip(), len(fixtures_by_time)))
+
+    def handle_fixture_result(self, fixture_result):
+        self._fixture_results.append(fixture_result)
+
     def __call__(self, result):
-        self._test_results.append(result)
+        if self._records_results:
+            self._result_store.add(result)
+
+    def handle_results(self, results):
+        if self._records_results:
+            for result in results:
+                self._result_store.add(result)
 
 
 def _format_stat_table(pairs):
@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2013-2014 Simon Jagoe
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the 3-clause BSD license.  See the LICENSE.txt file for details.
+import json
+import logging
+
+import haas
+from haas.result import FixtureResult, TestResult
+from .i_result_handler_plugin import IResultHandlerPlugin
+
+logger = logging.getLogger(__name__)
+
+#: The version of the result log format written by
+#: :class:`ResultLogHandler`.
+RESULT_LOG_VERSION = 1
+
+_START_TEST_RUN = 'start_test_run'
+_RESULT = 'result'
+_FIXTURE_RESULT = 'fixture_result'
+_TEST_COUNT = 'test_count'
+_STOP_TEST_RUN = 'stop_test_run'
+
+# The number of consecutive results passed to the result handlers at
+# once when a result log is replayed.
+_REPLAY_BATCH_SIZE = 1000
+
+
+class ResultLogHandler(IResultHandlerPlugin):
+    """Write each test result to a file as soon as it is handled, so
+    that the results can be reported again with ``haas replay`` without
+    re-running the tests.
+
+    The file is in the JSON Lines format: each line is a JSON object
+    whose ``event`` is one of ``start_test_run``, ``result``,
+    ``fixture_result``, ``test_count`` or ``stop_test_run``.  Records are
+    only ever appended, and are flushed after each result or batch of
+    results, so that the log of an interrupted run can still be read.
+
+    Parameters
+    ----------
+    filename : str
+        The path of the result log.
+    test_count : int
+        The total number of tests, or ``None`` if it is not yet known.
+
+    """
+
+    def __init__(self, filename, test_count):
+        self.enabled = True
+        self.filename = filename
+        self._test_count = test_count
+        self._file = None
+
+    @classmethod
+    def from_args(cls, args, name, dest_prefix, test_count):
+        if args.result_log is not None:
+            return cls(args.result_log, test_count)
+
+    @classmethod
+    def add_parser_arguments(cls, parser, name, option_prefix, dest_prefix):
+        parser.add_argument('--result-log', default=None, metavar='FILE',
+                            help=('Write each test result to FILE as it '
+                                  'completes, to be reported again with '
+                                  '"haas replay FILE"'))
+
+    def _write(self, event, **record):
+        self._file.write(
+            json.dumps(dict(event=event, **record), separators=(',', ':')))
+        self._file.write('\n')
+
+    def start_test(self, test):
+        pass
+
+    def stop_test(self, test):
+        pass
+
+    def start_test_run(self):
+        self._file = open(self.filename, 'w', encoding='utf-8')
+        self._write(_START_TEST_RUN, version=RESULT_LOG_VERSION,
+                    haas_version=haas.__version__,
+                    test_count=self._test_count)
+        self._file.flush()
+
+    def stop_test_run(self):
+        self._write(_STOP_TEST_RUN)
+        self._file.close()
+        self._file = None
+
+    def __call__(self, result):
+        self._write(_RESULT, **result.to_dict())
+        self._file.flush()
+
+    def handle_results(self, results):
+        for result in results:
+            self._write(_RESULT, **result.to_dict())
+        self._file.flush()
+
+    def handle_fixture_result(self, fixture_result):
+        self._write(_FIXTURE_RESULT, **fixture_result.to_dict())
+        self._file.flush()
+
+    def update_test_count(self, test_count):
+        self._write(_TEST_COUNT, test_count=test_count)
+        self._file.flush()
+
+
+class ResultLogReader:
+    """Read a result log written by :class:`ResultLogHandler`.
+
+    Parameters
+    ----------
+    stream : file
+        The result log, opened in text mode.
+
+    Raises
+    ------
+    ValueError
+        If the stream is not a result log, or was written in a newer
+        format.
+
+    """
+
+    def __init__(self, stream):
+        self._stream = stream
+        try:
+            header = json.loads(stream.readline())
+        except ValueError:
+            header = None
+        if not isinstance(header, dict) or \
+                header.get('event') != _START_TEST_RUN:
+            raise ValueError('Not a haas result log: {0!r}'.format(
+                getattr(stream, 'name', stream)))
+        self.version = header['version']
+        if self.version > RESULT_LOG_VERSION:
+            raise ValueError(
+                'Unsupported result log version: {0}'.format(self.version))
+        self.test_count = header['test_count']
+
+    def __iter__(self):
+        """Generate the ``(event, value)`` pairs recorded after the start
+        of the test run, where the value is a
+        :class:`~haas.result.TestResult`, a
+        :class:`~haas.result.FixtureResult` or a test count.
+
+        """
+        for line in self._stream:
+            if not line.endswith('\n'):
+                # The run was interrupted while writing this record
+                logger.warning('Ignoring incomplete record at the end of '
+                               'the result log')
+                return
+            record = json.loads(line)
+            event = record.pop('event')
+            if event == _RESULT:
+                yield event, TestResult.from_dict(record)
+            elif event == _FIXTURE_RESULT:
+                yield event, FixtureResult.from_dict(record)
+            elif event == _TEST_COUNT:
+                yield event, record['test_count']
+            elif event == _STOP_TEST_RUN:
+                return
+            else:
+                logger.debug('Ignoring unknown result log event %r', event)
+
+    def replay(self, result_collector):
+        """Pass the recorded results to a
+        :class:`~haas.result.ResultCollector` as one test run.
+
+        Parameters
+        ----------
+        result_collector : haas.result.ResultCollector
+            The collector, to which the result handlers have been added.
+
+        """
+        result_collector.startTestRun()
+        try:
+            results = []
+            for event, value in self:
+                if event == _RESULT:
+                    results.append(value)
+                    if len(results) >= _REPLAY_BATCH_SIZE:
+                        result_collector.add_results(results)
+                        results = []
+                    continue
+                result_collector.add_results(results)
+                results = []
+                if event == _FIXTURE_RESULT:
+                    result_collector.add_fixture_result(value)
+                elif event == _TEST_COUNT:
+                    result_collector.update_test_count(value)
+            result_collector.add_results(results)
+        finally:
+            result_collector.stopTestRun()
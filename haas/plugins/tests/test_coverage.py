@@ -5,11 +5,18 @@
 # This software may be modified and distributed under the terms
 # of the 3-clause BSD license.  See the LICENSE.txt file for details.
 from unittest import mock
+import argparse
+import pickle
+import signal
 import unittest
 
+from haas.tests import _test_cases
+
 try:
     import coverage
-    from ..coverage import Coverage
+    from .. import parallel_runner
+    from ..coverage import (
+        Coverage, PerTestContextPlugin, _register_test_context_plugin)
 except ImportError:
     coverage = None
     Coverage = None
@@ -39,3 +46,127 @@ class TestCoverage(unittest.TestCase):
         cov.teardown()
         coverage_object.stop.assert_called_once_with()
         coverage_object.save.assert_called_once_with()
+
+    @mock.patch('coverage.coverage')
+    def test_coverage_test_contexts(self, coverage_func):
+        # Given
+        coverage_object = coverage_func.return_value
+        cov = Coverage('coverage', True, 'coverage', test_contexts=True)
+
+        # When
+        cov.setup()
+
+        # Then
+        coverage_func.assert_called_once_with(
+            plugins=[_register_test_context_plugin])
+        coverage_object.start.assert_called_once_with()
+        self.assertEqual(
+            parallel_runner._worker_initializers,
+            [(cov._start_in_worker, ())])
+
+        # When
+        cov.teardown()
+
+        # Then
+        self.assertEqual(parallel_runner._worker_initializers, [])
+        coverage_object.stop.assert_called_once_with()
+        coverage_object.combine.assert_called_once_with()
+        self.assertEqual(coverage_object.save.call_count, 2)
+
+    @mock.patch('coverage.coverage')
+    def test_start_in_worker(self, coverage_func):
+        # Given
+        parent_coverage = mock.Mock()
+        worker_coverage = mock.Mock()
+        coverage_func.side_effect = [parent_coverage, worker_coverage]
+        cov = Coverage('coverage', True, 'coverage', test_contexts=True)
+        cov.setup()
+        self.addCleanup(
+            parallel_runner.unregister_worker_initializer,
+            cov._start_in_worker)
+
+        # When
+        with mock.patch('haas.plugins.coverage.util') as util, \
+                mock.patch('signal.signal') as signal_func:
+            cov._start_in_worker()
+
+        # Then
+        parent_coverage.stop.assert_called_once_with()
+        coverage_func.assert_called_with(
+            data_suffix=True, plugins=[_register_test_context_plugin])
+        worker_coverage.start.assert_called_once_with()
+        util.Finalize.assert_called_once_with(
+            cov, Coverage._save_in_worker, exitpriority=100)
+        signal_func.assert_called_once_with(
+            signal.SIGTERM, cov._handle_sigterm)
+
+        # When
+        cov._save_in_worker()
+
+        # Then
+        worker_coverage.stop.assert_called_once_with()
+        worker_coverage.save.assert_called_once_with()
+        self.assertFalse(parent_coverage.save.called)
+
+    @mock.patch('coverage.coverage')
+    def test_start_in_spawned_worker(self, coverage_func):
+        # Given
+        cov = Coverage('coverage', True, 'coverage', test_contexts=True)
+        cov.setup()
+        self.addCleanup(
+            parallel_runner.unregister_worker_initializer,
+            cov._start_in_worker)
+        (initializer, args), = parallel_runner._worker_initializers
+        worker_coverage = mock.Mock()
+        coverage_func.reset_mock()
+        coverage_func.return_value = worker_coverage
+
+        # When
+        spawned_initializer = pickle.loads(pickle.dumps(initializer))
+        with mock.patch('haas.plugins.coverage.util'), \
+                mock.patch('signal.signal'):
+            spawned_initializer(*args)
+
+        # Then
+        coverage_func.assert_called_once_with(
+            data_suffix=True, plugins=[_register_test_context_plugin])
+        worker_coverage.start.assert_called_once_with()
+
+    def test_from_args_test_contexts_enables_plugin(self):
+        # Given
+        args = argparse.Namespace(
+            with_coverage=False, coverage_test_contexts=True)
+
+        # When
+        cov = Coverage.from_args(args, 'coverage', 'coverage')
+
+        # Then
+        self.assertTrue(cov.enabled)
+        self.assertTrue(cov.test_contexts)
+
+
+@unittest.skipIf(coverage is None, 'Coverage is not installed')
+class TestPerTestContextPlugin(unittest.TestCase):
+
+    def test_context_for_test_case_run(self):
+        # Given
+        case = _test_cases.TestCase('test_method')
+        frame = mock.Mock(
+            f_code=unittest.TestCase.run.__code__, f_locals={'self': case})
+
+        # When
+        context = PerTestContextPlugin().dynamic_context(frame)
+
+        # Then
+        self.assertEqual(context, case.id())
+
+    def test_no_context_for_other_frames(self):
+        # Given
+        frame = mock.Mock(
+            f_code=_test_cases.TestCase.test_method.__code__, f_locals={})
+
+        # When
+        context = PerTestContextPlugin().dynamic_context(frame)
+
+        # Then
+        self.assertIsNone(context)
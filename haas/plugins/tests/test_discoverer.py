@@ -4,6 +4,7 @@
 #
 # This software may be modified and distributed under the terms
 # of the 3-clause BSD license.  See the LICENSE.txt file for details.
+from io import StringIO
 from unittest import mock
 import os
 import shutil
@@ -14,8 +15,9 @@ import unittest
 from haas.tests import _test_cases, builder
 from haas.loader import Loader
 from haas.module_import_error import ModuleImportError
-from haas.suite import find_test_cases, TestSuite
-from haas.utils import cd
+from haas.suite import (
+    find_test_cases, LazyTestSuite, TestSuite, unique_tests)
+from haas.utils import CACHE_DIRECTORY, cd
 from haas.plugins import discoverer
 from ..discoverer import (
     Discoverer,
@@ -161,6 +163,38 @@ class TestFindModuleByName(TestDiscoveryMixin, unittest.TestCase):
         with self.assertRaises(ImportError):
             find_module_by_name('no_module')
 
+    def test_test_method_in_project(self):
+        module_name = '.'.join(self.dirs + ['test_cases'])
+        test_name = '.'.join([module_name, 'TestCase', 'test_method'])
+        try:
+            with mock.patch.object(
+                    discoverer, 'find_spec',
+                    wraps=discoverer.find_spec) as find_spec:
+                module, case_attributes = find_module_by_name(test_name)
+            self.assertEqual(module.__name__, module_name)
+            self.assertEqual(case_attributes, ['TestCase', 'test_method'])
+            self.assertEqual(
+                [call[0][0] for call in find_spec.call_args_list],
+                [self.dirs[0], '.'.join(self.dirs), module_name])
+
+            # Resolution is cached while the module remains imported
+            with mock.patch.object(discoverer, 'find_spec') as find_spec:
+                module, case_attributes = find_module_by_name(test_name)
+            self.assertFalse(find_spec.called)
+            self.assertEqual(module.__name__, module_name)
+            self.assertEqual(case_attributes, ['TestCase', 'test_method'])
+        finally:
+            del sys.modules[module_name]
+
+    def test_module_with_import_error(self):
+        path = os.path.join(self.tmpdir, *self.dirs)
+        with open(os.path.join(path, 'test_broken.py'), 'w') as fh:
+            fh.write('import haas.i_dont_exist\n')
+        module_name = '.'.join(self.dirs + ['test_broken'])
+        with self.assertRaises(ImportError):
+            find_module_by_name('{0}.TestCase'.format(module_name))
+        self.assertNotIn(module_name, sys.modules)
+
 
 class TestFilterTestSuite(unittest.TestCase):
 
@@ -554,6 +588,25 @@ class TestDiscovererImportError(unittest.TestCase):
         suite.run(result)
         self.assertEqual(len(result.errors), 1)
 
+    def test_unique_tests_keeps_all_import_errors(self):
+        # Given
+        module_path = os.path.join(
+            self.tempdir, 'fixture', 'package', 'test_broken.py')
+        with open(module_path, 'w') as fh:
+            fh.write('import haas.i_dont_exist_either\n')
+        with cd(self.tempdir):
+            suite = Discoverer(Loader()).discover(
+                self.tempdir, self.tempdir)
+
+        # When
+        tests = list(find_test_cases(TestSuite(unique_tests([suite]))))
+
+        # Then
+        import_errors = [
+            test for test in tests if isinstance(test, ModuleImportError)]
+        self.assertEqual(len(import_errors), 2)
+        self.assertEqual(len(tests), 4)
+
 
 class TestDiscovererNonPackageImport(unittest.TestCase):
 
@@ -878,3 +931,313 @@ class TestDiscovererExceptionOnModuleImport(unittest.TestCase):
         case, = find_test_cases(suite)
         self.assertIsInstance(case, ModuleImportError)
         self.assertEqual(case._testMethodName, 'test_error')
+
+
+class TestDiscovererExcludedPaths(unittest.TestCase):
+
+    def setUp(self):
+        self.modules = sys.modules.copy()
+        self.tempdir = tempfile.mkdtemp(prefix='haas-tests-')
+        self.klass = klass = builder.Class(
+            'TestSomething',
+            (
+                builder.Method('test_method'),
+            ),
+        )
+        self.packages = (
+            builder.Package(
+                'included', (builder.Module('test_included.py', (klass,)),
+                             builder.Module('test_slow.py', (klass,)))),
+            builder.Package(
+                'venv', (builder.Module('test_venv.py', (klass,)),)),
+            builder.Package(
+                'ignored', (builder.Module('test_ignored.py', (klass,)),)),
+        )
+
+    def tearDown(self):
+        if self.tempdir in sys.path:
+            sys.path.remove(self.tempdir)
+        modules_to_remove = [key for key in sys.modules
+                             if key not in self.modules]
+        for key in modules_to_remove:
+            del sys.modules[key]
+        del self.modules
+        shutil.rmtree(self.tempdir)
+
+    def _create(self, ignore_lines=None):
+        contents = self.packages
+        if ignore_lines is not None:
+            ignore_file = builder.Module(
+                discoverer.IGNORE_FILENAME,
+                (builder.RawText('', '\n'.join(ignore_lines)),))
+            contents = contents + (ignore_file,)
+        builder.Package('fixture', contents).create(self.tempdir)
+
+    def _discover(self, start=None, **kwargs):
+        if start is None:
+            start = self.tempdir
+        with cd(self.tempdir):
+            suite = Discoverer(Loader(), **kwargs).discover(
+                start, self.tempdir)
+        return sorted(type(case).__module__
+                      for case in find_test_cases(suite))
+
+    def test_default_excludes_venv(self):
+        # Given
+        self._create()
+
+        # When
+        modules = self._discover()
+
+        # Then
+        self.assertEqual(modules, [
+            'fixture.ignored.test_ignored',
+            'fixture.included.test_included',
+            'fixture.included.test_slow',
+        ])
+
+    def test_build_package_discovered(self):
+        # Given
+        self.packages += (
+            builder.Package(
+                'build', (builder.Module('test_build.py', (self.klass,)),)),
+            builder.Directory(
+                'dist', (builder.Module('test_dist.py', (self.klass,)),)),
+        )
+        self._create()
+
+        # When
+        modules = self._discover()
+
+        # Then
+        self.assertEqual(modules, [
+            'fixture.build.test_build',
+            'fixture.ignored.test_ignored',
+            'fixture.included.test_included',
+            'fixture.included.test_slow',
+        ])
+
+    def test_ignore_file(self):
+        # Given
+        self._create(['# Comment', '', 'ignored/', 'test_slow.py'])
+
+        # When
+        modules = self._discover()
+
+        # Then
+        self.assertEqual(modules, ['fixture.included.test_included'])
+
+    def test_ignore_file_applies_below_start_directory(self):
+        # Given
+        self._create(['test_slow.py'])
+
+        # When
+        modules = self._discover(
+            os.path.join(self.tempdir, 'fixture', 'included'))
+
+        # Then
+        self.assertEqual(modules, ['fixture.included.test_included'])
+
+    def test_ignore_file_anchored_pattern(self):
+        # Given
+        self._create(['/included/test_slow.py'])
+
+        # When
+        modules = self._discover()
+
+        # Then
+        self.assertEqual(modules, [
+            'fixture.ignored.test_ignored',
+            'fixture.included.test_included',
+        ])
+
+    def test_ignore_file_reinclude_default(self):
+        # Given
+        self._create(['!venv'])
+
+        # When
+        modules = self._discover()
+
+        # Then
+        self.assertEqual(modules, [
+            'fixture.ignored.test_ignored',
+            'fixture.included.test_included',
+            'fixture.included.test_slow',
+            'fixture.venv.test_venv',
+        ])
+
+    def test_exclude_argument(self):
+        # Given
+        self._create()
+
+        # When
+        modules = self._discover(exclude=('ignored', 'test_slow*'))
+
+        # Then
+        self.assertEqual(modules, [
+            'fixture.included.test_included',
+            'fixture.venv.test_venv',
+        ])
+
+    def test_stream_imports_modules_lazily(self):
+        # Given
+        self._create()
+
+        # When
+        with cd(self.tempdir):
+            suite = Discoverer(Loader(), stream=True).discover(
+                self.tempdir, self.tempdir)
+
+        # Then
+        self.assertIsInstance(suite, LazyTestSuite)
+        self.assertNotIn('fixture.included.test_included', sys.modules)
+        modules = sorted(type(case).__module__
+                         for case in find_test_cases(suite))
+        self.assertEqual(modules, [
+            'fixture.ignored.test_ignored',
+            'fixture.included.test_included',
+            'fixture.included.test_slow',
+        ])
+        self.assertTrue(suite.is_complete)
+
+    def test_profile_imports(self):
+        # Given
+        self._create()
+        path = os.path.join(self.tempdir, 'profile.txt')
+
+        # When
+        with mock.patch('sys.stderr', new_callable=StringIO) as stderr:
+            modules = self._discover(
+                profile_imports=2, import_profile_file=path)
+
+        # Then
+        self.assertEqual(len(modules), 3)
+        output = stderr.getvalue()
+        self.assertIn('Imported 3 test modules', output)
+        self.assertIn('2 slowest test module imports', output)
+        self.assertIn(path, output)
+        self.assertTrue(os.path.isfile(path))
+
+
+class TestDiscoverFilteredTestsIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.modules = sys.modules.copy()
+        self.tempdir = tempfile.mkdtemp(prefix='haas-tests-')
+        module1 = builder.Module(
+            'test_one.py',
+            (
+                builder.Class('TestOne', (builder.Method('test_method'),)),
+            ),
+        )
+        module2 = builder.Module(
+            'test_two.py',
+            (
+                builder.Class('TestTwo', (builder.Method('test_method'),)),
+            ),
+        )
+        fixture = builder.Package('fixture', (module1, module2))
+        fixture.create(self.tempdir)
+
+    def tearDown(self):
+        if self.tempdir in sys.path:
+            sys.path.remove(self.tempdir)
+        self._unimport()
+        del self.modules
+        shutil.rmtree(self.tempdir)
+
+    def _unimport(self):
+        modules_to_remove = [key for key in sys.modules
+                             if key not in self.modules]
+        for key in modules_to_remove:
+            del sys.modules[key]
+
+    def _discover(self, filter_name, loader=None, **kwargs):
+        self._unimport()
+        if loader is None:
+            loader = Loader()
+        suite = Discoverer(loader, **kwargs).discover_filtered_tests(
+            filter_name, top_level_directory=self.tempdir)
+        return [type(case).__name__ for case in find_test_cases(suite)]
+
+    def test_index_skips_non_matching_modules(self):
+        # Given
+        self.assertEqual(self._discover('TestOne'), ['TestOne'])
+        self.assertIn('fixture.test_two', sys.modules)
+
+        # When
+        tests = self._discover('TestOne')
+
+        # Then
+        self.assertEqual(tests, ['TestOne'])
+        self.assertIn('fixture.test_one', sys.modules)
+        self.assertNotIn('fixture.test_two', sys.modules)
+
+    def test_index_reimports_changed_modules(self):
+        # Given
+        self.assertEqual(self._discover('TestOne'), ['TestOne'])
+        module_path = os.path.join(self.tempdir, 'fixture', 'test_two.py')
+        with open(module_path, 'a') as fh:
+            fh.write('\n\nclass TestOne(TestTwo):\n    pass\n')
+
+        # When
+        tests = self._discover('TestOne')
+
+        # Then
+        self.assertEqual(sorted(tests), ['TestOne', 'TestOne'])
+
+    def test_index_tracks_base_class_modules(self):
+        # Given
+        base = os.path.join(self.tempdir, 'fixture', 'base.py')
+        with open(base, 'w') as fh:
+            fh.write('import unittest\n\n\nclass Base(unittest.TestCase):\n'
+                     '    pass\n')
+        module_path = os.path.join(self.tempdir, 'fixture', 'test_three.py')
+        with open(module_path, 'w') as fh:
+            fh.write('from .base import Base\n\n\nclass TestThree(Base):\n'
+                     '    pass\n')
+        self.assertEqual(self._discover('test_inherited'), [])
+
+        # When
+        with open(base, 'a') as fh:
+            fh.write('\n    def test_inherited(self):\n        pass\n')
+        tests = self._discover('test_inherited')
+
+        # Then
+        self.assertIn('TestThree', tests)
+
+    def test_index_not_used_with_other_loader_options(self):
+        # Given
+        base = os.path.join(self.tempdir, 'fixture', 'base.py')
+        with open(base, 'w') as fh:
+            fh.write('import unittest\n\n\nclass Base(unittest.TestCase):\n'
+                     '    def test_base(self):\n        pass\n')
+        module_path = os.path.join(self.tempdir, 'fixture', 'test_three.py')
+        with open(module_path, 'w') as fh:
+            fh.write('from .base import Base\n')
+        self.assertEqual(
+            self._discover('Base.test_base',
+                           loader=Loader(load_imported_cases=False)),
+            [])
+
+        # When
+        tests = self._discover('Base.test_base')
+
+        # Then
+        self.assertEqual(tests, ['Base'])
+
+        # When
+        tests = self._discover(
+            'Base.test_base', loader=Loader(test_method_prefix='check'))
+
+        # Then
+        self.assertEqual(tests, [])
+
+    def test_discover_without_cache(self):
+        # When
+        tests = self._discover('TestOne', use_cache=False)
+
+        # Then
+        self.assertEqual(tests, ['TestOne'])
+        self.assertFalse(
+            os.path.exists(os.path.join(self.tempdir, CACHE_DIRECTORY)))
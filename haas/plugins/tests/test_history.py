@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2013-2014 Simon Jagoe
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the 3-clause BSD license.  See the LICENSE.txt file for details.
+from argparse import ArgumentParser, Namespace
+from io import StringIO
+from unittest import mock
+import os
+import shutil
+import tempfile
+import unittest
+
+from stevedore.extension import ExtensionManager, Extension
+from testfixtures import LogCapture
+
+import haas
+from haas.haas_application import HaasApplication
+from haas.history import HistoryDatabase
+from haas.plugin_manager import PluginManager
+from haas.result import TestCompletionStatus, TestDuration, TestResult
+from haas.tests import _test_cases
+from haas.utils import CACHE_DIRECTORY, cd
+from ..history import HistoryResultHandler
+from ..result_log import ResultLogHandler
+
+_TEST_ID = 'haas.tests._test_cases.TestCase.test_method'
+
+
+def _create_result(status=TestCompletionStatus.success, duration_ns=1000):
+    return TestResult(
+        _test_cases.TestCase, 'test_method', status,
+        TestDuration.from_nanoseconds(duration_ns))
+
+
+class TestHistoryResultHandler(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp(prefix='haas-tests-')
+        self.path = os.path.join(self.tempdir, 'history.sqlite')
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def _parse_args(self, *args):
+        parser = ArgumentParser()
+        HistoryResultHandler.add_parser_arguments(
+            parser, 'history', '--with-history', 'history')
+        return parser.parse_args(args)
+
+    def test_from_args(self):
+        # When
+        handler = HistoryResultHandler.from_args(
+            self._parse_args(), 'history', 'history', 1)
+
+        # Then
+        self.assertIsNone(handler)
+
+        # When
+        handler = HistoryResultHandler.from_args(
+            self._parse_args('--history-db', self.path),
+            'history', 'history', 1)
+
+        # Then
+        self.assertEqual(handler.path, self.path)
+
+        # When
+        with cd(self.tempdir):
+            handler = HistoryResultHandler.from_args(
+                self._parse_args('--history'), 'history', 'history', 1)
+
+        # Then
+        self.assertEqual(os.path.basename(handler.path), 'history.sqlite')
+
+    def test_from_args_project_directory(self):
+        # Given
+        package = os.path.join(self.tempdir, 'package')
+        os.makedirs(package)
+        with open(os.path.join(package, '__init__.py'), 'w'):
+            pass
+        expected_path = os.path.join(
+            self.tempdir, CACHE_DIRECTORY, 'history.sqlite')
+        args = Namespace(history=True, history_db=None,
+                         top_level_directory=None, start=[package])
+
+        # When
+        with cd(package):
+            handler = HistoryResultHandler.from_args(
+                args, 'history', 'history', 1)
+
+        # Then
+        self.assertEqual(handler.path, expected_path)
+
+        # When
+        other = os.path.join(self.tempdir, 'other')
+        args = Namespace(history=True, history_db=None,
+                         top_level_directory=other, start=['package'])
+        handler = HistoryResultHandler.from_args(
+            args, 'history', 'history', 1)
+
+        # Then
+        self.assertEqual(
+            handler.path,
+            os.path.join(other, CACHE_DIRECTORY, 'history.sqlite'))
+
+    def test_records_run(self):
+        # Given
+        handler = HistoryResultHandler(self.path, None)
+
+        # When
+        handler.start_test_run()
+        handler(_create_result())
+        handler.handle_results([
+            _create_result(TestCompletionStatus.skipped),
+            _create_result(TestCompletionStatus.error)])
+        handler.update_test_count(3)
+        handler.stop_test_run()
+
+        # Then
+        with HistoryDatabase(self.path) as database:
+            (run,) = database.get_runs()
+            trend = database.get_duration_trend(_TEST_ID)
+        self.assertEqual(run[3:], (3, False))
+        self.assertEqual(
+            [status for _, _, status, _ in trend],
+            [TestCompletionStatus.success, TestCompletionStatus.skipped,
+             TestCompletionStatus.error])
+
+    def test_replay_not_recorded(self):
+        # Given
+        log_path = os.path.join(self.tempdir, 'results.jsonl')
+        log_handler = ResultLogHandler(log_path, 1)
+        log_handler.start_test_run()
+        log_handler(_create_result())
+        log_handler.stop_test_run()
+        plugin_manager = PluginManager.testing_plugin_manager(
+            hook_managers=[(
+                PluginManager.RESULT_HANDLERS,
+                ExtensionManager.make_test_instance(
+                    [Extension('history', None, HistoryResultHandler, None)],
+                    namespace=PluginManager.RESULT_HANDLERS),
+            )],
+            driver_managers=[],
+        )
+        app = HaasApplication(
+            ['haas', 'replay', '--history-db', self.path, log_path])
+
+        # When
+        with LogCapture(haas.__name__) as log_capture:
+            exit_status = app.run(plugin_manager=plugin_manager)
+
+        # Then
+        self.assertFalse(exit_status)
+        self.assertFalse(os.path.exists(self.path))
+        log_capture.check(
+            ('haas.plugins.history', 'WARNING',
+             'Replayed results are not recorded in the history'))
+
+    def test_commits_in_batches(self):
+        # Given
+        handler = HistoryResultHandler(self.path, 3)
+        handler.commit_interval = 2
+        handler.start_test_run()
+
+        # When
+        with mock.patch.object(handler._database, 'commit') as commit:
+            handler(_create_result())
+
+            # Then
+            self.assertFalse(commit.called)
+
+            # When
+            handler(_create_result())
+
+            # Then
+            commit.assert_called_once_with()
+
+        # When
+        handler.stop_test_run()
+
+        # Then
+        with HistoryDatabase(self.path) as database:
+            self.assertEqual(database.get_runs()[0][3:], (3, True))
+
+
+class TestHaasHistory(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp(prefix='haas-tests-')
+        self.path = os.path.join(self.tempdir, 'history.sqlite')
+        with HistoryDatabase(self.path) as database:
+            for status in (TestCompletionStatus.success,
+                           TestCompletionStatus.failure):
+                run_id = database.start_run()
+                database.add_results(
+                    run_id, [_create_result(status, duration_ns=2 * 10 ** 9)])
+                database.finish_run(run_id, True)
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def _history(self, *args):
+        stream = StringIO()
+        app = HaasApplication(
+            ['haas', 'history', '--db', self.path] + list(args))
+        app._history(stream)
+        return stream.getvalue().splitlines()
+
+    def test_slowest(self):
+        # When
+        lines = self._history('slowest', '-n', '1')
+
+        # Then
+        self.assertEqual(lines, ['00:02.000     2 runs  ' + _TEST_ID])
+
+    def test_flaky(self):
+        # When
+        lines = self._history('flaky')
+
+        # Then
+        self.assertEqual(lines, ['   1 passed     1 failed  ' + _TEST_ID])
+
+    def test_trend(self):
+        # When
+        lines = self._history('--runs', '1', 'trend', _TEST_ID)
+
+        # Then
+        self.assertEqual(len(lines), 1)
+        self.assertTrue(lines[0].startswith('     2  '))
+        self.assertTrue(lines[0].endswith('  00:02.000  failure'))
+
+    def test_default_database_in_top_level_directory(self):
+        # Given
+        package = os.path.join(self.tempdir, 'package')
+        os.makedirs(os.path.join(self.tempdir, CACHE_DIRECTORY))
+        os.makedirs(package)
+        with open(os.path.join(package, '__init__.py'), 'w'):
+            pass
+        os.rename(self.path, os.path.join(
+            self.tempdir, CACHE_DIRECTORY, 'history.sqlite'))
+        stream = StringIO()
+
+        # When
+        with cd(package):
+            HaasApplication(['haas', 'history', 'flaky'])._history(stream)
+            HaasApplication(
+                ['haas', 'history', '-t', self.tempdir, 'flaky'],
+            )._history(stream)
+
+        # Then
+        self.assertEqual(
+            stream.getvalue().splitlines(),
+            ['   1 passed     1 failed  ' + _TEST_ID] * 2)
+
+    def test_missing_database(self):
+        # Given
+        app = HaasApplication(['haas', 'history', '--db',
+                               os.path.join(self.tempdir, 'missing'),
+                               'flaky'])
+
+        # When/Then
+        with mock.patch('sys.stderr', new_callable=StringIO):
+            with self.assertRaises(SystemExit):
+                app.run()
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2013-2014 Simon Jagoe
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the 3-clause BSD license.  See the LICENSE.txt file for details.
+from importlib import import_module
+from io import StringIO
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from haas.tests import builder
+from ..import_profiler import (
+    ImportProfiler, _ProfilingFinder, _TimedLoader)
+
+
+class TestImportProfiler(unittest.TestCase):
+
+    def setUp(self):
+        self.modules = sys.modules.copy()
+        self.tempdir = tempfile.mkdtemp(prefix='haas-tests-')
+        fixture = builder.Package(
+            'profiled',
+            (
+                builder.Module(
+                    'heavy.py', (builder.RawText('', 'VALUE = 1'),)),
+                builder.Module(
+                    'test_heavy.py',
+                    (builder.RawText('', 'from . import heavy'),)),
+                builder.Module(
+                    'test_light.py',
+                    (builder.RawText('', 'from . import heavy'),)),
+            ),
+        )
+        fixture.create(self.tempdir)
+        sys.path.insert(0, self.tempdir)
+
+    def tearDown(self):
+        sys.path.remove(self.tempdir)
+        for key in [key for key in sys.modules if key not in self.modules]:
+            del sys.modules[key]
+        shutil.rmtree(self.tempdir)
+
+    def _profile(self, profiler, module_name):
+        with profiler.profile(module_name):
+            return import_module(module_name)
+
+    def test_nested_imports_attributed_to_test_module(self):
+        # Given
+        profiler = ImportProfiler()
+
+        # When
+        self._profile(profiler, 'profiled.test_heavy')
+        self._profile(profiler, 'profiled.test_light')
+
+        # Then
+        heavy, light = profiler.timings
+        self.assertEqual(heavy.name, 'profiled.test_heavy')
+        self.assertEqual(
+            [child.name for child in heavy.children],
+            ['profiled', 'profiled.heavy'])
+        self.assertGreaterEqual(
+            heavy.duration, sum(child.duration for child in heavy.children))
+        self.assertEqual(light.name, 'profiled.test_light')
+        self.assertEqual(light.children, [])
+
+    def test_module_loader_restored(self):
+        # Given
+        profiler = ImportProfiler()
+
+        # When
+        module = self._profile(profiler, 'profiled.test_heavy')
+
+        # Then
+        self.assertNotIsInstance(module.__loader__, _TimedLoader)
+        self.assertIs(module.__spec__.loader, module.__loader__)
+        self.assertFalse(any(isinstance(finder, _ProfilingFinder)
+                             for finder in sys.meta_path))
+
+    def test_write_report(self):
+        # Given
+        profiler = ImportProfiler()
+        self._profile(profiler, 'profiled.test_heavy')
+        self._profile(profiler, 'profiled.test_light')
+        stream = StringIO()
+        path = os.path.join(self.tempdir, 'profile.txt')
+
+        # When
+        profiler.write_report(stream, 1, path)
+
+        # Then
+        output = stream.getvalue()
+        self.assertRegex(output, r'Imported 2 test modules in \d')
+        self.assertRegex(output, r'1 slowest test module imports\n'
+                                 r'\(\d+\.\d+s\) profiled\.test_heavy\n')
+        with open(path) as fh:
+            lines = fh.read().splitlines()
+        self.assertEqual(len(lines), 5)
+        self.assertTrue(lines[1].endswith('| profiled.test_heavy'))
+        self.assertTrue(lines[2].endswith('|   profiled'))
+        self.assertTrue(lines[3].endswith('|   profiled.heavy'))
+        self.assertTrue(lines[4].endswith('| profiled.test_light'))
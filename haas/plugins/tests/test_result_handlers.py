@@ -4,7 +4,8 @@ from unittest import mock
 import statistics
 import unittest
 
-from haas.result import TestResult, TestCompletionStatus, TestDuration
+from haas.result import (
+    FixtureResult, TestResult, TestCompletionStatus, TestDuration)
 from haas.tests import _test_cases
 from haas.tests.fixtures import ExcInfoFixture
 from ..result_handler import (
@@ -344,6 +345,34 @@ class TestTimingResultHandler(ExcInfoFixture, unittest.TestCase):
             output.replace('\n', ''), r'--+.*?00:09\.123 test_method \(')
         self.assertIn(expected_stats, output)
 
+    @mock.patch('sys.stderr', new_callable=StringIO)
+    def test_output_slowest_fixtures(self, stderr):
+        # Given
+        start_time = datetime(2015, 12, 23, 8, 14, 12)
+        duration = TestDuration(start_time, start_time + timedelta(seconds=1))
+        case = _test_cases.TestCase('test_method')
+        handler = TimingResultHandler(number_to_summarize=1)
+        handler.start_test_run()
+        handler(TestResult.from_test_case(
+            case, TestCompletionStatus.success, duration))
+        handler.handle_fixture_result(FixtureResult(
+            'setUpModule', 'package.module',
+            TestDuration(timedelta(seconds=2, milliseconds=500))))
+        handler.handle_fixture_result(FixtureResult(
+            'setUpClass', 'package.module.Case',
+            TestDuration(timedelta(seconds=4, milliseconds=250))))
+
+        # When
+        handler.stop_test_run()
+
+        # Then
+        output = stderr.getvalue()
+        fixture_report = output[output.index('Fixture timing report'):]
+        self.assertIn(
+            '00:04.250 setUpClass (package.module.Case)', fixture_report)
+        self.assertNotIn('setUpModule', fixture_report)
+        self.assertIn('00:06.750 total in 2 fixtures', fixture_report)
+
 
 class TestSortResultHandlers(unittest.TestCase):
 
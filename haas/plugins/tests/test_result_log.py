@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2013-2014 Simon Jagoe
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the 3-clause BSD license.  See the LICENSE.txt file for details.
+from argparse import ArgumentParser
+from io import StringIO
+from unittest import mock
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from stevedore.extension import ExtensionManager, Extension
+
+from haas.haas_application import HaasApplication
+from haas.plugin_manager import PluginManager
+from haas.result import (
+    ClockAnchor, FixtureResult, ResultCollector, TestCompletionStatus,
+    TestDuration, TestResult)
+from haas.tests import _test_cases
+from haas.tests.fixtures import ExcInfoFixture
+from ..i_result_handler_plugin import IResultHandlerPlugin
+from ..result_log import ResultLogHandler, ResultLogReader
+
+
+def _create_result(status=TestCompletionStatus.success, **kwargs):
+    case = _test_cases.TestCase('test_method')
+    duration = TestDuration.from_counter(0, 1500, ClockAnchor())
+    return TestResult.from_test_case(case, status, duration, **kwargs)
+
+
+class TestResultLog(ExcInfoFixture, unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp(prefix='haas-tests-')
+        self.filename = os.path.join(self.tempdir, 'results.jsonl')
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def _read_records(self):
+        with open(self.filename, encoding='utf-8') as fh:
+            return [json.loads(line) for line in fh]
+
+    def test_from_args(self):
+        # Given
+        parser = ArgumentParser()
+        ResultLogHandler.add_parser_arguments(
+            parser, 'result_log', '--with-result-log', 'result_log')
+
+        # When
+        handler = ResultLogHandler.from_args(
+            parser.parse_args([]), 'result_log', 'result_log', 3)
+
+        # Then
+        self.assertIsNone(handler)
+
+        # When
+        handler = ResultLogHandler.from_args(
+            parser.parse_args(['--result-log', self.filename]),
+            'result_log', 'result_log', 3)
+
+        # Then
+        self.assertEqual(handler.filename, self.filename)
+
+    def test_results_written_as_handled(self):
+        # Given
+        handler = ResultLogHandler(self.filename, 2)
+        result = _create_result()
+
+        # When
+        handler.start_test_run()
+        handler(result)
+
+        # Then
+        records = self._read_records()
+        self.assertEqual([record['event'] for record in records],
+                         ['start_test_run', 'result'])
+        self.assertEqual(records[0]['test_count'], 2)
+        self.assertEqual(records[1]['test_method_name'], 'test_method')
+
+        # When
+        handler.stop_test_run()
+
+        # Then
+        self.assertEqual(self._read_records()[-1],
+                         {'event': 'stop_test_run'})
+
+    def test_round_trip(self):
+        # Given
+        with self.failure_exc_info() as exc_info:
+            failure = _create_result(
+                TestCompletionStatus.failure, exception=exc_info)
+        skip = _create_result(TestCompletionStatus.skipped, message='reason')
+        fixture_result = FixtureResult(
+            'setUpClass', 'module.Class', TestDuration.from_nanoseconds(5))
+        handler = ResultLogHandler(self.filename, None)
+
+        # When
+        handler.start_test_run()
+        handler.handle_results([failure, skip])
+        handler.handle_fixture_result(fixture_result)
+        handler.update_test_count(2)
+        handler.stop_test_run()
+        with open(self.filename, encoding='utf-8') as fh:
+            reader = ResultLogReader(fh)
+            events = list(reader)
+
+        # Then
+        self.assertIsNone(reader.test_count)
+        self.assertEqual(events, [
+            ('result', failure),
+            ('result', skip),
+            ('fixture_result', fixture_result),
+            ('test_count', 2),
+        ])
+        self.assertEqual(events[0][1].exception, failure.exception)
+
+    def test_incomplete_record_ignored(self):
+        # Given
+        handler = ResultLogHandler(self.filename, 2)
+        handler.start_test_run()
+        handler.handle_results([_create_result(), _create_result()])
+        handler._file.close()
+        with open(self.filename, encoding='utf-8') as fh:
+            text = fh.read()
+
+        # When
+        with mock.patch('haas.plugins.result_log.logger') as logger:
+            reader = ResultLogReader(StringIO(text[:-10]))
+            events = list(reader)
+
+        # Then
+        self.assertEqual(events, [('result', _create_result())])
+        self.assertTrue(logger.warning.called)
+
+    def test_not_a_result_log(self):
+        # When/Then
+        with self.assertRaisesRegex(ValueError, 'Not a haas result log'):
+            ResultLogReader(StringIO('{"a": 1}\n'))
+        with self.assertRaisesRegex(ValueError, 'Not a haas result log'):
+            ResultLogReader(StringIO(''))
+        with self.assertRaisesRegex(ValueError, 'version'):
+            ResultLogReader(StringIO(
+                '{"event": "start_test_run", "version": 100}\n'))
+
+    def test_replay(self):
+        # Given
+        results = [_create_result(),
+                   _create_result(TestCompletionStatus.error)]
+        log = StringIO()
+        handler = ResultLogHandler(self.filename, 2)
+        handler._file = log
+        handler._write('start_test_run', version=1, test_count=2)
+        handler.handle_results(results)
+        handler._write('stop_test_run')
+        recording_handler = mock.Mock(spec=IResultHandlerPlugin)
+        collector = ResultCollector()
+        collector.add_result_handler(recording_handler)
+
+        # When
+        log.seek(0)
+        ResultLogReader(log).replay(collector)
+
+        # Then
+        recording_handler.start_test_run.assert_called_once_with()
+        recording_handler.handle_results.assert_called_once_with(results)
+        recording_handler.stop_test_run.assert_called_once_with()
+        self.assertEqual(collector.testsRun, 2)
+        self.assertFalse(collector.wasSuccessful())
+
+    def test_haas_replay(self):
+        # Given
+        handler = ResultLogHandler(self.filename, 1)
+        handler.start_test_run()
+        handler(_create_result(TestCompletionStatus.skipped, message='x'))
+        handler.stop_test_run()
+
+        recording_handler = mock.Mock(spec=IResultHandlerPlugin)
+        recording_handler.enabled = True
+        handler_class = mock.Mock()
+        handler_class.from_args.return_value = recording_handler
+        plugin_manager = PluginManager.testing_plugin_manager(
+            hook_managers=[(
+                PluginManager.RESULT_HANDLERS,
+                ExtensionManager.make_test_instance(
+                    [Extension('recording', None, handler_class, None)],
+                    namespace=PluginManager.RESULT_HANDLERS),
+            )],
+            driver_managers=[],
+        )
+        app = HaasApplication(['haas', 'replay', '-q', self.filename])
+
+        # When
+        exit_status = app.run(plugin_manager=plugin_manager)
+
+        # Then
+        self.assertFalse(exit_status)
+        (args, _, _), kwargs = handler_class.from_args.call_args
+        self.assertEqual(args.verbosity, 0)
+        self.assertEqual(kwargs, {'test_count': 1})
+        (results,), _ = recording_handler.handle_results.call_args
+        self.assertEqual([result.message for result in results], ['x'])
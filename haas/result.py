@@ -4,17 +4,21 @@
 #
 # This software may be modified and distributed under the terms
 # of the 3-clause BSD license.  See the LICENSE.txt file for details.
+from array import array
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 from enum import Enum
 from functools import wraps
-import locale
+import heapq
 import sys
+import time
 import traceback
+import unittest
 import warnings
 
-from io import StringIO
-
+from .capture import DEFAULT_BUFFER_LIMIT, CaptureBuffer, FdCapture
 from .error_holder import ErrorHolder
+from .handler_thread import DEFAULT_QUEUE_SIZE, HandlerThread, handle_results
 
 
 if sys.version_info >= (3, 12):
@@ -71,86 +75,385 @@ def _count_relevant_tb_levels(tb):
     return length
 
 
-def _decode(line, encoding):
-    if isinstance(line, str):
-        return line
+#: The default number of frames rendered from each traceback.
+DEFAULT_FRAME_LIMIT = 100
+
+#: The default number of characters of a rendered traceback, excluding
+#: any captured output.
+DEFAULT_TRACEBACK_SIZE_LIMIT = 64 * 1024
+
+_TRACEBACK_HEADER = 'Traceback (most recent call last):\n'
+_CAUSE_MESSAGE = (
+    '\nThe above exception was the direct cause '
+    'of the following exception:\n\n')
+_CONTEXT_MESSAGE = (
+    '\nDuring handling of the above exception, '
+    'another exception occurred:\n\n')
+_FRAMES_OMITTED_LINE = '  [... {0} frames omitted ...]\n'
+_TRACEBACK_OMITTED_LINE = '\n[... {0} characters omitted ...]\n'
+
+
+if sys.version_info >= (3, 11):
+    def _compact_frame(frame):
+        return (frame.filename, frame.lineno, frame.name,
+                frame.end_lineno, frame.colno, frame.end_colno)
+
+    def _frame_summary(frame):
+        filename, lineno, name, end_lineno, colno, end_colno = frame
+        return traceback.FrameSummary(
+            filename, lineno, name, lookup_line=False,
+            end_lineno=end_lineno, colno=colno, end_colno=end_colno)
+else:  # pragma: no cover
+    def _compact_frame(frame):
+        return (frame.filename, frame.lineno, frame.name)
+
+    def _frame_summary(frame):
+        filename, lineno, name = frame
+        return traceback.FrameSummary(
+            filename, lineno, name, lookup_line=False)
+
+
+def _get_type_name(exctype):
+    # Named as in the last line of a traceback
+    type_name = exctype.__qualname__
+    module = exctype.__module__
+    if module not in ('__main__', 'builtins'):
+        type_name = '{0}.{1}'.format(module, type_name)
+    return type_name
+
+
+def _get_message(value):
+    if value is None:
+        return ''
     try:
-        return line.decode(encoding)
-    except UnicodeDecodeError:
-        return line.decode(encoding, 'replace')
+        return str(value)
+    except Exception:
+        return '<exception str() failed>'
+
+
+class ExceptionInfo:
+    """A compact record of an exception raised by a test, which is
+    rendered to text only when it is first needed.
+
+    The record holds the exception type and message, and the file name,
+    line number and function name of each frame of the traceback.
+    Unlike an ``exc_info`` tuple, it can be pickled.
+
+    Parameters
+    ----------
+    chain : list
+        ``(link, frames, exception_lines)`` tuples for the exception and
+        the exceptions it was chained from, oldest first.  ``link`` is
+        the message separating an exception from the one it was chained
+        from, or ``None``.
+    stdout : str
+        The test stdout if stdout was buffered.
+    stderr : str
+        The test stderr if stderr was buffered.
+    frame_limit : int
+        The number of frames rendered from each traceback; the innermost
+        frames are kept.  ``None`` for no limit.
+    size_limit : int
+        The number of characters of the rendered traceback, excluding
+        the captured output.  ``None`` for no limit.
+    type_name : str
+        The name of the exception type, qualified by its module unless
+        it is a builtin.
+    message : str
+        The exception message, ``str()`` of the exception.
 
+    """
 
-def _format_exception(err, is_failure, stdout=None, stderr=None):
-    """Converts a sys.exc_info()-style tuple of values into a string."""
-    exctype, value, tb = err
-    # Skip test runner traceback levels
-    while tb and _is_relevant_tb_level(tb):
-        tb = tb.tb_next
+    def __init__(self, chain, stdout=None, stderr=None,
+                 frame_limit=DEFAULT_FRAME_LIMIT,
+                 size_limit=DEFAULT_TRACEBACK_SIZE_LIMIT,
+                 type_name=None, message=None):
+        self.chain = chain
+        self.stdout = stdout
+        self.stderr = stderr
+        self.frame_limit = frame_limit
+        self.size_limit = size_limit
+        self.type_name = type_name
+        self.message = message
+        self._text = None
+
+    @classmethod
+    def from_exc_info(cls, exc_info, is_failure, stdout=None, stderr=None,
+                      frame_limit=DEFAULT_FRAME_LIMIT,
+                      size_limit=DEFAULT_TRACEBACK_SIZE_LIMIT):
+        """Create an :class:`~.ExceptionInfo` from an ``exc_info`` tuple
+        ``(type, value, traceback)``.
+
+        Parameters
+        ----------
+        exc_info : tuple
+            ``exc_info`` tuple ``(type, value, traceback)``.
+        is_failure : bool
+            ``True`` if the exception is a test failure, in which case
+            the ``assert*()`` frames are left out of the traceback.
+
+        """
+        exctype, value, tb = exc_info
+        # Skip test runner traceback levels
+        while tb and _is_relevant_tb_level(tb):
+            tb = tb.tb_next
+        if is_failure:
+            # Skip assert*() traceback levels
+            limit = _count_relevant_tb_levels(tb)
+        else:
+            limit = None
+
+        # Source lines are only looked up when the traceback is rendered
+        exception = traceback.TracebackException(
+            exctype, value, tb, limit=limit, lookup_lines=False)
+        chain = []
+        while exception is not None:
+            link = chained = None
+            if exception.__cause__ is not None:
+                chained, link = exception.__cause__, _CAUSE_MESSAGE
+            elif (exception.__context__ is not None and
+                    not exception.__suppress_context__):
+                chained, link = exception.__context__, _CONTEXT_MESSAGE
+            if getattr(exception, 'exceptions', None) is not None:
+                # Exception groups are rendered with their nested
+                # exceptions straight away.
+                frames = ()
+                exception_lines = tuple(exception.format(chain=False))
+            else:
+                frames = tuple(
+                    _compact_frame(frame) for frame in exception.stack)
+                exception_lines = tuple(exception.format_exception_only())
+            chain.append((link, frames, exception_lines))
+            exception = chained
+        chain.reverse()
+        return cls(chain, stdout, stderr, frame_limit, size_limit,
+                   type_name=_get_type_name(exctype),
+                   message=_get_message(value))
 
-    if is_failure:
-        # Skip assert*() traceback levels
-        length = _count_relevant_tb_levels(tb)
-        msgLines = traceback.format_exception(exctype, value, tb, length)
-    else:
-        msgLines = traceback.format_exception(exctype, value, tb)
+    @property
+    def frames(self):
+        """The frames of the traceback of the exception, outermost
+        first, as ``(filename, line number, function name)`` tuples.
 
-    encoding = locale.getpreferredencoding()
-    msgLines = [_decode(line, encoding) for line in msgLines]
+        """
+        return [frame[:3] for frame in self.chain[-1][1]]
+
+    def _format_frames(self, frames):
+        lines = [_TRACEBACK_HEADER]
+        omitted = 0
+        if self.frame_limit is not None and len(frames) > self.frame_limit:
+            omitted = len(frames) - self.frame_limit
+            lines.append(_FRAMES_OMITTED_LINE.format(omitted))
+        lines.extend(traceback.StackSummary.from_list(
+            [_frame_summary(frame) for frame in frames[omitted:]]).format())
+        return lines
+
+    def _render(self):
+        lines = []
+        for link, frames, exception_lines in self.chain:
+            if link is not None:
+                lines.append(link)
+            if len(frames) > 0:
+                lines.extend(self._format_frames(frames))
+            lines.extend(exception_lines)
+        text = ''.join(lines)
+        if self.size_limit is not None and len(text) > self.size_limit:
+            head = self.size_limit // 2
+            tail = self.size_limit - head
+            text = '{0}{1}{2}'.format(
+                text[:head],
+                _TRACEBACK_OMITTED_LINE.format(len(text) - head - tail),
+                text[len(text) - tail:])
+        lines = [text]
+
+        stdout = self.stdout
+        if stdout:
+            if not stdout.endswith('\n'):
+                stdout += '\n'
+            lines.append(STDOUT_LINE % stdout)
+        stderr = self.stderr
+        if stderr:
+            if not stderr.endswith('\n'):
+                stderr += '\n'
+            lines.append(STDERR_LINE % stderr)
+        return ''.join(lines)
+
+    def render(self):
+        """Return the exception rendered as a traceback, followed by any
+        captured output.  The text is only rendered once.
 
-    if stdout:
-        if not stdout.endswith('\n'):
-            stdout += '\n'
-        msgLines.append(STDOUT_LINE % stdout)
-    if stderr:
-        if not stderr.endswith('\n'):
-            stderr += '\n'
-        msgLines.append(STDERR_LINE % stderr)
-    return ''.join(msgLines)
+        """
+        if self._text is None:
+            self._text = self._render()
+        return self._text
+
+    def __str__(self):
+        return self.render()
+
+    def __repr__(self):
+        return '<{0} {1}: {2!r}>'.format(
+            type(self).__name__, self.type_name, self.message)
+
+
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def _intern(value):
+    if type(value) is str:
+        return sys.intern(value)
+    return value
+
+
+def _timedelta_to_ns(delta):
+    return (delta // _MICROSECOND) * 1000
+
+
+class ClockAnchor:
+    """A single reading of both the wall clock and the
+    :func:`time.perf_counter_ns` performance counter, from which the
+    wall-clock time of any other counter value can be derived.
+
+    """
+
+    __slots__ = ('wall_time', 'counter_ns')
+
+    def __init__(self, wall_time=None, counter_ns=None):
+        if wall_time is None:
+            wall_time = datetime_utcnow()
+        if counter_ns is None:
+            counter_ns = time.perf_counter_ns()
+        self.wall_time = wall_time
+        self.counter_ns = counter_ns
+
+    def to_datetime(self, counter_ns):
+        """Return the wall-clock time of a performance counter value.
+
+        Parameters
+        ----------
+        counter_ns : int
+            A value of :func:`time.perf_counter_ns`.
+
+        """
+        return self.wall_time + timedelta(
+            microseconds=(counter_ns - self.counter_ns) / 1000)
 
 
 class TestDuration:
     """An orderable representation of the duration of an individual test.
 
+    Durations are held as an integer number of nanoseconds.  A duration
+    may be created from a start and stop :class:`~datetime.datetime`, a
+    :class:`~datetime.timedelta` or a number of seconds, or from
+    performance counter values with :meth:`from_counter`.
+
     """
 
+    __slots__ = ('_duration_ns', '_start_ns', '_stop_ns', '_anchor',
+                 '_start_time', '_stop_time')
+
     def __init__(self, start_time, stop_time=None):
+        self._start_ns = self._stop_ns = self._anchor = None
         if stop_time is not None:
             self._start_time = start_time
             self._stop_time = stop_time
-            self._duration = stop_time - start_time
+            self._duration_ns = _timedelta_to_ns(stop_time - start_time)
         else:
             # Once calculations are done, start & stop are meaningless
             self._start_time = None
             self._stop_time = None
             duration = start_time
-            if not isinstance(duration, timedelta):
-                duration = timedelta(seconds=float(start_time))
-            self._duration = duration
-        self._total_seconds = None
+            if isinstance(duration, timedelta):
+                self._duration_ns = _timedelta_to_ns(duration)
+            else:
+                self._duration_ns = round(float(duration) * 1e9)
+
+    @classmethod
+    def from_counter(cls, start_ns, stop_ns, anchor=None):
+        """Create a duration from two :func:`time.perf_counter_ns`
+        values.
+
+        Parameters
+        ----------
+        start_ns : int
+            The counter value when the test started.
+        stop_ns : int
+            The counter value when the test stopped.
+        anchor : haas.result.ClockAnchor
+            [Optional] The anchor from which the wall-clock start and
+            stop times are derived.
+
+        """
+        duration = cls.from_nanoseconds(stop_ns - start_ns)
+        duration._start_ns = start_ns
+        duration._stop_ns = stop_ns
+        duration._anchor = anchor
+        return duration
+
+    @classmethod
+    def from_nanoseconds(cls, duration_ns):
+        """Create a duration from a number of nanoseconds.
+
+        """
+        duration = cls(0)
+        duration._duration_ns = duration_ns
+        return duration
+
+    def to_dict(self):
+        """Serialize the ``TestDuration`` to a dictionary of values that
+        can be written as JSON.
+
+        """
+        start_time = self.start_time
+        if start_time is not None:
+            start_time = start_time.isoformat()
+        return {
+            'nanoseconds': self._duration_ns,
+            'start_time': start_time,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Create a ``TestDuration`` from a dictionary created by
+        :meth:`~.TestDuration.to_dict`.
+
+        """
+        start_time = data.get('start_time')
+        if start_time is None:
+            return cls.from_nanoseconds(data['nanoseconds'])
+        anchor = ClockAnchor(datetime.fromisoformat(start_time), 0)
+        return cls.from_counter(0, data['nanoseconds'], anchor)
+
+    @property
+    def start_ns(self):
+        """The :func:`time.perf_counter_ns` value when the test started,
+        or ``None`` if the duration was not created from counter values.
+
+        """
+        return self._start_ns
 
     @property
     def start_time(self):
+        if self._start_time is None and self._anchor is not None:
+            return self._anchor.to_datetime(self._start_ns)
         return self._start_time
 
     @property
     def stop_time(self):
+        if self._stop_time is None and self._anchor is not None:
+            return self._anchor.to_datetime(self._stop_ns)
         return self._stop_time
 
     @property
     def duration(self):
-        return self._duration
+        return timedelta(microseconds=self._duration_ns / 1000)
+
+    @property
+    def nanoseconds(self):
+        return self._duration_ns
 
     @property
     def total_seconds(self):
-        if self._total_seconds is None:
-            if sys.version_info < (2, 7):
-                delta = self._duration
-                total_seconds = delta.microseconds / 1000000.0 + delta.seconds
-                total_seconds += delta.days * 24 * 60 * 60
-            else:
-                total_seconds = self._duration.total_seconds()
-            self._total_seconds = total_seconds
-        return self._total_seconds
+        return self._duration_ns / 1e9
 
     def __repr__(self):
         return '<TestDuration {0}>'.format(str(self))
@@ -170,32 +473,42 @@ class TestDuration:
             seconds=seconds,
         )
 
-    def __eq__(self, other):
+    def _compare_key(self, other):
+        if isinstance(other, TestDuration):
+            return self._duration_ns, other._duration_ns
         if not hasattr(other, 'duration'):
+            return None
+        return self.duration, other.duration
+
+    def __eq__(self, other):
+        key = self._compare_key(other)
+        if key is None:
             return NotImplemented
-        return self.duration == other.duration
+        return key[0] == key[1]
 
     def __ne__(self, other):
         return not (self == other)
 
     def __lt__(self, other):
-        if not hasattr(other, 'duration'):
+        key = self._compare_key(other)
+        if key is None:
             return NotImplemented
-        return self.duration < other.duration
+        return key[0] < key[1]
 
     def __le__(self, other):
         return not (self > other)
 
     def __gt__(self, other):
-        if not hasattr(other, 'duration'):
+        key = self._compare_key(other)
+        if key is None:
             return NotImplemented
-        return self.duration > other.duration
+        return key[0] > key[1]
 
     def __ge__(self, other):
         return not (self < other)
 
     def __hash__(self):
-        return hash((self._start_time, self._stop_time))
+        return hash(self._duration_ns)
 
     # To support statistics.mean() on TestDuration objects
     def as_integer_ratio(self):
@@ -204,12 +517,14 @@ class TestDuration:
     def __add__(self, other):
         if not isinstance(other, TestDuration):
             return NotImplemented
-        return TestDuration(self.duration + other.duration)
+        return TestDuration.from_nanoseconds(
+            self._duration_ns + other._duration_ns)
 
     def __truediv__(self, divisor):
         if not isinstance(self, TestDuration) and isinstance(divisor, int):
             return NotImplemented
-        return TestDuration(self.duration / divisor)
+        return TestDuration.from_nanoseconds(
+            round(self._duration_ns / divisor))
 
 
 class TestResult:
@@ -218,16 +533,75 @@ class TestResult:
     the reason or error associated with status, along with timing
     information.
 
+    The ``exception`` may be given as an :class:`~.ExceptionInfo`, which
+    is only rendered to text when the ``exception`` is first read.
+
+    The method name, message and worker are interned, as they are
+    repeated across many results.
+
+    The ``worker`` is the name of the process that ran the test, when
+    it was run by a subprocess of the test runner.
+
     """
 
+    __slots__ = ('test_class', 'test_method_name', 'status', '_exception',
+                 'message', 'duration', 'worker')
+
     def __init__(self, test_class, test_method_name, status, duration,
-                 exception=None, message=None):
+                 exception=None, message=None, worker=None):
         self.test_class = test_class
-        self.test_method_name = test_method_name
+        self.test_method_name = _intern(test_method_name)
         self.status = status
         self.exception = exception
-        self.message = message
+        self.message = _intern(message)
         self.duration = duration
+        self.worker = _intern(worker)
+
+    def __getstate__(self):
+        return (self.test_class, self.test_method_name, self.status,
+                self._exception, self.message, self.duration, self.worker)
+
+    def __setstate__(self, state):
+        (self.test_class, test_method_name, self.status,
+         self._exception, message, self.duration, worker) = state
+        self.test_method_name = _intern(test_method_name)
+        self.message = _intern(message)
+        self.worker = _intern(worker)
+
+    @property
+    def exception(self):
+        """The rendered traceback of the exception raised by the test,
+        if any.
+
+        """
+        exception = self._exception
+        if isinstance(exception, ExceptionInfo):
+            return exception.render()
+        return exception
+
+    @exception.setter
+    def exception(self, exception):
+        self._exception = exception
+
+    @property
+    def has_exception(self):
+        """``True`` if the test raised an exception, without rendering
+        it.
+
+        """
+        return self._exception is not None
+
+    @property
+    def exception_info(self):
+        """The :class:`~.ExceptionInfo` of the exception raised by the
+        test, or ``None`` if there was none or it is only available as
+        text.
+
+        """
+        exception = self._exception
+        if isinstance(exception, ExceptionInfo):
+            return exception
+        return None
 
     def __repr__(self):
         template = ('<{0} class={1}, method={2}, exc={3!r}, status={4!r}, '
@@ -254,7 +628,9 @@ class TestResult:
 
     @classmethod
     def from_test_case(cls, test_case, status, duration,
-                       exception=None, message=None, stdout=None, stderr=None):
+                       exception=None, message=None, stdout=None, stderr=None,
+                       frame_limit=DEFAULT_FRAME_LIMIT,
+                       size_limit=DEFAULT_TRACEBACK_SIZE_LIMIT):
         """Construct a :class:`~.TestResult` object from the test and a status.
 
         Parameters
@@ -272,6 +648,10 @@ class TestResult:
             The test stdout if stdout was buffered.
         stderr : str
             The test stderr if stderr was buffered.
+        frame_limit : int
+            The number of frames rendered from each traceback.
+        size_limit : int
+            The number of characters of the rendered traceback.
 
         """
         test_class = type(test_case)
@@ -279,8 +659,9 @@ class TestResult:
         if exception is not None:
             exctype, value, tb = exception
             is_failure = exctype is test_case.failureException
-            exception = _format_exception(
-                exception, is_failure, stdout, stderr)
+            exception = ExceptionInfo.from_exc_info(
+                exception, is_failure, stdout, stderr,
+                frame_limit=frame_limit, size_limit=size_limit)
         return cls(test_class, test_method_name, status, duration,
                    exception, message)
 
@@ -291,27 +672,173 @@ class TestResult:
         """
         return self.test_class(self.test_method_name)
 
+    @property
+    def is_fixture_error(self):
+        """``True`` if the result reports an error raised by a class or
+        module fixture, rather than the outcome of a test.
+
+        """
+        return issubclass(self.test_class, ErrorHolder)
+
+    @property
+    def test_id(self):
+        """The id of the test this result represents, as returned by
+        :meth:`unittest.TestCase.id`, without creating the test case.
+
+        """
+        return '{0}.{1}.{2}'.format(
+            self.test_class.__module__, self.test_class.__qualname__,
+            self.test_method_name)
+
     def to_dict(self):
-        """Serialize the ``TestResult`` to a dictionary.
+        """Serialize the ``TestResult`` to a dictionary of values that
+        can be written as JSON.
+
+        The test class is recorded by its module and qualified name, and
+        the exception by its rendered traceback.
 
         """
         return {
-            'test_class': self.test_class,
+            'test_module': self.test_class.__module__,
+            'test_class': self.test_class.__qualname__,
             'test_method_name': self.test_method_name,
-            'status': self.status,
+            'status': self.status.name,
             'exception': self.exception,
             'message': self.message,
-            # 'started_time': self.started_time,
-            'completed_time': self.completed_time,
+            'duration': self.duration.to_dict(),
+            'worker': self.worker,
         }
 
     @classmethod
     def from_dict(cls, data):
         """Create a ``TestResult`` from a dictionary created by
-        :meth:`~.TestResult.to_dict`
+        :meth:`~.TestResult.to_dict`.
+
+        Test modules are not imported.  If the test class is not found
+        in an already imported module, a placeholder class with the same
+        module and qualified name is used.
 
         """
-        return cls(**data)
+        return cls(
+            find_test_class(data['test_module'], data['test_class']),
+            data['test_method_name'],
+            TestCompletionStatus[data['status']],
+            TestDuration.from_dict(data['duration']),
+            exception=data.get('exception'),
+            message=data.get('message'),
+            worker=data.get('worker'),
+        )
+
+
+class FixtureResult:
+    """Timing information for a module or class fixture
+    (``setUpModule``, ``setUpClass``, ``tearDownClass`` or
+    ``tearDownModule``), which is run outside of any single test.
+
+    """
+
+    def __init__(self, fixture_name, target, duration, succeeded=True):
+        self.fixture_name = fixture_name
+        self.target = target
+        self.duration = duration
+        self.succeeded = succeeded
+
+    def __repr__(self):
+        template = ('<{0} fixture={1}, target={2}, succeeded={3!r}, '
+                    'duration={4!r}>')
+        return template.format(
+            type(self).__name__, self.fixture_name, self.target,
+            self.succeeded, self.duration)
+
+    def __eq__(self, other):
+        if not isinstance(other, FixtureResult):
+            return NotImplemented
+        return (
+            self.fixture_name == other.fixture_name and
+            self.target == other.target and
+            self.duration == other.duration and
+            self.succeeded == other.succeeded
+        )
+
+    def __ne__(self, other):
+        return not (self == other)
+
+    @property
+    def description(self):
+        """A description of the fixture, such as
+        ``setUpClass (package.module.TestCase)``.
+
+        """
+        return '{0} ({1})'.format(self.fixture_name, self.target)
+
+    def to_dict(self):
+        """Serialize the ``FixtureResult`` to a dictionary of values that
+        can be written as JSON.
+
+        """
+        return {
+            'fixture_name': self.fixture_name,
+            'target': self.target,
+            'duration': self.duration.to_dict(),
+            'succeeded': self.succeeded,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Create a ``FixtureResult`` from a dictionary created by
+        :meth:`~.FixtureResult.to_dict`.
+
+        """
+        return cls(
+            data['fixture_name'],
+            data['target'],
+            TestDuration.from_dict(data['duration']),
+            succeeded=data['succeeded'],
+        )
+
+
+class ReplayedTestCase(unittest.TestCase):
+    """Base class of the placeholders for test classes that are not
+    imported when results are read back by
+    :meth:`~.TestResult.from_dict`.  Instances describe the test like
+    the original test case, but cannot be run.
+
+    """
+
+    def __init__(self, methodName='runTest'):
+        super(ReplayedTestCase, self).__init__()
+        self._testMethodName = methodName
+        self._testMethodDoc = None
+
+
+_replayed_test_classes = {}
+
+
+def find_test_class(module_name, qualname):
+    """Return the test class with a qualified name from an already
+    imported module, or a :class:`~.ReplayedTestCase` placeholder for
+    it.
+
+    Parameters
+    ----------
+    module_name : str
+        The name of the module defining the test class.
+    qualname : str
+        The qualified name of the test class in its module.
+
+    """
+    obj = sys.modules.get(module_name)
+    for name in qualname.split('.'):
+        obj = getattr(obj, name, None)
+    if isinstance(obj, type):
+        return obj
+    key = (module_name, qualname)
+    test_class = _replayed_test_classes.get(key)
+    if test_class is None:
+        test_class = _replayed_test_classes[key] = type(
+            qualname.rpartition('.')[2], (ReplayedTestCase,),
+            {'__module__': module_name, '__qualname__': qualname})
+    return test_class
 
 
 # Temporary compatibility with unittest's runner
@@ -319,6 +846,132 @@ separator2 = '-' * 70
 
 
 # Copied from unittest.result
+_STATUSES = {status.value: status for status in TestCompletionStatus}
+
+
+class ResultStore:
+    """A compact store of the results of a test run, shared by the
+    :class:`~haas.result.ResultCollector` and the result handlers.
+
+    The status, duration and test of every result are kept in arrays, at
+    a few tens of bytes per test.  The complete
+    :class:`~haas.result.TestResult` is only kept for results that
+    carry an exception or a message, or that are not successes; other
+    results are recreated from the arrays, without their ``worker``,
+    when they are queried.
+
+    """
+
+    def __init__(self):
+        self._statuses = array('B')
+        self._durations = array('q')
+        self._class_indexes = array('I')
+        self._method_names = []
+        self._classes = []
+        self._class_lookup = {}
+        self._counts = dict.fromkeys(TestCompletionStatus, 0)
+        self._details = {}
+
+    def __len__(self):
+        return len(self._statuses)
+
+    @property
+    def durations(self):
+        """The durations of the tests in nanoseconds, in the order in
+        which the results were added.
+
+        """
+        return self._durations
+
+    def add(self, result):
+        """Add a test result, returning its index in the store.
+
+        Parameters
+        ----------
+        result : haas.result.TestResult
+            The result to add.
+
+        """
+        index = len(self._statuses)
+        test_class = result.test_class
+        class_index = self._class_lookup.get(test_class)
+        if class_index is None:
+            class_index = self._class_lookup[test_class] = len(self._classes)
+            self._classes.append(test_class)
+        status = result.status
+        self._statuses.append(status.value)
+        self._durations.append(result.duration.nanoseconds)
+        self._class_indexes.append(class_index)
+        self._method_names.append(result.test_method_name)
+        self._counts[status] += 1
+        if status is not TestCompletionStatus.success or \
+                result.message is not None or \
+                result.has_exception:
+            self._details[index] = result
+        return index
+
+    def count(self, status=None):
+        """Return the number of results with a status, or of all results.
+
+        Parameters
+        ----------
+        status : haas.result.TestCompletionStatus
+            [Optional] The status of the results to count.
+
+        """
+        if status is None:
+            return len(self)
+        return self._counts[status]
+
+    def get_result(self, index):
+        """Return the result at an index in the store.
+
+        """
+        result = self._details.get(index)
+        if result is not None:
+            return result
+        return TestResult(
+            self._classes[self._class_indexes[index]],
+            self._method_names[index],
+            _STATUSES[self._statuses[index]],
+            TestDuration.from_nanoseconds(self._durations[index]),
+        )
+
+    def get_results(self, status=None):
+        """Return the results with a status, or all results, in the order
+        in which they were added.
+
+        Parameters
+        ----------
+        status : haas.result.TestCompletionStatus
+            [Optional] The status of the results to return.
+
+        """
+        if status is None:
+            return [self.get_result(index) for index in range(len(self))]
+        if status is not TestCompletionStatus.success:
+            # Only successes may have been stored without their details
+            return [result for result in self._details.values()
+                    if result.status is status]
+        code = status.value
+        return [self.get_result(index)
+                for index, value in enumerate(self._statuses)
+                if value == code]
+
+    def get_slowest(self, count):
+        """Return the results of the slowest tests, slowest first.
+
+        Parameters
+        ----------
+        count : int
+            The number of results to return.
+
+        """
+        indexes = heapq.nlargest(
+            count, range(len(self)), key=self._durations.__getitem__)
+        return [self.get_result(index) for index in indexes]
+
+
 def failfast(method):
     @wraps(method)
     def inner(self, *args, **kw):
@@ -333,22 +986,60 @@ class ResultCollector:
     :class:`~.TestResult` instances and handing them off the registered
     result output handlers.
 
+    Every result is added to the :class:`~haas.result.ResultStore`
+    in ``result_store``, which is shared with the result handlers, and
+    from which the lists of errors, failures and other results are
+    read.
+
+    If ``buffer`` is ``'fd'``, the output of each test is captured by
+    redirecting file descriptors 1 and 2, which includes output from C
+    extensions and child processes, rather than by replacing
+    ``sys.stdout`` and ``sys.stderr``.
+
+    The tracebacks of errors and failures are kept as
+    :class:`~.ExceptionInfo` records, rendered with at most
+    ``traceback_frame_limit`` frames and ``traceback_size_limit``
+    characters when they are reported.
+
+    Tests are timed with :func:`time.perf_counter_ns`, and the wall-clock
+    times of a test run are derived from the single :class:`ClockAnchor`
+    in ``clock``.
+
+    If ``async_handlers`` is true, the result handlers are run in a
+    background :class:`~haas.handler_thread.HandlerThread` during the
+    test run, receiving the results in batches through
+    ``handle_results``, and ``stopTestRun`` waits for them to finish.
+    This cannot be combined with buffering at the file descriptor level.
+
     """
 
     # Temporary compatibility with unittest's runner
     separator2 = separator2
 
-    def __init__(self, buffer=False, failfast=False):
+    def __init__(self, buffer=False, failfast=False,
+                 buffer_limit=DEFAULT_BUFFER_LIMIT, clock=None,
+                 traceback_frame_limit=DEFAULT_FRAME_LIMIT,
+                 traceback_size_limit=DEFAULT_TRACEBACK_SIZE_LIMIT,
+                 async_handlers=False, handler_queue_size=DEFAULT_QUEUE_SIZE):
+        if async_handlers and buffer == 'fd':
+            raise ValueError(
+                'Result handlers cannot run in the background while '
+                'output is captured at the file descriptor level')
+        if clock is None:
+            clock = ClockAnchor()
+        self.clock = clock
         self.buffer = buffer
+        self.buffer_limit = buffer_limit
+        self.traceback_frame_limit = traceback_frame_limit
+        self.traceback_size_limit = traceback_size_limit
         self.failfast = failfast
+        self.async_handlers = async_handlers
+        self.handler_queue_size = handler_queue_size
+        self._handler_thread = None
         self._result_handlers = []
         self._sorted_handlers = None
         self.testsRun = 0
-        self.expectedFailures = []
-        self.unexpectedSuccesses = []
-        self.skipped = []
-        self.failures = []
-        self.errors = []
+        self.result_store = ResultStore()
         self.shouldStop = False
         self._successful = True
         self._mirror_output = False
@@ -358,6 +1049,28 @@ class ResultCollector:
         self._original_stdout = sys.stdout
         self._test_timing = {}
 
+    @property
+    def errors(self):
+        return self.result_store.get_results(TestCompletionStatus.error)
+
+    @property
+    def failures(self):
+        return self.result_store.get_results(TestCompletionStatus.failure)
+
+    @property
+    def skipped(self):
+        return self.result_store.get_results(TestCompletionStatus.skipped)
+
+    @property
+    def expectedFailures(self):
+        return self.result_store.get_results(
+            TestCompletionStatus.expected_failure)
+
+    @property
+    def unexpectedSuccesses(self):
+        return self.result_store.get_results(
+            TestCompletionStatus.unexpected_success)
+
     @property
     def _handlers(self):
         if self._sorted_handlers is None:
@@ -373,10 +1086,16 @@ class ResultCollector:
         """Hook stdout and stderr if buffering is enabled.
 
         """
-        if self.buffer:
+        if self.buffer == 'fd':
+            if self._stderr_buffer is None:
+                self._stderr_buffer = FdCapture(2, self.buffer_limit)
+                self._stdout_buffer = FdCapture(1, self.buffer_limit)
+            self._stdout_buffer.start()
+            self._stderr_buffer.start()
+        elif self.buffer:
             if self._stderr_buffer is None:
-                self._stderr_buffer = StringIO()
-                self._stdout_buffer = StringIO()
+                self._stderr_buffer = CaptureBuffer(self.buffer_limit)
+                self._stdout_buffer = CaptureBuffer(self.buffer_limit)
             sys.stdout = self._stdout_buffer
             sys.stderr = self._stderr_buffer
 
@@ -384,10 +1103,16 @@ class ResultCollector:
         """Unhook stdout and stderr if buffering is enabled.
 
         """
+        if self.buffer == 'fd':
+            self._stdout_buffer.stop()
+            self._stderr_buffer.stop()
         if self.buffer:
             if self._mirror_output:
-                output = sys.stdout.getvalue()
-                error = sys.stderr.getvalue()
+                output = self._stdout_buffer.getvalue()
+                error = self._stderr_buffer.getvalue()
+                if (output or error) and self._handler_thread is not None:
+                    # Write the output after the test's progress line
+                    self._handler_thread.flush()
                 if output:
                     if not output.endswith('\n'):
                         output += '\n'
@@ -397,12 +1122,36 @@ class ResultCollector:
                         error += '\n'
                     self._original_stderr.write(STDERR_LINE % error)
 
-            sys.stdout = self._original_stdout
-            sys.stderr = self._original_stderr
-            self._stdout_buffer.seek(0)
-            self._stdout_buffer.truncate()
-            self._stderr_buffer.seek(0)
-            self._stderr_buffer.truncate()
+            if self.buffer != 'fd':
+                sys.stdout = self._original_stdout
+                sys.stderr = self._original_stderr
+            self._stdout_buffer.reset()
+            self._stderr_buffer.reset()
+
+    @contextmanager
+    def _uncaptured(self):
+        """Pause capturing at the file descriptor level, so that output
+        from result handlers is not captured with the test output.
+
+        """
+        capturing = self.buffer == 'fd' and \
+            self._stdout_buffer is not None and \
+            self._stdout_buffer.is_started
+        if capturing:
+            self._stdout_buffer.stop()
+            self._stderr_buffer.stop()
+        try:
+            yield
+        finally:
+            if capturing:
+                self._stdout_buffer.start()
+                self._stderr_buffer.start()
+
+    def _close_buffers(self):
+        if self._stderr_buffer is not None:
+            self._stdout_buffer.close()
+            self._stderr_buffer.close()
+            self._stdout_buffer = self._stderr_buffer = None
 
     def printErrors(self):  # pragma: no cover
         # FIXME: Remove
@@ -411,12 +1160,55 @@ class ResultCollector:
     def add_result_handler(self, handler):
         """Register a new result handler.
 
+        Handlers implementing ``set_result_store`` are given the
+        :class:`~haas.result.ResultStore` of this collector.
+
         """
+        set_result_store = getattr(handler, 'set_result_store', None)
+        if set_result_store is not None:
+            set_result_store(self.result_store)
         self._result_handlers.append(handler)
         # Reset sorted handlers
         if self._sorted_handlers:
             self._sorted_handlers = None
 
+    def update_test_count(self, test_count):
+        """Notify the result handlers of the total number of tests, when it
+        only becomes known while the tests are running.
+
+        Parameters
+        ----------
+        test_count : int
+            The total number of tests discovered.
+
+        """
+        if self._handler_thread is not None:
+            self._handler_thread.put_test_count(test_count)
+            return
+        for handler in self._handlers:
+            update_test_count = getattr(handler, 'update_test_count', None)
+            if update_test_count is not None:
+                update_test_count(test_count)
+
+    def add_fixture_result(self, fixture_result):
+        """Notify the result handlers of the time taken by a module or
+        class fixture.
+
+        Parameters
+        ----------
+        fixture_result : haas.result.FixtureResult
+            The timing of the fixture.
+
+        """
+        if self._handler_thread is not None:
+            self._handler_thread.put_fixture_result(fixture_result)
+            return
+        for handler in self._handlers:
+            handle_fixture_result = getattr(
+                handler, 'handle_fixture_result', None)
+            if handle_fixture_result is not None:
+                handle_fixture_result(fixture_result)
+
     def startTest(self, test, start_time=None):
         """Indicate that an individual test is starting.
 
@@ -424,19 +1216,23 @@ class ResultCollector:
         ----------
         test : unittest.TestCase
             The test that is starting.
-        start_time : datetime
+        start_time : int
             An internal parameter to allow the parallel test runner to
-            set the actual start time of a test run in a subprocess.
+            set the actual :func:`time.perf_counter_ns` start time of a
+            test run in a subprocess.
 
         """
         if start_time is None:
-            start_time = datetime_utcnow()
+            start_time = time.perf_counter_ns()
         self._test_timing[self._testcase_to_key(test)] = start_time
         self._mirror_output = False
         self._setup_stdout()
         self.testsRun += 1
-        for handler in self._handlers:
-            handler.start_test(test)
+        if self._handler_thread is not None:
+            return
+        with self._uncaptured():
+            for handler in self._handlers:
+                handler.start_test(test)
 
     def stopTest(self, test):
         """Indicate that an individual test has completed.
@@ -447,8 +1243,13 @@ class ResultCollector:
             The test that has completed.
 
         """
-        for handler in self._handlers:
-            handler.stop_test(test)
+        # A test may have several results (e.g. a failure followed by an
+        # error in tearDown), so its start time is kept until it stops.
+        self._test_timing.pop(self._testcase_to_key(test), None)
+        if self._handler_thread is None:
+            with self._uncaptured():
+                for handler in self._handlers:
+                    handler.stop_test(test)
         self._restore_stdout()
         self._mirror_output = False
 
@@ -458,13 +1259,24 @@ class ResultCollector:
         """
         for handler in self._handlers:
             handler.start_test_run()
+        if self.async_handlers:
+            self._handler_thread = HandlerThread(
+                self._handlers, self.handler_queue_size)
+            self._handler_thread.start()
 
     def stopTestRun(self):
         """Indicate that the test run has completed.
 
         """
-        for handler in self._handlers:
-            handler.stop_test_run()
+        try:
+            if self._handler_thread is not None:
+                handler_thread = self._handler_thread
+                self._handler_thread = None
+                handler_thread.stop()
+            for handler in self._handlers:
+                handler.stop_test_run()
+        finally:
+            self._close_buffers()
 
     def add_result(self, result):
         """Add an already-constructed :class:`~.TestResult` to this
@@ -474,11 +1286,50 @@ class ResultCollector:
         ResultCollectors (e.g. in subprocesses).
 
         """
-        for handler in self._handlers:
-            handler(result)
+        self._add_result(result)
+
+    def _add_result(self, result, test=None):
+        self.result_store.add(result)
+        if self._handler_thread is not None:
+            # The test that ran is passed on, so that handlers without
+            # handle_results do not get a new test case.
+            self._handler_thread.put_results([result], [test])
+        else:
+            with self._uncaptured():
+                for handler in self._handlers:
+                    handler(result)
         if self._successful and result.status not in _successful_results:
             self._successful = False
 
+    def add_results(self, results):
+        """Add many already-constructed :class:`~.TestResult` objects to
+        this :class:`~.ResultCollector` at once, counting each as a test
+        run.
+
+        Errors raised by class and module fixtures are not counted.
+        Handlers implementing ``handle_results`` receive all of the
+        results in one call.
+
+        """
+        results = list(results)
+        if len(results) == 0:
+            return
+        # Fixture errors are not counted as tests, as in startTest
+        self.testsRun += sum(
+            1 for result in results if not result.is_fixture_error)
+        for result in results:
+            self.result_store.add(result)
+        if self._handler_thread is not None:
+            self._handler_thread.put_results(results)
+        else:
+            with self._uncaptured():
+                for handler in self._handlers:
+                    handle_results(handler, results)
+        if self._successful and any(
+                result.status not in _successful_results
+                for result in results):
+            self._successful = False
+
     def _handle_result(self, test, status, exception=None, message=None):
         """Create a :class:`~.TestResult` and add it to this
         :class:`~ResultCollector`.
@@ -496,7 +1347,10 @@ class ResultCollector:
             reason).
 
         """
-        if self.buffer:
+        if self.buffer and exception is not None and \
+                self._stderr_buffer is not None:
+            # The output is only reported with the exception.  A fixture
+            # may fail before any test has set up the buffers.
             stderr = self._stderr_buffer.getvalue()
             stdout = self._stdout_buffer.getvalue()
         else:
@@ -504,14 +1358,15 @@ class ResultCollector:
 
         started_time = self._test_timing.get(self._testcase_to_key(test))
         if started_time is None and isinstance(test, ErrorHolder):
-            started_time = datetime_utcnow()
+            started_time = time.perf_counter_ns()
         elif started_time is None:
             raise RuntimeError(
                 'Missing test start! Please report this error as a bug in '
                 'haas.')
 
-        completion_time = datetime_utcnow()
-        duration = TestDuration(started_time, completion_time)
+        completion_time = time.perf_counter_ns()
+        duration = TestDuration.from_counter(
+            started_time, completion_time, self.clock)
         result = TestResult.from_test_case(
             test,
             status,
@@ -520,8 +1375,10 @@ class ResultCollector:
             message=message,
             stdout=stdout,
             stderr=stderr,
+            frame_limit=self.traceback_frame_limit,
+            size_limit=self.traceback_size_limit,
         )
-        self.add_result(result)
+        self._add_result(result, test)
         return result
 
     @failfast
@@ -536,9 +1393,8 @@ class ResultCollector:
             ``exc_info`` tuple ``(type, value, traceback)``.
 
         """
-        result = self._handle_result(
+        self._handle_result(
             test, TestCompletionStatus.error, exception=exception)
-        self.errors.append(result)
         self._mirror_output = True
 
     @failfast
@@ -553,9 +1409,8 @@ class ResultCollector:
             ``exc_info`` tuple ``(type, value, traceback)``.
 
         """
-        result = self._handle_result(
+        self._handle_result(
             test, TestCompletionStatus.failure, exception=exception)
-        self.failures.append(result)
         self._mirror_output = True
 
     def addSuccess(self, test):
@@ -580,9 +1435,7 @@ class ResultCollector:
             The reason the test was skipped.
 
         """
-        result = self._handle_result(
-            test, TestCompletionStatus.skipped, message=reason)
-        self.skipped.append(result)
+        self._handle_result(test, TestCompletionStatus.skipped, message=reason)
 
     def addExpectedFailure(self, test, exception):
         """Register that a test that failed and was expected to fail.
@@ -595,9 +1448,8 @@ class ResultCollector:
             ``exc_info`` tuple ``(type, value, traceback)``.
 
         """
-        result = self._handle_result(
+        self._handle_result(
             test, TestCompletionStatus.expected_failure, exception=exception)
-        self.expectedFailures.append(result)
 
     @failfast
     def addUnexpectedSuccess(self, test):
@@ -609,9 +1461,7 @@ class ResultCollector:
             The test that has completed.
 
         """
-        result = self._handle_result(
-            test, TestCompletionStatus.unexpected_success)
-        self.unexpectedSuccesses.append(result)
+        self._handle_result(test, TestCompletionStatus.unexpected_success)
 
     def addDuration(self, test, elapsed):
         """Called when a test finished to run, regardless of its outcome.
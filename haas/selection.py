@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2013-2014 Simon Jagoe
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the 3-clause BSD license.  See the LICENSE.txt file for details.
+import logging
+import os
+import re
+import subprocess
+
+from .exceptions import ChangedFilesError
+from .module_import_error import ModuleImportError
+from .suite import filter_tests, get_test_case_class
+
+logger = logging.getLogger(__name__)
+
+_HUNK_HEADER = re.compile(r'^@@ -(\d+)(?:,(\d+))? ')
+
+
+def _run_git(arguments, directory):
+    command = ['git'] + list(arguments)
+    try:
+        output = subprocess.check_output(
+            command, cwd=directory, stderr=subprocess.PIPE)
+    except OSError as exc:
+        raise ChangedFilesError('Unable to run git: {0}'.format(exc))
+    except subprocess.CalledProcessError as exc:
+        raise ChangedFilesError('{0!r} failed: {1}'.format(
+            ' '.join(command), exc.stderr.decode(errors='replace').strip()))
+    return output
+
+
+def _verify_revision(revision, directory):
+    # Outside a checkout "git diff" falls back to comparing two paths,
+    # and only reports its usage.
+    _run_git(['rev-parse', '--git-dir'], directory)
+    try:
+        _run_git(['rev-parse', '--verify', '--quiet',
+                  '{0}^{{commit}}'.format(revision)], directory)
+    except ChangedFilesError:
+        raise ChangedFilesError(
+            'Unknown git revision {0!r}'.format(revision))
+
+
+def _split_paths(output, directory):
+    return [os.path.join(directory, os.fsdecode(name))
+            for name in output.split(b'\0') if name]
+
+
+def get_listed_files(file_list):
+    """Return the absolute paths of the files in a comma-separated list.
+
+    Parameters
+    ----------
+    file_list : str
+        A comma-separated list of file paths, which need not exist.
+
+    """
+    return [os.path.abspath(path.strip())
+            for path in file_list.split(',') if path.strip()]
+
+
+def get_changed_files(changed_since, directory):
+    """Return the absolute paths of the files that changed.
+
+    Parameters
+    ----------
+    changed_since : str
+        A git revision to compare the working tree of ``directory``
+        against.  Files not tracked by git are also considered changed.
+    directory : str
+        The directory in which to run git.
+
+    """
+    directory = os.path.abspath(directory)
+    _verify_revision(changed_since, directory)
+    changed = _split_paths(_run_git(
+        ['diff', '--name-only', '--relative', '-z', changed_since, '--'],
+        directory), directory)
+    changed.extend(_split_paths(_run_git(
+        ['ls-files', '--others', '--exclude-standard', '-z'], directory),
+        directory))
+    return changed
+
+
+def get_changed_lines(changed_since, directory):
+    """Return the lines that changed in each changed file.
+
+    Lines are numbered as in the files at the git revision, so that
+    they can be compared with coverage data recorded at that revision.
+    Lines adjacent to a deletion or insertion are also included.
+
+    Parameters
+    ----------
+    changed_since : str
+        A git revision to compare the working tree of ``directory``
+        against.
+    directory : str
+        The directory in which to run git.
+
+    Returns
+    -------
+    changed_lines : dict
+        Map of the absolute path of each changed file to the set of
+        changed line numbers, or ``None`` if the whole file should be
+        considered changed (new or untracked files).
+
+    """
+    directory = os.path.abspath(directory)
+    _verify_revision(changed_since, directory)
+    output = _run_git(
+        ['diff', '-U0', '--relative', '--no-color', '--no-ext-diff',
+         '--no-renames', changed_since, '--'], directory)
+    changed_lines = {}
+    lines = None
+    for line in os.fsdecode(output).splitlines():
+        if line.startswith('--- '):
+            old_path = line[4:]
+            if old_path == '/dev/null':
+                lines = None
+            else:
+                path = os.path.join(directory, old_path[2:])
+                lines = changed_lines.setdefault(path, set())
+        elif line.startswith('+++ ') and lines is None:
+            new_path = line[4:]
+            if new_path != '/dev/null':
+                changed_lines[os.path.join(directory, new_path[2:])] = None
+        elif lines is not None:
+            match = _HUNK_HEADER.match(line)
+            if match is None:
+                continue
+            start = int(match.group(1))
+            count = 1 if match.group(2) is None else int(match.group(2))
+            if count == 0:
+                lines.update((start, start + 1))
+            else:
+                lines.update(range(start, start + count))
+    for path in _split_paths(_run_git(
+            ['ls-files', '--others', '--exclude-standard', '-z'], directory),
+            directory):
+        changed_lines[path] = None
+    return changed_lines
+
+
+def select_changed_tests(suite, import_graph, changed_files):
+    """Select the tests defined in modules that import any of the changed
+    files, directly or transitively.
+
+    Placeholder tests reporting a module import error are always
+    selected.
+
+    Parameters
+    ----------
+    suite : haas.suite.TestSuite
+        The suite of discovered tests.
+    import_graph : haas.import_graph.ImportGraph
+        The import graph of the project.
+    changed_files : iterable
+        The paths of the changed files.
+
+    """
+    changed_modules = {
+        import_graph.get_module_name(path) for path in changed_files}
+    changed_modules.discard(None)
+    affected = import_graph.get_dependents(changed_modules)
+    logger.debug('Modules affected by changes: %r', sorted(affected))
+
+    def is_affected(test):
+        return isinstance(test, ModuleImportError) or \
+            get_test_case_class(test).__module__ in affected
+
+    return type(suite)(filter_tests(suite, is_affected))
+
+
+def _canonical(path):
+    return os.path.normcase(os.path.realpath(path))
+
+
+def select_covered_tests(suite, import_graph, changed_lines, data_file):
+    """Select the tests that executed any of the changed lines, according
+    to coverage data recorded with per-test contexts.
+
+    Tests that are not in the coverage data (such as new tests) are
+    always selected, as are placeholder tests reporting a module import
+    error.  Changes to files that were not measured, or to lines that
+    were executed while importing rather than by a test, fall back to
+    selecting the tests that import the changed file, as in
+    :func:`select_changed_tests`.
+
+    Parameters
+    ----------
+    suite : haas.suite.TestSuite
+        The suite of discovered tests.
+    import_graph : haas.import_graph.ImportGraph
+        The import graph of the project.
+    changed_lines : dict
+        Map of changed file paths to changed line numbers, as returned
+        by :func:`get_changed_lines`.
+    data_file : str
+        The path of the coverage data file.
+
+    """
+    import coverage
+
+    if not os.path.isfile(data_file):
+        raise ChangedFilesError(
+            'No coverage data file {0!r}'.format(data_file))
+    data = coverage.CoverageData(basename=data_file)
+    data.read()
+    measured_files = {
+        _canonical(filename): filename for filename in data.measured_files()}
+    recorded_tests = data.measured_contexts()
+
+    covering_tests = set()
+    fallback_files = []
+    for path, lines in changed_lines.items():
+        filename = measured_files.get(_canonical(path))
+        if filename is None:
+            fallback_files.append(path)
+            continue
+        contexts_by_lineno = data.contexts_by_lineno(filename)
+        if lines is None:
+            lines = contexts_by_lineno.keys()
+        for line in lines:
+            contexts = contexts_by_lineno.get(line, ())
+            if '' in contexts:
+                # Executed at import time, e.g. a function definition
+                fallback_files.append(path)
+            covering_tests.update(contexts)
+    changed_modules = {
+        import_graph.get_module_name(path) for path in fallback_files}
+    changed_modules.discard(None)
+    affected = import_graph.get_dependents(changed_modules)
+
+    def is_affected(test):
+        if isinstance(test, ModuleImportError):
+            return True
+        test_id = test.id()
+        return test_id in covering_tests or \
+            test_id not in recorded_tests or \
+            get_test_case_class(test).__module__ in affected
+
+    return type(suite)(filter_tests(suite, is_affected))
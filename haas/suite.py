@@ -6,10 +6,60 @@
 # of the 3-clause BSD license.  See the LICENSE.txt file for details.
 import logging
 import sys
+import time
+import unittest
+
 from .error_holder import ErrorHolder
+from .module_import_error import ModuleImportError
+from .result import FixtureResult, TestDuration
 
 logger = logging.getLogger(__name__)
 
+#: The fixtures inherited from :class:`unittest.TestCase`, which do
+#: nothing and are not run.
+_DEFAULT_FIXTURES = {
+    name: getattr(unittest.TestCase, name).__func__
+    for name in ('setUpClass', 'tearDownClass')
+}
+
+
+def get_test_case_class(test):
+    """Return the :class:`unittest.TestCase` subclass of a test case, or
+    of the test case referred to by a :class:`TestCaseHandle`.
+
+    Parameters
+    ----------
+    test : unittest.TestCase or haas.suite.TestCaseHandle
+        The test case.
+
+    """
+    if isinstance(test, TestCaseHandle):
+        return test.test_case_class
+    return type(test)
+
+
+def _walk_test_cases(suite):
+    """Generate the test cases in a test suite, iteratively rather than
+    recursively, reusing the index of nested suites that have one.
+
+    """
+    stack = [iter(suite)]
+    while stack:
+        for test in stack[-1]:
+            if isinstance(test, TestSuite) and test._test_cases is not None:
+                for test_case in test._test_cases:
+                    yield test_case
+                continue
+            try:
+                iterator = iter(test)
+            except TypeError:
+                yield test
+            else:
+                stack.append(iterator)
+                break
+        else:
+            stack.pop()
+
 
 def find_test_cases(suite):
     """Generate a list of all test cases contained in a test suite.
@@ -20,33 +70,231 @@ def find_test_cases(suite):
         The test suite from which to generate the test case list.
 
     """
+    if isinstance(suite, LazyTestSuite) and not suite.is_complete:
+        # Do not wait for all tests to be loaded
+        return _walk_test_cases(suite)
+    if isinstance(suite, TestSuite):
+        return iter(suite.get_test_cases())
     try:
         iter(suite)
     except TypeError:
-        yield suite
-    else:
-        for test in suite:
-            for test_ in find_test_cases(test):
-                yield test_
+        return iter([suite])
+    return _walk_test_cases(suite)
+
+
+def group_by_fixture(tests, suite_class=None):
+    """Group the test cases in a sequence of tests and test suites by
+    module, and then by class, so that the fixtures of each module and
+    class are only set up and torn down once when the tests are run.
+
+    Modules, classes and the tests of each class keep the order in which
+    they are first found.
+
+    Parameters
+    ----------
+    tests : iterable
+        The test cases and test suites to group.
+    suite_class : type
+        [Optional] The test suite class used to build the groups.
+        Defaults to :class:`TestSuite`.
+
+    Returns
+    -------
+    suites : list
+        A test suite for each module, containing a test suite for each
+        class.
+
+    """
+    if suite_class is None:
+        suite_class = TestSuite
+    classes_by_module = {}
+    for test in _walk_test_cases(tests):
+        test_case_class = get_test_case_class(test)
+        classes = classes_by_module.setdefault(
+            test_case_class.__module__, {})
+        classes.setdefault(test_case_class, []).append(test)
+    return [
+        suite_class([suite_class(class_tests)
+                     for class_tests in classes.values()])
+        for classes in classes_by_module.values()
+    ]
+
+
+def filter_tests(tests, predicate):
+    """Generate the tests in a sequence of tests and test suites for
+    which ``predicate`` returns ``True``.
+
+    Nested test suites are rebuilt to contain only the selected test
+    cases.  The tests are filtered lazily, as the generated suites are
+    iterated.
+
+    Parameters
+    ----------
+    tests : iterable
+        The test cases and test suites to filter.
+    predicate : callable
+        Called with each test case, returning ``True`` if it should be
+        kept.
+
+    """
+    for test in tests:
+        try:
+            iter(test)
+        except TypeError:
+            if predicate(test):
+                yield test
+        else:
+            yield type(test)(filter_tests(test, predicate))
+
+
+def unique_tests(tests, seen=None):
+    """Generate the tests in a sequence of tests and test suites,
+    skipping any test case whose ``id()`` has already been seen.
+
+    Nested test suites are rebuilt to contain only their unique test
+    cases.  The placeholder tests of modules that failed to import all
+    share the same id, so they are never skipped.
+
+    Parameters
+    ----------
+    tests : iterable
+        The test cases and test suites to deduplicate.
+    seen : set
+        [Optional] The ids of test cases that have already been seen.
+        Updated with the ids of the generated test cases.
+
+    """
+    if seen is None:
+        seen = set()
+
+    def is_unique(test):
+        if isinstance(test, ModuleImportError):
+            # Placeholders for modules that failed to import all share
+            # the same id.
+            return True
+        test_id = test.id()
+        if test_id in seen:
+            logger.debug('Skipping duplicate test %r', test_id)
+            return False
+        seen.add(test_id)
+        return True
+
+    return filter_tests(tests, is_unique)
+
+
+class TestCaseHandle:
+    """A lightweight reference to a single test method of a
+    :class:`unittest.TestCase` subclass.
+
+    The ``TestCase`` instance is only created when the test is run, and
+    is released once it has finished, so that a suite of very many
+    tests does not hold an instance of each of them for the whole run.
+
+    Parameters
+    ----------
+    test_case_class : type
+        Subclass of :class:`unittest.TestCase`.
+    method_name : str
+        The name of the test method.
+
+    """
+
+    def __init__(self, test_case_class, method_name):
+        self.test_case_class = test_case_class
+        self.method_name = method_name
+
+    @property
+    def _testMethodName(self):
+        return self.method_name
+
+    def load(self):
+        """Create the :class:`unittest.TestCase` instance for the test.
+
+        """
+        return self.test_case_class(self.method_name)
+
+    def id(self):
+        return '{0}.{1}.{2}'.format(
+            self.test_case_class.__module__,
+            self.test_case_class.__qualname__, self.method_name)
+
+    def countTestCases(self):
+        return 1
+
+    def run(self, result=None):
+        """Create the test case and run it.
+
+        Parameters
+        ----------
+        result : unittest.result.TestResult
+
+        """
+        return self.load().run(result)
+
+    def __call__(self, *args, **kwds):
+        return self.run(*args, **kwds)
+
+    def __eq__(self, other):
+        if not isinstance(other, TestCaseHandle):
+            return NotImplemented
+        return self.test_case_class is other.test_case_class and \
+            self.method_name == other.method_name
+
+    def __ne__(self, other):
+        return not (self == other)
+
+    def __hash__(self):
+        return hash((self.test_case_class, self.method_name))
+
+    def __repr__(self):
+        return '<{0} test={1}>'.format(type(self).__name__, self.id())
+
+    def __str__(self):
+        return self.id()
+
+
+def _get_class_name(klass):
+    return '{0}.{1}'.format(klass.__module__, klass.__qualname__)
 
 
 class _TestSuiteState:
 
-    def __init__(self, result):
+    def __init__(self, result, release_tests=False):
         self._result = result
+        self.release_tests = release_tests
         self._previous_class = None
         self._module_setup_failed = False
         self._class_setup_failed = False
 
-    def _run_setup(self, item, setup_name, error_name):
-        setup = getattr(item, setup_name, lambda: None)
+    def _run_setup(self, item, setup_name, error_name, target):
+        setup = getattr(item, setup_name, None)
+        if setup is None:
+            return True
+        default = _DEFAULT_FIXTURES.get(setup_name)
+        if default is not None and getattr(setup, '__func__', None) is default:
+            return True
+        start_time = time.perf_counter_ns()
         try:
             setup()
         except Exception:
             error = '{0} ({1})'.format(setup_name, error_name)
             self._result.addError(ErrorHolder(error), sys.exc_info())
-            return False
-        return True
+            succeeded = False
+        else:
+            succeeded = True
+        duration = TestDuration.from_counter(
+            start_time, time.perf_counter_ns(),
+            getattr(self._result, 'clock', None))
+        self._add_fixture_result(FixtureResult(
+            setup_name, target, duration, succeeded))
+        return succeeded
+
+    def _add_fixture_result(self, fixture_result):
+        # The result may be a plain unittest.TestResult
+        add_fixture_result = getattr(
+            self._result, 'add_fixture_result', None)
+        if add_fixture_result is not None:
+            add_fixture_result(fixture_result)
 
     def _setup_module(self, module_name):
         if self._previous_class is not None:
@@ -61,7 +309,7 @@ class _TestSuiteState:
 
         logger.debug('Set up module: %r', module_name)
         self._module_setup_failed = not self._run_setup(
-            module, 'setUpModule', module_name)
+            module, 'setUpModule', module_name, module_name)
 
     def _setup_class(self, current_class):
         previous_class = self._previous_class
@@ -80,13 +328,14 @@ class _TestSuiteState:
 
         logger.debug('Set up class: %r', current_class)
         self._class_setup_failed = not self._run_setup(
-            current_class, 'setUpClass', current_class.__name__)
+            current_class, 'setUpClass', current_class.__name__,
+            _get_class_name(current_class))
 
     def setup(self, test):
         if isinstance(test, TestSuite):
             return True
         logger.debug('Setup module and class for %r', test)
-        current_class = test.__class__
+        current_class = get_test_case_class(test)
         module = current_class.__module__
         self._teardown_previous_class(current_class)
         self._setup_module(module)
@@ -122,7 +371,8 @@ class _TestSuiteState:
 
         logger.debug('Tear down previous class: %r', previous_class)
         self._run_setup(
-            previous_class, 'tearDownClass', previous_class.__name__)
+            previous_class, 'tearDownClass', previous_class.__name__,
+            _get_class_name(previous_class))
 
     def _teardown_module(self, module_name):
         if self._module_setup_failed:
@@ -135,7 +385,8 @@ class _TestSuiteState:
         if module is None:
             return
 
-        self._run_setup(module, 'tearDownModule', module_name)
+        self._run_setup(
+            module, 'tearDownModule', module_name, module_name)
 
     def teardown(self):
         if self._previous_class is None:
@@ -149,13 +400,46 @@ class TestSuite:
     """A ``TestSuite`` is a container of test cases and allows executing
     many test cases while managing the state of the overall suite.
 
+    Parameters
+    ----------
+    tests : iterable
+        The test cases and test suites contained in the suite.
+    release_tests : bool
+        If ``True``, each test is released from the suite once it has
+        been run, so that it, and anything it holds on to, can be
+        garbage collected before the rest of the suite has run.  Test
+        suites run as part of this suite also release their tests.
+
     """
 
-    def __init__(self, tests=()):
-        self._tests = tuple(tests)
+    def __init__(self, tests=(), release_tests=False):
+        self._tests = list(tests)
+        self._release_tests = release_tests
+        self._released_count = 0
+        self._test_cases = None
+        self._count = None
+
+    def _enumerate(self):
+        """Generate the index and test of each test in the suite that
+        has not been released.
+
+        """
+        for index, test in enumerate(self._tests):
+            if test is not None:
+                yield index, test
+
+    def _release(self, index):
+        """Replace a test that has been run with ``None``, keeping count
+        of the number of test cases it contained.
+
+        """
+        test = self._tests[index]
+        self._released_count += test.countTestCases()
+        self._tests[index] = None
+        self._test_cases = None
 
     def __iter__(self):
-        return iter(self._tests)
+        return (test for _, test in self._enumerate())
 
     def __eq__(self, other):
         if not isinstance(other, TestSuite):
@@ -184,11 +468,14 @@ class TestSuite:
 
         """
         if _state is None:
-            state = _TestSuiteState(result)
+            state = _TestSuiteState(result, self._release_tests)
         else:
             state = _state
+        if state.release_tests:
+            # The index would keep the released tests alive
+            self._test_cases = None
         kwargs = {}
-        for test in self:
+        for index, test in self._enumerate():
             if result.shouldStop:
                 break
             if state.setup(test):
@@ -196,16 +483,117 @@ class TestSuite:
                     kwargs = {'_state': state}
                 logger.debug('Running test %r', test)
                 test(result, **kwargs)
+            if state.release_tests:
+                self._release(index)
         if _state is None:
             state.teardown()
         return result
 
+    def _build_index(self):
+        test_cases = []
+        count = self._released_count
+        stack = [iter(self)]
+        while stack:
+            for test in stack[-1]:
+                if isinstance(test, TestSuite):
+                    if test._test_cases is not None:
+                        test_cases.extend(test._test_cases)
+                        count += test._count
+                        continue
+                    count += test._released_count
+                    stack.append(iter(test))
+                    break
+                try:
+                    iterator = iter(test)
+                except TypeError:
+                    test_cases.append(test)
+                    count += test.countTestCases()
+                else:
+                    stack.append(iterator)
+                    break
+            else:
+                stack.pop()
+        # Released tests are still counted, but the index is not kept
+        # once tests are being released, so that it does not keep them
+        # alive.
+        self._count = count
+        if not (self._release_tests or self._released_count):
+            self._test_cases = tuple(test_cases)
+        return test_cases
+
+    def get_test_cases(self):
+        """Return a sequence of all test cases contained in this suite
+        and the suites nested in it.
+
+        The sequence is built iteratively, and kept for later calls
+        unless the suite releases its tests as they are run.
+
+        """
+        if self._test_cases is not None:
+            return self._test_cases
+        return self._build_index()
+
     def countTestCases(self):
-        """Return the total number of tests contained in this suite.
+        """Return the total number of tests contained in this suite,
+        including tests that have been released after running.
 
         """
-        return sum(test.countTestCases() for test in self)
+        if self._count is None:
+            self._build_index()
+        return self._count
 
     def __repr__(self):
         return '<{0} number_of_tests={1!r}>'.format(
             type(self).__name__, self.countTestCases())
+
+
+class LazyTestSuite(TestSuite):
+    """A :class:`TestSuite` that takes its tests from an iterable only as
+    they are needed, allowing tests to start running before all of them
+    have been loaded.
+
+    Tests are loaded one ahead of iteration, so that the end of the
+    iterable, and the completion callback, are reached before the last
+    test is run.
+
+    """
+
+    def __init__(self, tests=(), on_complete=None, release_tests=False):
+        super(LazyTestSuite, self).__init__(release_tests=release_tests)
+        self._source = iter(tests)
+        self._on_complete = on_complete
+
+    @property
+    def is_complete(self):
+        """``True`` once all tests have been loaded from the iterable.
+
+        """
+        return self._source is None
+
+    def _load_next(self):
+        try:
+            test = next(self._source)
+        except StopIteration:
+            self._source = None
+            if self._on_complete is not None:
+                self._on_complete(self)
+        else:
+            self._tests.append(test)
+
+    def _enumerate(self):
+        index = 0
+        while True:
+            while self._source is not None and \
+                    len(self._tests) <= index + 1:
+                self._load_next()
+            if index >= len(self._tests):
+                return
+            test = self._tests[index]
+            if test is not None:
+                yield index, test
+            index += 1
+
+    def __repr__(self):
+        if self.is_complete:
+            return super(LazyTestSuite, self).__repr__()
+        return '<{0} loading>'.format(type(self).__name__)
@@ -1,4 +1,5 @@
 from contextlib import contextmanager
+from datetime import datetime, timedelta
 import sys
 
 
@@ -19,18 +20,23 @@ class ExcInfoFixture:
             yield sys.exc_info()
 
 
-class MockDateTime:
+class MockPerfCounter:
+    """Stand-in for the ``time`` module returning the given datetimes as
+    :func:`time.perf_counter_ns` values.
+
+    """
+
+    _epoch = datetime(2000, 1, 1)
+
     def __init__(self, ret):
         try:
             self.ret = iter(ret)
         except TypeError:
             self.ret = iter((ret,))
 
-    def utcnow(self):
+    def perf_counter_ns(self):
         try:
-            return next(self.ret)
+            value = next(self.ret)
         except StopIteration:
             raise ValueError('No more mock values!')
-
-    def now(self, tz):
-        return self.utcnow()
+        return (value - self._epoch) // timedelta(microseconds=1) * 1000
@@ -6,7 +6,10 @@
 # of the 3-clause BSD license.  See the LICENSE.txt file for details.
 from datetime import datetime, timedelta
 from unittest import mock
+import os
+import shutil
 import sys
+import tempfile
 import unittest
 
 from io import StringIO
@@ -16,7 +19,7 @@ from ..result import (
     ResultCollector, TestResult, TestCompletionStatus, TestDuration
 )
 from . import _test_cases
-from .fixtures import ExcInfoFixture, MockDateTime
+from .fixtures import ExcInfoFixture, MockPerfCounter
 
 
 class TestBuffering(ExcInfoFixture, unittest.TestCase):
@@ -35,7 +38,7 @@ class TestBuffering(ExcInfoFixture, unittest.TestCase):
         case = _test_cases.TestCase('test_method')
 
         # When
-        with mock.patch('haas.result.datetime', new=MockDateTime(start_time)):
+        with mock.patch('haas.result.time', new=MockPerfCounter(start_time)):
             collector.startTest(case)
 
         # Then
@@ -55,7 +58,7 @@ class TestBuffering(ExcInfoFixture, unittest.TestCase):
                 exception=exc_info, stderr=test_stderr)
             # When
             with mock.patch(
-                    'haas.result.datetime', new=MockDateTime(end_time)):
+                    'haas.result.time', new=MockPerfCounter(end_time)):
                 collector.addError(case, exc_info)
         collector.stopTest(case)
 
@@ -77,7 +80,7 @@ class TestBuffering(ExcInfoFixture, unittest.TestCase):
         case = _test_cases.TestCase('test_method')
 
         # When
-        with mock.patch('haas.result.datetime', new=MockDateTime(start_time)):
+        with mock.patch('haas.result.time', new=MockPerfCounter(start_time)):
             collector.startTest(case)
 
         # Then
@@ -98,10 +101,114 @@ class TestBuffering(ExcInfoFixture, unittest.TestCase):
 
             # When
             with mock.patch(
-                    'haas.result.datetime', new=MockDateTime(end_time)):
+                    'haas.result.time', new=MockPerfCounter(end_time)):
                 collector.addError(case, exc_info)
         collector.stopTest(case)
 
         # Then
         self.assertIn(test_stdout, expected_result.exception)
         handler.assert_called_once_with(expected_result)
+
+    @mock.patch('sys.stderr', new_callable=StringIO)
+    @mock.patch('sys.stdout', new_callable=StringIO)
+    def test_buffering_long_output(self, stdout, stderr):
+        # Given
+        handler = mock.Mock(spec=IResultHandlerPlugin)
+        collector = ResultCollector(buffer=True, buffer_limit=100)
+        collector.add_result_handler(handler)
+        case = _test_cases.TestCase('test_method')
+        test_stdout = ''.join('line {0}\n'.format(index)
+                              for index in range(1000))
+
+        # When
+        collector.startTest(case)
+        sys.stdout.write(test_stdout)
+        with self.exc_info(RuntimeError) as exc_info:
+            collector.addError(case, exc_info)
+        spill_path = collector._stdout_buffer.spill_path
+        collector.stopTest(case)
+
+        # Then
+        self.addCleanup(collector.stopTestRun)
+        result, = handler.call_args[0]
+        self.assertIn(test_stdout[:100], result.exception)
+        self.assertIn(test_stdout[-100:], result.exception)
+        self.assertNotIn(test_stdout[100:200], result.exception)
+        self.assertIn(spill_path, result.exception)
+        with open(spill_path, encoding='utf-8') as fh:
+            self.assertEqual(fh.read(), test_stdout)
+
+    @mock.patch('sys.stderr', new_callable=StringIO)
+    @mock.patch('sys.stdout', new_callable=StringIO)
+    def test_buffering_spill_files_removed_after_run(self, stdout, stderr):
+        # Given
+        temp_dir = tempfile.mkdtemp(prefix='haas-tests-')
+        self.addCleanup(shutil.rmtree, temp_dir)
+        handler = mock.Mock(spec=IResultHandlerPlugin)
+        collector = ResultCollector(buffer=True, buffer_limit=100)
+        collector.add_result_handler(handler)
+        case = _test_cases.TestCase('test_method')
+
+        # When
+        with mock.patch('tempfile.tempdir', temp_dir):
+            collector.startTestRun()
+            collector.startTest(case)
+            sys.stdout.write('output\n' * 100)
+            sys.stderr.write('error\n' * 100)
+            with self.exc_info(RuntimeError) as exc_info:
+                collector.addError(case, exc_info)
+            collector.stopTest(case)
+            spilled = os.listdir(temp_dir)
+            collector.stopTestRun()
+
+        # Then
+        self.assertEqual(len(spilled), 2)
+        self.assertEqual(os.listdir(temp_dir), [])
+
+    def test_buffering_file_descriptors_removed_after_run(self):
+        # Given
+        temp_dir = tempfile.mkdtemp(prefix='haas-tests-')
+        self.addCleanup(shutil.rmtree, temp_dir)
+        handler = mock.Mock(spec=IResultHandlerPlugin)
+        collector = ResultCollector(buffer='fd', buffer_limit=100)
+        collector.add_result_handler(handler)
+        case = _test_cases.TestCase('test_method')
+
+        # When
+        with mock.patch('tempfile.tempdir', temp_dir):
+            collector.startTestRun()
+            collector.startTest(case)
+            os.write(1, b'output\n' * 100)
+            with self.exc_info(RuntimeError) as exc_info:
+                collector.addError(case, exc_info)
+            collector._mirror_output = False
+            collector.stopTest(case)
+            captured = os.listdir(temp_dir)
+            collector.stopTestRun()
+
+        # Then
+        self.assertEqual(len(captured), 2)
+        self.assertEqual(os.listdir(temp_dir), [])
+
+    def test_buffering_file_descriptors(self):
+        # Given
+        handler = mock.Mock(spec=IResultHandlerPlugin)
+        collector = ResultCollector(buffer='fd')
+        collector.add_result_handler(handler)
+        case = _test_cases.TestCase('test_method')
+
+        # When
+        collector.startTestRun()
+        collector.startTest(case)
+        os.write(1, b'Output from fd 1\n')
+        os.write(2, b'Output from fd 2\n')
+        with self.exc_info(RuntimeError) as exc_info:
+            collector.addError(case, exc_info)
+        collector._mirror_output = False
+        collector.stopTest(case)
+        collector.stopTestRun()
+
+        # Then
+        result, = handler.call_args[0]
+        self.assertIn('Output from fd 1', result.exception)
+        self.assertIn('Output from fd 2', result.exception)
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2013-2014 Simon Jagoe
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the 3-clause BSD license.  See the LICENSE.txt file for details.
+import os
+import tempfile
+import unittest
+
+from ..capture import FD_SPILL_LINE, SPILL_LINE, CaptureBuffer, FdCapture
+
+
+class TestCaptureBuffer(unittest.TestCase):
+
+    def setUp(self):
+        self.buffer = CaptureBuffer(limit=10)
+        self.addCleanup(self.buffer.close)
+
+    def test_output_within_limit_kept_in_memory(self):
+        # When
+        self.buffer.write('0123')
+        self.buffer.write('456789')
+
+        # Then
+        self.assertEqual(self.buffer.getvalue(), '0123456789')
+        self.assertIsNone(self.buffer.spill_path)
+
+    def test_output_over_limit_spilled(self):
+        # Given
+        output = ''.join(str(index) for index in range(100))
+
+        # When
+        for index in range(0, len(output), 7):
+            self.buffer.write(output[index:index + 7])
+        value = self.buffer.getvalue()
+
+        # Then
+        path = self.buffer.spill_path
+        omitted = len(output) - 20
+        self.assertEqual(
+            value,
+            output[:10] + SPILL_LINE.format(omitted, path) + output[-10:])
+        self.buffer.reset()
+        with open(path, encoding='utf-8') as fh:
+            self.assertEqual(fh.read(), output)
+
+    def test_unreported_spill_file_removed_on_reset(self):
+        # Given
+        self.buffer.write('x' * 100)
+        path = self.buffer.spill_path
+        self.assertTrue(os.path.isfile(path))
+
+        # When
+        self.buffer.reset()
+
+        # Then
+        self.assertFalse(os.path.exists(path))
+        self.assertIsNone(self.buffer.spill_path)
+        self.assertEqual(self.buffer.getvalue(), '')
+
+    def test_reported_spill_file_removed_on_close(self):
+        # Given
+        self.buffer.write('x' * 100)
+        self.buffer.getvalue()
+        first_path = self.buffer.spill_path
+        self.buffer.reset()
+        self.buffer.write('y' * 100)
+        self.buffer.getvalue()
+        second_path = self.buffer.spill_path
+        self.assertTrue(os.path.isfile(first_path))
+
+        # When
+        self.buffer.close()
+
+        # Then
+        self.assertFalse(os.path.exists(first_path))
+        self.assertFalse(os.path.exists(second_path))
+
+    def test_unencodable_output_spilled(self):
+        # Given
+        output = 'x' * 10 + '\udcff'
+
+        # When
+        self.buffer.write(output)
+        self.buffer.getvalue()
+
+        # Then
+        path = self.buffer.spill_path
+        self.buffer.reset()
+        with open(path, encoding='utf-8') as fh:
+            self.assertEqual(fh.read(), 'x' * 10 + '\\udcff')
+
+    def test_rejects_bytes(self):
+        with self.assertRaises(TypeError):
+            self.buffer.write(b'output')
+
+
+class TestFdCapture(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(prefix='haas-tests-')
+        self.fd = fd
+        self.addCleanup(os.remove, self.path)
+        self.addCleanup(os.close, fd)
+        self.capture = FdCapture(fd, limit=10)
+        self.addCleanup(self.capture.close)
+
+    def _read_target(self):
+        with open(self.path, 'rb') as fh:
+            return fh.read()
+
+    def test_output_captured_while_started(self):
+        # When
+        os.write(self.fd, b'before\n')
+        self.capture.start()
+        os.write(self.fd, b'during')
+        value = self.capture.getvalue()
+        self.capture.stop()
+        os.write(self.fd, b'after\n')
+
+        # Then
+        self.assertEqual(value, 'during')
+        self.assertEqual(self._read_target(), b'before\nafter\n')
+
+    def test_reset_discards_output(self):
+        # Given
+        self.capture.start()
+        os.write(self.fd, b'first')
+        self.capture.stop()
+
+        # When
+        self.capture.reset()
+        self.capture.start()
+        os.write(self.fd, b'second')
+        self.capture.stop()
+
+        # Then
+        self.assertEqual(self.capture.getvalue(), 'second')
+
+    def test_long_output_truncated(self):
+        # Given
+        output = b''.join(str(index).encode() for index in range(100))
+        self.capture.start()
+        os.write(self.fd, output)
+        self.capture.stop()
+
+        # When
+        value = self.capture.getvalue()
+        path = self.capture.path
+        self.capture.reset()
+
+        # Then
+        self.assertEqual(
+            value,
+            output[:10].decode() +
+            FD_SPILL_LINE.format(len(output) - 20, path) +
+            output[-10:].decode())
+        with open(path, 'rb') as fh:
+            self.assertEqual(fh.read(), output)
+        self.assertIsNone(self.capture.path)
+
+    def test_close_removes_temporary_files(self):
+        # Given
+        self.capture.start()
+        os.write(self.fd, b'x' * 100)
+        self.capture.stop()
+        self.capture.getvalue()
+        reported_path = self.capture.path
+        self.capture.reset()
+        self.capture.start()
+        os.write(self.fd, b'unreported')
+        self.capture.stop()
+        current_path = self.capture.path
+        self.assertTrue(os.path.isfile(reported_path))
+
+        # When
+        self.capture.close()
+
+        # Then
+        self.assertFalse(os.path.exists(reported_path))
+        self.assertFalse(os.path.exists(current_path))
+        self.assertIsNone(self.capture.path)
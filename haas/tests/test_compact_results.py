@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2013-2014 Simon Jagoe
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the 3-clause BSD license.  See the LICENSE.txt file for details.
+import pickle
+import sys
+import unittest
+
+from ..result import (
+    ClockAnchor, TestCompletionStatus, TestDuration, TestResult)
+from . import _test_cases
+
+
+def _create_result(**kwargs):
+    case = _test_cases.TestCase('test_method')
+    duration = TestDuration.from_counter(
+        1000, 3500, ClockAnchor(counter_ns=0))
+    return TestResult.from_test_case(
+        case, TestCompletionStatus.skipped, duration, **kwargs)
+
+
+class TestCompactResults(unittest.TestCase):
+
+    def test_no_instance_dict(self):
+        # Given
+        result = _create_result()
+
+        # Then
+        for obj in (result, result.duration, result.duration._anchor):
+            self.assertFalse(hasattr(obj, '__dict__'))
+
+    def test_strings_interned(self):
+        # Given
+        message = ''.join(['not on ', 'this platform'])
+
+        # When
+        result = _create_result(message=message)
+
+        # Then
+        self.assertIs(result.message, sys.intern(message))
+        self.assertIs(result.test_method_name, sys.intern('test_method'))
+
+    def test_pickle(self):
+        # Given
+        result = _create_result(message='not on this platform')
+
+        # When
+        unpickled = pickle.loads(pickle.dumps(result))
+
+        # Then
+        self.assertEqual(unpickled, result)
+        self.assertEqual(unpickled.duration.nanoseconds, 2500)
+        self.assertEqual(unpickled.duration.start_time,
+                         result.duration.start_time)
+        self.assertIs(unpickled.test_method_name, sys.intern('test_method'))
+        self.assertIs(unpickled.message, sys.intern('not on this platform'))
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2013-2014 Simon Jagoe
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the 3-clause BSD license.  See the LICENSE.txt file for details.
+from unittest import mock
+import pickle
+import sys
+import traceback
+import unittest
+
+from ..result import (
+    ExceptionInfo, TestCompletionStatus, TestDuration, TestResult)
+from . import _test_cases
+from .fixtures import ExcInfoFixture
+
+
+class _CustomError(Exception):
+    pass
+
+
+def _recurse(depth):
+    if depth == 0:
+        raise RuntimeError('bottom')
+    _recurse(depth - 1)
+
+
+class TestExceptionInfo(ExcInfoFixture, unittest.TestCase):
+
+    def test_render_matches_traceback_module(self):
+        # Given
+        try:
+            try:
+                raise KeyError('inner')
+            except KeyError as exc:
+                raise ValueError('outer') from exc
+        except ValueError:
+            exc_info = sys.exc_info()
+        expected = ''.join(traceback.format_exception(*exc_info))
+
+        # When
+        info = ExceptionInfo.from_exc_info(exc_info, is_failure=False)
+
+        # Then
+        self.assertEqual(info.render(), expected)
+        self.assertEqual(info.type_name, 'ValueError')
+        self.assertEqual(info.message, 'outer')
+        self.assertEqual(
+            info.frames,
+            [(__file__, info.frames[0][1],
+              'test_render_matches_traceback_module')])
+
+    def test_failure_skips_assert_frames(self):
+        # When
+        with self.failure_exc_info('failed') as exc_info:
+            info = ExceptionInfo.from_exc_info(exc_info, is_failure=True)
+
+        # Then
+        self.assertEqual(info.type_name, 'AssertionError')
+        self.assertEqual(info.message, 'failed')
+        self.assertEqual([frame[2] for frame in info.frames],
+                         ['failure_exc_info'])
+        self.assertTrue(info.render().endswith('AssertionError: failed\n'))
+
+    def test_rendered_lazily_and_once(self):
+        # Given
+        case = _test_cases.TestCase('test_method')
+
+        # When
+        with self.exc_info(RuntimeError) as exc_info:
+            with mock.patch.object(ExceptionInfo, '_render') as render:
+                result = TestResult.from_test_case(
+                    case, TestCompletionStatus.expected_failure,
+                    TestDuration(0), exception=exc_info)
+
+                # Then
+                self.assertFalse(render.called)
+                self.assertIsInstance(result.exception_info, ExceptionInfo)
+
+                # When
+                result.exception
+                result.exception
+
+                # Then
+                render.assert_called_once_with()
+
+    def test_pickle(self):
+        # Given
+        with self.exc_info(RuntimeError) as exc_info:
+            info = ExceptionInfo.from_exc_info(
+                exc_info, is_failure=False, stdout='output')
+
+        # When
+        unpickled = pickle.loads(pickle.dumps(info))
+
+        # Then
+        self.assertEqual(unpickled.render(), info.render())
+        self.assertIn('\nStdout:\noutput\n', unpickled.render())
+
+    def test_frame_limit(self):
+        # Given
+        try:
+            _recurse(10)
+        except RuntimeError:
+            exc_info = sys.exc_info()
+
+        # When
+        info = ExceptionInfo.from_exc_info(
+            exc_info, is_failure=False, frame_limit=3)
+
+        # Then
+        self.assertEqual(len(info.frames), 12)
+        rendered = info.render()
+        self.assertIn('  [... 9 frames omitted ...]\n', rendered)
+        self.assertNotIn('test_frame_limit', rendered)
+        self.assertEqual(rendered.count('in _recurse'), 3)
+
+    def test_size_limit(self):
+        # Given
+        with self.failure_exc_info('x' * 1000) as exc_info:
+            # When
+            info = ExceptionInfo.from_exc_info(
+                exc_info, is_failure=True, stderr='error',
+                size_limit=100)
+
+        # Then
+        rendered = info.render()
+        head, omitted, tail = rendered.partition(' characters omitted ...]')
+        self.assertEqual(len(head.rpartition('\n[... ')[0]), 50)
+        self.assertTrue(tail.endswith('x\n\nStderr:\nerror\n'))
+        self.assertEqual(info.message, 'x' * 1000)
+
+    @unittest.skipIf(sys.version_info < (3, 11), 'Requires __notes__')
+    def test_type_name_and_message_with_notes(self):
+        # Given
+        try:
+            exc = ValueError('message')
+            exc.add_note('A note')
+            raise exc
+        except ValueError:
+            exc_info = sys.exc_info()
+
+        # When
+        info = ExceptionInfo.from_exc_info(exc_info, is_failure=False)
+
+        # Then
+        self.assertEqual(info.type_name, 'ValueError')
+        self.assertEqual(info.message, 'message')
+        self.assertTrue(
+            info.render().endswith('ValueError: message\nA note\n'))
+
+    @unittest.skipIf(sys.version_info < (3, 11), 'Requires ExceptionGroup')
+    def test_type_name_and_message_of_exception_group(self):
+        # Given
+        try:
+            raise ExceptionGroup(  # noqa: F821
+                'several errors', [ValueError('first'), KeyError('second')])
+        except Exception:
+            exc_info = sys.exc_info()
+
+        # When
+        info = ExceptionInfo.from_exc_info(exc_info, is_failure=False)
+
+        # Then
+        self.assertEqual(info.type_name, 'ExceptionGroup')
+        self.assertEqual(info.message, 'several errors (2 sub-exceptions)')
+        self.assertIn('ValueError: first', info.render())
+
+    def test_type_name_qualified_by_module(self):
+        # Given
+        with self.exc_info(_CustomError) as exc_info:
+            # When
+            info = ExceptionInfo.from_exc_info(exc_info, is_failure=False)
+
+        # Then
+        self.assertEqual(info.type_name, __name__ + '._CustomError')
+        self.assertEqual(
+            repr(info), "<ExceptionInfo {0}: ''>".format(info.type_name))
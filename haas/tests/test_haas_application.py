@@ -11,10 +11,17 @@ from unittest import mock
 import logging
 import os
 import shutil
+import subprocess
+import sys
 import tempfile
 import types
 import unittest
 
+try:
+    import coverage
+except ImportError:
+    coverage = None
+
 from testfixtures import LogCapture
 from stevedore.extension import ExtensionManager, Extension
 
@@ -23,7 +30,8 @@ from ..haas_application import HaasApplication
 from ..loader import Loader
 from ..plugin_manager import PluginManager
 from ..plugins.discoverer import Discoverer
-from ..suite import TestSuite
+from ..plugins.runner import BaseTestRunner
+from ..suite import TestSuite, find_test_cases
 from ..utils import cd
 from . import builder
 
@@ -175,6 +183,46 @@ class TestHaasApplication(unittest.TestCase):
         run.assert_called_once_with(result, suite)
         result.wasSuccessful.assert_called_once_with()
 
+    @with_patched_test_runner
+    def test_main_buffer_before_start(self, runner_class, result_class,
+                                      plugin_manager):
+        # When
+        with self._basic_test_fixture() as package_name:
+            run, result = self._run_with_arguments(
+                runner_class, result_class, '--buffer', package_name,
+                plugin_manager=plugin_manager)
+            suite = Discoverer(Loader()).discover(package_name)
+
+        # Then
+        (ns, dest), kwargs = runner_class.from_args.call_args
+        self.assertEqual(ns.start, [package_name])
+        self.assertEqual(result_class.call_args[1]['buffer'], 'sys')
+        run.assert_called_once_with(result, suite)
+
+    @with_patched_test_runner
+    def test_main_buffer_mode(self, runner_class, result_class,
+                              plugin_manager):
+        # When
+        with self._basic_test_fixture() as package_name:
+            self._run_with_arguments(
+                runner_class, result_class, '--buffer-mode', 'fd',
+                package_name, plugin_manager=plugin_manager)
+
+        # Then
+        self.assertEqual(result_class.call_args[1]['buffer'], 'fd')
+
+    @mock.patch('sys.stderr')
+    @with_patched_test_runner
+    def test_async_result_handlers_not_with_fd_buffer(
+            self, stderr, runner_class, result_class, plugin_manager):
+        # When/Then
+        with self.assertRaises(SystemExit):
+            self._run_with_arguments(
+                runner_class, result_class, '--async-result-handlers',
+                '--buffer-mode=fd', plugin_manager=plugin_manager)
+        output = ''.join(call[0][0] for call in stderr.write.call_args_list)
+        self.assertIn('--async-result-handlers cannot be used', output)
+
     @mock.patch('sys.stdout')
     @mock.patch('sys.stderr')
     @mock.patch('haas.plugins.runner.BaseTestRunner')
@@ -310,8 +358,9 @@ class TestHaasApplication(unittest.TestCase):
     def test_with_coverage_plugin(self, runner_class, coverage,
                                   stdout, stderr):
         # When
-        run, result = self._run_with_arguments(
-            runner_class, mock.Mock(), '--with-coverage')
+        with self._basic_test_fixture():
+            run, result = self._run_with_arguments(
+                runner_class, mock.Mock(), '--with-coverage')
 
         # Then
         coverage.assert_called_once_with()
@@ -398,6 +447,162 @@ class TestHaasApplication(unittest.TestCase):
         finally:
             shutil.rmtree(tempdir)
 
+    @with_patched_test_runner
+    def test_overlapping_start_directories(self, runner_class, result_class,
+                                           plugin_manager):
+        # Given
+        module = builder.Module(
+            'test_something.py',
+            (
+                builder.Class(
+                    'TestSomething',
+                    (
+                        builder.Method('test_method'),
+                    ),
+                ),
+            ),
+        )
+        fixture = builder.Directory(
+            'top',
+            (
+                builder.Package(
+                    'outer', (module, builder.Package('inner', (module,)))),
+            ),
+        )
+
+        tempdir = tempfile.mkdtemp(prefix='haas-tests-')
+        try:
+            fixture.create(tempdir)
+
+            top_level = os.path.join(tempdir, fixture.name)
+
+            # When
+            with cd(top_level):
+                run, result = self._run_with_arguments(
+                    runner_class, result_class, '-t', top_level, 'outer',
+                    os.path.join('outer', 'inner'),
+                    plugin_manager=plugin_manager,
+                )
+
+            # Then
+            run.assert_called_once_with(result, mock.ANY)
+            suite = run.call_args[0][1]
+            self.assertEqual(
+                [test.id() for test in find_test_cases(suite)],
+                [
+                    'outer.test_something.TestSomething.test_method',
+                    'outer.inner.test_something.TestSomething.test_method',
+                ],
+            )
+
+        finally:
+            shutil.rmtree(tempdir)
+
+    @with_patched_test_runner
+    def test_group_by_fixture(self, runner_class, result_class,
+                              plugin_manager):
+        # Given
+        module = builder.Module(
+            'test_something.py',
+            (
+                builder.Class(
+                    'TestA',
+                    (builder.Method('test_1'), builder.Method('test_2')),
+                ),
+                builder.Class('TestB', (builder.Method('test_1'),)),
+            ),
+        )
+        fixture = builder.Directory(
+            'top', (builder.Package('grouped', (module,)),))
+        tempdir = tempfile.mkdtemp(prefix='haas-tests-')
+        try:
+            fixture.create(tempdir)
+            top_level = os.path.join(tempdir, fixture.name)
+
+            # When
+            with cd(top_level):
+                run, result = self._run_with_arguments(
+                    runner_class, result_class, '--group-by-fixture',
+                    '-t', top_level, 'grouped.test_something.TestA.test_2',
+                    'grouped.test_something.TestB',
+                    'grouped.test_something.TestA.test_1',
+                    plugin_manager=plugin_manager,
+                )
+
+            # Then
+            suite = run.call_args[0][1]
+            self.assertEqual(
+                [test.id() for test in find_test_cases(suite)],
+                [
+                    'grouped.test_something.TestA.test_2',
+                    'grouped.test_something.TestA.test_1',
+                    'grouped.test_something.TestB.test_1',
+                ],
+            )
+
+        finally:
+            shutil.rmtree(tempdir)
+
+    @with_patched_test_runner
+    def test_watch_reruns_affected_modules(self, runner_class, result_class,
+                                           plugin_manager):
+        # Given
+        test_class = builder.Class(
+            'TestSomething', (builder.Method('test_method'),))
+        fixture = builder.Directory(
+            'top',
+            (
+                builder.Package(
+                    'watched',
+                    (
+                        builder.Module(
+                            'helper.py', (builder.RawText('', 'VALUE = 1'),)),
+                        builder.Module(
+                            'test_helper.py',
+                            (builder.RawText('', 'from . import helper'),
+                             test_class)),
+                        builder.Module('test_other.py', (test_class,)),
+                    ),
+                ),
+            ),
+        )
+        tempdir = tempfile.mkdtemp(prefix='haas-tests-')
+        top_level = os.path.join(tempdir, fixture.name)
+        helper = os.path.join(top_level, 'watched', 'helper.py')
+        watcher = mock.MagicMock()
+        watcher.__enter__.return_value = watcher
+        watcher.wait.side_effect = [{helper}, KeyboardInterrupt]
+        try:
+            fixture.create(tempdir)
+
+            # When
+            with cd(top_level), mock.patch('sys.stderr'), mock.patch(
+                    'haas.haas_application.create_watcher',
+                    return_value=watcher) as create_watcher:
+                run, result = self._run_with_arguments(
+                    runner_class, result_class, '--watch', '-t', top_level,
+                    'watched', plugin_manager=plugin_manager,
+                )
+
+            # Then
+            create_watcher.assert_called_once_with(top_level)
+            self.assertEqual(run.call_count, 2)
+            first, second = (call[0][1] for call in run.call_args_list)
+            self.assertEqual(
+                sorted(test.id() for test in find_test_cases(first)),
+                [
+                    'watched.test_helper.TestSomething.test_method',
+                    'watched.test_other.TestSomething.test_method',
+                ],
+            )
+            self.assertEqual(
+                [test.id() for test in find_test_cases(second)],
+                ['watched.test_helper.TestSomething.test_method'],
+            )
+
+        finally:
+            shutil.rmtree(tempdir)
+
     @with_patched_test_runner
     def test_multiple_start_directories_non_package(self, runner_class,
                                                     result_class,
@@ -454,3 +659,240 @@ class TestHaasApplication(unittest.TestCase):
         root_logging.check()
         haas_logging.check(
             (haas.__name__, logging.getLevelName(logging.INFO), message))
+
+
+_RELEASED_TEST_MODULE = """\
+import gc
+import unittest
+import weakref
+
+REFS = []
+
+
+class TestReleased(unittest.TestCase):
+
+    def test_1(self):
+        REFS.append(weakref.ref(self))
+
+    def test_2(self):
+        REFS.append(weakref.ref(self))
+
+    def test_3(self):
+        gc.collect()
+        self.assertEqual([ref for ref in REFS if ref() is not None], [])
+"""
+
+
+class TestReleaseTests(unittest.TestCase):
+
+    def setUp(self):
+        self.modules = sys.modules.copy()
+        self.tempdir = tempfile.mkdtemp(prefix='haas-tests-')
+        fixture = builder.Directory(
+            'top',
+            (
+                builder.Package(
+                    'released',
+                    (
+                        builder.Module(
+                            'test_released.py',
+                            (builder.RawText('', _RELEASED_TEST_MODULE),)),
+                    ),
+                ),
+            ),
+        )
+        fixture.create(self.tempdir)
+        self.top_level = os.path.join(self.tempdir, fixture.name)
+
+    def tearDown(self):
+        for key in [key for key in sys.modules if key not in self.modules]:
+            del sys.modules[key]
+        shutil.rmtree(self.tempdir)
+
+    def _run(self, *args):
+        runner = Extension('default', None, BaseTestRunner, None)
+        discoverer = Extension('default', None, Discoverer, None)
+        plugin_manager = PluginManager.testing_plugin_manager(
+            hook_managers=[
+                (hook, ExtensionManager.make_test_instance(
+                    [], namespace=hook))
+                for hook in (PluginManager.ENVIRONMENT_HOOK,
+                             PluginManager.RESULT_HANDLERS)
+            ],
+            driver_managers=[
+                (PluginManager.TEST_DISCOVERY,
+                 ExtensionManager.make_test_instance(
+                     [discoverer], namespace=PluginManager.TEST_DISCOVERY)),
+                (PluginManager.TEST_RUNNER,
+                 ExtensionManager.make_test_instance(
+                     [runner], namespace=PluginManager.TEST_RUNNER)),
+            ],
+        )
+        app = HaasApplication(
+            ['argv0', '-t', self.top_level] + list(args) + ['released'])
+        with cd(self.top_level):
+            return app.run(plugin_manager=plugin_manager)
+
+    def test_executed_tests_collected(self):
+        # When
+        failed = self._run('--release-tests')
+
+        # Then
+        self.assertFalse(failed)
+
+    def test_executed_tests_collected_when_streaming(self):
+        # When
+        failed = self._run('--release-tests', '--stream')
+
+        # Then
+        self.assertFalse(failed)
+
+    def test_executed_tests_kept_by_default(self):
+        # When
+        failed = self._run()
+
+        # Then
+        self.assertTrue(failed)
+
+
+class TestChangedSinceErrors(unittest.TestCase):
+
+    def setUp(self):
+        self.modules = sys.modules.copy()
+        self.tempdir = tempfile.mkdtemp(prefix='haas-tests-')
+        fixture = builder.Directory(
+            'top',
+            (
+                builder.Package(
+                    'changed',
+                    (
+                        builder.Module(
+                            'test_changed.py',
+                            (builder.Class(
+                                'TestChanged',
+                                (builder.Method('test_method'),)),)),
+                    ),
+                ),
+            ),
+        )
+        fixture.create(self.tempdir)
+        self.top_level = os.path.join(self.tempdir, fixture.name)
+
+    def tearDown(self):
+        for key in [key for key in sys.modules if key not in self.modules]:
+            del sys.modules[key]
+        shutil.rmtree(self.tempdir)
+
+    def _init_repository(self):
+        for args in (('init', '-q'), ('add', '.'),
+                     ('-c', 'user.name=haas', '-c',
+                      'user.email=haas@example.com',
+                      'commit', '-q', '-m', 'Initial')):
+            subprocess.check_call(
+                ('git',) + args, cwd=self.top_level,
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    def _run_with_error(self, runner_class, plugin_manager, *args):
+        app = HaasApplication(
+            ['argv0', '-t', self.top_level] + list(args) + ['changed'])
+        with mock.patch('sys.stderr') as stderr:
+            with cd(self.top_level):
+                with self.assertRaises(SystemExit):
+                    app.run(plugin_manager=plugin_manager)
+        self.assertFalse(runner_class.called)
+        return ''.join(call[0][0] for call in stderr.write.call_args_list)
+
+    @unittest.skipIf(shutil.which('git') is None, 'Requires git')
+    @with_patched_test_runner
+    def test_unknown_revision(
+            self, runner_class, result_class, plugin_manager):
+        # Given
+        self._init_repository()
+
+        # When
+        output = self._run_with_error(
+            runner_class, plugin_manager, '--changed-since',
+            'no-such-revision')
+
+        # Then
+        self.assertIn("error: Unknown git revision 'no-such-revision'", output)
+
+    @unittest.skipIf(shutil.which('git') is None, 'Requires git')
+    @with_patched_test_runner
+    def test_not_a_git_checkout(
+            self, runner_class, result_class, plugin_manager):
+        # Given
+        environment = {'GIT_CEILING_DIRECTORIES': self.tempdir}
+
+        # When
+        with mock.patch.dict(os.environ, environment):
+            output = self._run_with_error(
+                runner_class, plugin_manager, '--changed-since', 'HEAD')
+
+        # Then
+        self.assertIn('error:', output)
+        self.assertIn('not a git repository', output)
+        self.assertNotIn('usage: git', output)
+
+    @with_patched_test_runner
+    def test_git_not_run(
+            self, runner_class, result_class, plugin_manager):
+        # Given
+        error = OSError(2, 'No such file or directory')
+
+        # When
+        with mock.patch('haas.selection.subprocess.check_output',
+                        side_effect=error):
+            output = self._run_with_error(
+                runner_class, plugin_manager, '--changed-since', 'HEAD')
+
+        # Then
+        self.assertIn('error: Unable to run git', output)
+
+    @unittest.skipIf(shutil.which('git') is None, 'Requires git')
+    @unittest.skipIf(coverage is None, 'Requires coverage')
+    @with_patched_test_runner
+    def test_missing_coverage_data_file(
+            self, runner_class, result_class, plugin_manager):
+        # Given
+        self._init_repository()
+
+        # When
+        output = self._run_with_error(
+            runner_class, plugin_manager, '--changed-since', 'HEAD',
+            '--select-by', 'coverage', '--coverage-data-file', 'no-such-file')
+
+        # Then
+        self.assertIn("error: No coverage data file 'no-such-file'", output)
+
+    @with_patched_test_runner
+    def test_changed_since_and_changed_files_exclusive(
+            self, runner_class, result_class, plugin_manager):
+        # When
+        output = self._run_with_error(
+            runner_class, plugin_manager, '--changed-since', 'HEAD',
+            '--changed-files', 'changed/test_changed.py')
+
+        # Then
+        self.assertIn('not allowed with argument', output)
+
+    @with_patched_test_runner
+    def test_changed_files(self, runner_class, result_class, plugin_manager):
+        # Given
+        changed_files = ','.join((
+            os.path.join('changed', 'removed.py'),
+            os.path.join('changed', 'test_changed.py')))
+        app = HaasApplication(
+            ['argv0', '-t', self.top_level, '--changed-files', changed_files,
+             'changed'])
+
+        # When
+        with cd(self.top_level):
+            app.run(plugin_manager=plugin_manager)
+
+        # Then
+        run = runner_class.from_args.return_value.run
+        suite = run.call_args[0][1]
+        self.assertEqual(
+            [test.id() for test in find_test_cases(suite)],
+            ['changed.test_changed.TestChanged.test_method'])
@@ -0,0 +1,316 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2013-2014 Simon Jagoe
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the 3-clause BSD license.  See the LICENSE.txt file for details.
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+import threading
+import time
+import unittest
+
+from ..error_holder import ErrorHolder
+from ..handler_thread import HandlerThread, handle_results
+from ..plugins.i_result_handler_plugin import IResultHandlerPlugin
+from ..plugins.result_handler import StandardTestResultHandler
+from ..result import (
+    FixtureResult, ResultCollector, TestCompletionStatus, TestDuration,
+    TestResult)
+from ..suite import TestSuite
+from . import _test_cases
+
+
+def _create_result(status=TestCompletionStatus.success):
+    case = _test_cases.TestCase('test_method')
+    return TestResult.from_test_case(
+        case, status, TestDuration(timedelta(seconds=1)))
+
+
+class RecordingHandler:
+
+    def __init__(self):
+        self.events = []
+        self.threads = set()
+
+    def handle_results(self, results):
+        self.threads.add(threading.current_thread())
+        self.events.append(('results', list(results)))
+
+    def handle_fixture_result(self, fixture_result):
+        self.events.append(('fixture_result', fixture_result))
+
+    def update_test_count(self, test_count):
+        self.events.append(('test_count', test_count))
+
+
+class TestHandlerThread(unittest.TestCase):
+
+    def test_events_handled_in_order(self):
+        # Given
+        handler = RecordingHandler()
+        thread = HandlerThread([handler])
+        results = [_create_result(), _create_result()]
+        fixture_result = FixtureResult(
+            'setUpClass', 'module.Class', TestDuration(0))
+
+        # When
+        thread.start()
+        thread.put_results(results[:1])
+        thread.put_fixture_result(fixture_result)
+        thread.put_results(results[1:])
+        thread.put_test_count(2)
+        thread.stop()
+
+        # Then
+        self.assertFalse(thread.is_running)
+        self.assertNotIn(threading.current_thread(), handler.threads)
+        self.assertEqual(
+            [event for event in handler.events if event[0] == 'results'],
+            [('results', [results[0]]), ('results', [results[1]])])
+        self.assertEqual(
+            [event[0] for event in handler.events],
+            ['results', 'fixture_result', 'results', 'test_count'])
+
+    def test_consecutive_results_batched(self):
+        # Given
+        handler = RecordingHandler()
+        thread = HandlerThread([handler])
+        results = [_create_result() for _ in range(3)]
+        for result in results:
+            thread.put_results([result])
+
+        # When
+        thread.start()
+        thread.stop()
+
+        # Then
+        self.assertEqual(handler.events, [('results', results)])
+
+    def test_handler_error_raised_on_stop(self):
+        # Given
+        handler = mock.Mock(spec=IResultHandlerPlugin)
+        handler.handle_results.side_effect = RuntimeError('failed')
+        thread = HandlerThread([handler], maxsize=1)
+
+        # When
+        thread.start()
+        for _ in range(5):
+            thread.put_results([_create_result()])
+
+        # Then
+        with self.assertRaisesRegex(RuntimeError, 'failed'):
+            thread.stop()
+        self.assertEqual(handler.handle_results.call_count, 1)
+
+    def test_handle_results_fallback(self):
+        # Given
+        handler = mock.Mock(spec=[
+            'start_test', 'stop_test', '__call__'])
+        result = _create_result()
+
+        # When
+        handle_results(handler, [result])
+
+        # Then
+        handler.start_test.assert_called_once_with(result.test)
+        handler.assert_called_once_with(result)
+        handler.stop_test.assert_called_once_with(result.test)
+
+    def test_handle_results_fallback_with_tests(self):
+        # Given
+        handler = mock.Mock(spec=[
+            'start_test', 'stop_test', '__call__'])
+        result = _create_result()
+        case = _test_cases.TestCase('test_method')
+
+        # When
+        with mock.patch.object(
+                TestResult, 'test', new_callable=mock.PropertyMock,
+                side_effect=AssertionError('Test case created')):
+            handle_results(handler, [result], [case])
+
+        # Then
+        handler.start_test.assert_called_once_with(case)
+        handler.assert_called_once_with(result)
+        handler.stop_test.assert_called_once_with(case)
+
+    def test_handle_results_fallback_fixture_error(self):
+        # Given
+        handler = mock.Mock(spec=[
+            'start_test', 'stop_test', '__call__'])
+        result = TestResult.from_test_case(
+            ErrorHolder('setUpClass (module.TestClass)'),
+            TestCompletionStatus.error, TestDuration(0),
+            exception=(RuntimeError, RuntimeError(), None))
+
+        # When
+        handle_results(handler, [result])
+
+        # Then
+        self.assertFalse(handler.start_test.called)
+        handler.assert_called_once_with(result)
+        self.assertFalse(handler.stop_test.called)
+
+
+class TestAsyncResultCollector(unittest.TestCase):
+
+    def test_results_handled_in_background(self):
+        # Given
+        handler = mock.Mock(spec=IResultHandlerPlugin)
+        collector = ResultCollector(async_handlers=True)
+        collector.add_result_handler(handler)
+        case = _test_cases.TestCase('test_method')
+
+        # When
+        collector.startTestRun()
+        collector.startTest(case)
+        collector.addFailure(case, (AssertionError, AssertionError(), None))
+        collector.stopTest(case)
+
+        # Then
+        self.assertFalse(handler.start_test.called)
+        self.assertFalse(handler.stop_test.called)
+        self.assertFalse(collector.wasSuccessful())
+
+        # When
+        collector.stopTestRun()
+
+        # Then
+        handler.start_test_run.assert_called_once_with()
+        handler.stop_test_run.assert_called_once_with()
+        self.assertEqual(handler.handle_results.call_count, 1)
+        (results,), _ = handler.handle_results.call_args
+        self.assertEqual(
+            [result.status for result in results],
+            [TestCompletionStatus.failure])
+
+    def test_handlers_get_tests_that_ran(self):
+        # Given
+        class PerTestHandler(IResultHandlerPlugin):
+            def __init__(self):
+                self.started = []
+                self.stopped = []
+
+            @classmethod
+            def from_args(cls, args, name, dest_prefix, test_count):
+                pass
+
+            @classmethod
+            def add_parser_arguments(
+                    cls, parser, name, option_prefix, dest_prefix):
+                pass
+
+            def start_test(self, test):
+                self.started.append(test)
+
+            def stop_test(self, test):
+                self.stopped.append(test)
+
+            def start_test_run(self):
+                pass
+
+            def stop_test_run(self):
+                pass
+
+            def __call__(self, result):
+                pass
+
+        handler = PerTestHandler()
+        collector = ResultCollector(async_handlers=True)
+        collector.add_result_handler(handler)
+        cases = [_test_cases.TestCase('test_method'),
+                 _test_cases.TestCase('test_method')]
+
+        # When
+        with mock.patch.object(
+                TestResult, 'test', new_callable=mock.PropertyMock,
+                side_effect=AssertionError('Test case created')):
+            collector.startTestRun()
+            TestSuite(cases).run(collector)
+            collector.stopTestRun()
+
+        # Then
+        self.assertEqual([id(test) for test in handler.started],
+                         [id(case) for case in cases])
+        self.assertEqual([id(test) for test in handler.stopped],
+                         [id(case) for case in cases])
+
+    def test_handler_output_before_test_output(self):
+        # Given
+        class SlowHandler:
+            def __init__(self, stream):
+                self.stream = stream
+
+            def start_test_run(self):
+                pass
+
+            def stop_test_run(self):
+                pass
+
+            def handle_results(self, results):
+                time.sleep(0.05)
+                self.stream.write('handled\n')
+
+        class PrintingTestCase(unittest.TestCase):
+            def test_method(self):
+                print('captured')
+                self.fail()
+
+        stream = StringIO()
+        with mock.patch('sys.stdout', new=stream), \
+                mock.patch('sys.stderr', new=stream):
+            collector = ResultCollector(buffer=True, async_handlers=True)
+            collector.add_result_handler(SlowHandler(stream))
+
+            # When
+            collector.startTestRun()
+            PrintingTestCase('test_method').run(collector)
+            collector.stopTestRun()
+
+        # Then
+        output = stream.getvalue()
+        self.assertIn('captured', output)
+        self.assertLess(output.index('handled'), output.index('captured'))
+
+    @mock.patch('sys.stderr', new_callable=StringIO)
+    def test_fixture_errors_not_counted_as_tests(self, stderr):
+        # Given
+        class FailingSetUpClass(unittest.TestCase):
+
+            @classmethod
+            def setUpClass(cls):
+                raise RuntimeError('setUpClass failed')
+
+            def test_method(self):
+                pass
+
+        def run(async_handlers):
+            handler = StandardTestResultHandler(test_count=4)
+            collector = ResultCollector(async_handlers=async_handlers)
+            collector.add_result_handler(handler)
+            suite = TestSuite([
+                TestSuite([FailingSetUpClass('test_method')]),
+                TestSuite([_test_cases.TestCase('test_method'),
+                           _test_cases.TestCase('test_method'),
+                           _test_cases.TestCase('test_method')]),
+            ])
+            collector.startTestRun()
+            suite.run(collector)
+            collector.stopTestRun()
+            return collector.testsRun, handler.tests_run
+
+        # When
+        sync_counts = run(async_handlers=False)
+        async_counts = run(async_handlers=True)
+
+        # Then
+        self.assertEqual(sync_counts, (3, 3))
+        self.assertEqual(async_counts, (3, 3))
+        self.assertEqual(stderr.getvalue().count('Ran 3 tests'), 2)
+
+    def test_not_combined_with_fd_buffer(self):
+        # When/Then
+        with self.assertRaises(ValueError):
+            ResultCollector(buffer='fd', async_handlers=True)
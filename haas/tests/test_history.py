@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2013-2014 Simon Jagoe
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the 3-clause BSD license.  See the LICENSE.txt file for details.
+from datetime import datetime
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+from ..error_holder import ErrorHolder
+from ..history import HistoryDatabase, get_default_history_path
+from ..result import (
+    ClockAnchor, TestCompletionStatus, TestDuration, TestResult)
+from ..utils import CACHE_DIRECTORY, cd
+from . import _test_cases
+
+_TEST_ID = 'haas.tests._test_cases.TestCase.test_method'
+_OTHER_TEST_ID = 'haas.tests._test_cases.TestCase.test_other'
+
+
+def _create_result(status=TestCompletionStatus.success, duration_ns=1000,
+                   method_name='test_method', worker=None):
+    anchor = ClockAnchor(datetime(2015, 12, 23, 8, 14, 12), 0)
+    return TestResult(
+        _test_cases.TestCase, method_name, status,
+        TestDuration.from_counter(0, duration_ns, anchor), worker=worker)
+
+
+class TestHistoryDatabase(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp(prefix='haas-tests-')
+        self.path = os.path.join(self.tempdir, 'history.sqlite')
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def _record_run(self, database, results, successful=True):
+        run_id = database.start_run(len(results))
+        database.add_results(run_id, results)
+        database.finish_run(run_id, successful)
+        return run_id
+
+    def test_records_runs_and_results(self):
+        # Given
+        start_time = datetime(2015, 12, 23, 8, 14, 12)
+        stop_time = datetime(2015, 12, 23, 8, 15, 12)
+        result = _create_result(
+            TestCompletionStatus.failure, worker='ForkPoolWorker-1')
+
+        # When
+        with HistoryDatabase(self.path) as database:
+            run_id = database.start_run(start_time=start_time)
+            database.add_results(run_id, [result])
+            database.finish_run(
+                run_id, False, test_count=1, stop_time=stop_time)
+
+        # Then
+        with HistoryDatabase(self.path) as database:
+            self.assertEqual(database.get_runs(), [
+                (run_id, start_time.isoformat(), stop_time.isoformat(), 1,
+                 False)])
+        connection = sqlite3.connect(self.path)
+        try:
+            rows = connection.execute('SELECT * FROM results').fetchall()
+        finally:
+            connection.close()
+        self.assertEqual(rows, [
+            (run_id, _TEST_ID, 'failure', 1000,
+             '2015-12-23T08:14:12', 'ForkPoolWorker-1')])
+
+    def test_fixture_errors_not_recorded(self):
+        # Given
+        fixture_error = TestResult(
+            ErrorHolder, 'setUpClass (haas.tests._test_cases.TestCase)',
+            TestCompletionStatus.error, TestDuration.from_nanoseconds(1000))
+
+        # When
+        with HistoryDatabase(self.path) as database:
+            self._record_run(database, [fixture_error, _create_result()])
+
+            # Then
+            self.assertEqual(
+                [test_id for test_id, _, _ in database.get_slowest_tests()],
+                [_TEST_ID])
+
+    def test_get_slowest_tests(self):
+        # Given
+        with HistoryDatabase(self.path) as database:
+            self._record_run(database, [
+                _create_result(duration_ns=5000),
+                _create_result(duration_ns=1000, method_name='test_other')])
+            self._record_run(database, [
+                _create_result(duration_ns=1000),
+                _create_result(duration_ns=2000, method_name='test_other')])
+
+            # When
+            slowest = database.get_slowest_tests(count=1)
+            recent = database.get_slowest_tests(runs=1)
+
+        # Then
+        self.assertEqual(slowest, [(_TEST_ID, TestDuration(0.000003), 2)])
+        self.assertEqual(recent, [
+            (_OTHER_TEST_ID, TestDuration(0.000002), 1),
+            (_TEST_ID, TestDuration(0.000001), 1)])
+
+    def test_get_flaky_tests(self):
+        # Given
+        with HistoryDatabase(self.path) as database:
+            self._record_run(database, [
+                _create_result(TestCompletionStatus.error),
+                _create_result(TestCompletionStatus.skipped,
+                               method_name='test_other')])
+            for _ in range(2):
+                self._record_run(database, [
+                    _create_result(),
+                    _create_result(TestCompletionStatus.failure,
+                                   method_name='test_other')])
+
+            # When
+            flaky = database.get_flaky_tests()
+            recent = database.get_flaky_tests(runs=2)
+
+        # Then
+        self.assertEqual(flaky, [(_TEST_ID, 2, 1)])
+        self.assertEqual(recent, [])
+
+    def test_get_duration_trend(self):
+        # Given
+        with HistoryDatabase(self.path) as database:
+            run_ids = [
+                self._record_run(database, [_create_result(
+                    status, duration_ns=duration_ns)])
+                for status, duration_ns in (
+                    (TestCompletionStatus.success, 1000),
+                    (TestCompletionStatus.failure, 3000),
+                    (TestCompletionStatus.success, 2000))]
+            self._record_run(database, [
+                _create_result(method_name='test_other')])
+
+            # When
+            trend = database.get_duration_trend(_TEST_ID, runs=3)
+
+        # Then
+        self.assertEqual(
+            [(run_id, status, duration.nanoseconds)
+             for run_id, start_time, status, duration in trend],
+            [(run_ids[1], TestCompletionStatus.failure, 3000),
+             (run_ids[2], TestCompletionStatus.success, 2000)])
+
+    def test_newer_version_not_opened(self):
+        # Given
+        connection = sqlite3.connect(self.path)
+        connection.execute('PRAGMA user_version = 100')
+        connection.close()
+
+        # When/Then
+        with self.assertRaisesRegex(ValueError, 'version'):
+            HistoryDatabase(self.path)
+
+    def test_default_history_path(self):
+        # When
+        with cd(self.tempdir):
+            path = get_default_history_path()
+
+        # Then
+        self.assertTrue(os.path.isdir(
+            os.path.join(self.tempdir, CACHE_DIRECTORY)))
+        self.assertEqual(
+            os.path.dirname(os.path.dirname(os.path.realpath(path))),
+            os.path.realpath(self.tempdir))
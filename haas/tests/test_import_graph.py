@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2013-2014 Simon Jagoe
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the 3-clause BSD license.  See the LICENSE.txt file for details.
+import os
+import shutil
+import tempfile
+import unittest
+
+from ..import_graph import ImportGraph
+from . import builder
+
+
+class TestImportGraph(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp(prefix='haas-tests-')
+        fixture = builder.Package(
+            'project',
+            (
+                builder.Module(
+                    'core.py', (builder.RawText('', 'VALUE = 1\n'),)),
+                builder.Module(
+                    'api.py', (builder.RawText('', 'from . import core\n'),)),
+                builder.Module(
+                    'unrelated.py', (builder.RawText('', 'import os\n'),)),
+                builder.Package(
+                    'tests',
+                    (
+                        builder.Module(
+                            'test_api.py',
+                            (builder.RawText(
+                                '', 'from ..api import VALUE\n'),)),
+                        builder.Module(
+                            'test_core.py',
+                            (builder.RawText(
+                                '', 'import project.core\n'),)),
+                        builder.Module(
+                            'test_broken.py',
+                            (builder.RawText('', 'import (\n'),)),
+                    ),
+                ),
+            ),
+        )
+        fixture.create(self.tempdir)
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def _path(self, *parts):
+        return os.path.join(self.tempdir, 'project', *parts)
+
+    def test_get_dependents(self):
+        # Given
+        graph = ImportGraph(self.tempdir)
+
+        # When
+        dependents = graph.get_dependents(['project.core'])
+
+        # Then
+        self.assertEqual(dependents, {
+            'project.core',
+            'project.api',
+            'project.tests.test_api',
+            'project.tests.test_core',
+        })
+
+    def test_module_names_and_paths(self):
+        # Given
+        graph = ImportGraph(self.tempdir)
+        path = self._path('tests', 'test_api.py')
+
+        # Then
+        self.assertEqual(graph.get_module_name(path), 'project.tests.test_api')
+        self.assertEqual(graph.get_path('project.tests.test_api'), path)
+        self.assertEqual(
+            graph.get_module_name(self._path('__init__.py')), 'project')
+        self.assertIsNone(
+            graph.get_module_name(os.path.join(self.tempdir, 'README.txt')))
+
+    def test_update_changed_import(self):
+        # Given
+        graph = ImportGraph(self.tempdir)
+        path = self._path('unrelated.py')
+        with open(path, 'w') as fh:
+            fh.write('from project.core import VALUE\n')
+
+        # When
+        changed = graph.update([path])
+
+        # Then
+        self.assertEqual(changed, {'project.unrelated'})
+        self.assertIn(
+            'project.unrelated', graph.get_dependents(['project.core']))
+
+    def test_update_deleted_module(self):
+        # Given
+        graph = ImportGraph(self.tempdir)
+        path = self._path('api.py')
+        os.remove(path)
+
+        # When
+        changed = graph.update([path])
+
+        # Then
+        self.assertEqual(changed, {'project.api'})
+        self.assertIsNone(graph.get_path('project.api'))
+        self.assertEqual(
+            graph.get_dependents(changed),
+            {'project.api', 'project.tests.test_api'})
+
+    def test_build_directories(self):
+        # Given
+        builder.Package(
+            'build', (builder.Module(
+                'test_build.py',
+                (builder.RawText('', 'from project import core\n'),)),),
+        ).create(self.tempdir)
+        builder.Directory(
+            'dist', (builder.Module(
+                'core.py', (builder.RawText('', 'VALUE = 1\n'),)),),
+        ).create(self.tempdir)
+        graph = ImportGraph(self.tempdir)
+
+        # When
+        build_name = graph.get_module_name(
+            os.path.join(self.tempdir, 'build', 'test_build.py'))
+        dist_name = graph.get_module_name(
+            os.path.join(self.tempdir, 'dist', 'core.py'))
+
+        # Then
+        self.assertEqual(build_name, 'build.test_build')
+        self.assertIsNone(dist_name)
+        self.assertIn(
+            'build.test_build', graph.get_dependents(['project.core']))
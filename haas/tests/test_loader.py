@@ -4,12 +4,13 @@
 #
 # This software may be modified and distributed under the terms
 # of the 3-clause BSD license.  See the LICENSE.txt file for details.
+import types
 import unittest
 
 from . import _test_cases
 from . import _test_case_data
 from ..loader import Loader
-from ..suite import TestSuite
+from ..suite import TestCaseHandle, TestSuite
 
 
 class LoaderTestMixin:
@@ -47,6 +48,17 @@ class TestLoadTest(LoaderTestMixin, unittest.TestCase):
         with self.assertRaises(TypeError):
             loader.load_test(unittest.TestCase, 'test_method')
 
+    def test_creates_handle_for_lazy_test_cases(self):
+        loader = Loader(lazy_test_cases=True)
+        test = loader.load_test(_test_cases.TestCase, 'test_method')
+        self.assertEqual(
+            test, TestCaseHandle(_test_cases.TestCase, 'test_method'))
+
+    def test_lazy_test_cases_raises_for_missing_method(self):
+        loader = Loader(lazy_test_cases=True)
+        with self.assertRaises(ValueError):
+            loader.load_test(_test_cases.TestCase, 'test_missing')
+
     def test_load_test_overridden_init(self):
         test = self.loader.load_test(
             _test_case_data.BadlySubclassedTestCase, 'test_method')
@@ -64,6 +76,61 @@ class TestFindTestMethodNames(LoaderTestMixin, unittest.TestCase):
         names = loader.find_test_method_names(_test_cases.TestCase)
         self.assertEqual(names, ['non_test_public_method'])
 
+    def test_finds_names_through_mixins_in_dir_order(self):
+        # Given
+        class Mixin:
+            test_attribute = 'not callable'
+
+            def test_b(self):
+                pass
+
+            @staticmethod
+            def test_static():
+                pass
+
+        class Base(Mixin, unittest.TestCase):
+            def test_c(self):
+                pass
+
+        class Case(Base):
+            def test_a(self):
+                pass
+
+            def test_b(self):
+                pass
+
+        expected = [name for name in dir(Case)
+                    if name.startswith('test') and
+                    callable(getattr(Case, name))]
+
+        # When
+        names = self.loader.find_test_method_names(Case)
+
+        # Then
+        self.assertEqual(names, expected)
+        self.assertEqual(names, ['test_a', 'test_b', 'test_c', 'test_static'])
+
+    def test_names_memoized_per_class_and_prefix(self):
+        # Given
+        class Case(unittest.TestCase):
+            def test_method(self):
+                pass
+
+            def check_method(self):
+                pass
+
+        self.loader.find_test_method_names(Case)
+        Case.test_added = lambda self: None
+
+        # When
+        names = self.loader.find_test_method_names(Case)
+        check_loader = Loader(test_method_prefix='check')
+        check_names = check_loader.find_test_method_names(Case)
+
+        # Then
+        self.assertEqual(names, ['test_method'])
+        self.assertEqual(check_names, ['check_method'])
+
 
 class TestLoadCase(LoaderTestMixin, unittest.TestCase):
 
@@ -107,6 +174,21 @@ class TestLoadModule(LoaderTestMixin, unittest.TestCase):
         self.assertCountEqual(
             cases, [_test_cases.TestCase, _test_cases.AnotherTestCase])
 
+    def test_find_cases_defined_in_module_only(self):
+        # Given
+        module = types.ModuleType('reexporting_module')
+        module.TestCase = _test_cases.TestCase
+        loader = Loader(load_imported_cases=False)
+
+        # When
+        imported = loader.get_test_cases_from_module(module)
+        defined = loader.get_test_cases_from_module(_test_cases)
+
+        # Then
+        self.assertEqual(imported, [])
+        self.assertCountEqual(
+            defined, [_test_cases.TestCase, _test_cases.AnotherTestCase])
+
     def test_load_all_cases_in_module(self):
         suite = self.loader.load_module(_test_cases)
         self.assertSuiteClasses(suite, TestSuite)
@@ -2,16 +2,19 @@ from argparse import ArgumentParser
 from datetime import datetime, timedelta
 from io import StringIO
 from unittest import mock
+import multiprocessing
 import unittest
 import time
 
 from ..plugins.discoverer import _create_import_error_test
-from ..plugins.parallel_runner import ChildResultHandler, ParallelTestRunner
+from ..plugins.parallel_runner import (
+    ChildResultHandler, ParallelTestRunner, _initialize_worker,
+    register_worker_initializer, unregister_worker_initializer)
 from ..result import (
     ResultCollector, TestCompletionStatus, TestResult, TestDuration)
 from ..suite import TestSuite
 from . import _test_cases
-from .fixtures import MockDateTime
+from .fixtures import MockPerfCounter
 
 
 class AsyncResult:
@@ -110,18 +113,92 @@ class TestParallelTestRunner(unittest.TestCase):
         runner = ParallelTestRunner(processes)
 
         # When
-        with mock.patch('haas.result.datetime', new=MockDateTime(
+        with mock.patch('haas.result.time', new=MockPerfCounter(
                 [start_time, end_time])):
             runner.run(result_collector, test_suite)
 
         # Then
         self.assertEqual(result_handler.results, [expected_result])
+        self.assertEqual(result_handler.results[0].worker,
+                         multiprocessing.current_process().name)
         pool_class.assert_called_once_with(
             processes=processes, initializer=None,
             maxtasksperchild=None)
         pool.close.assert_called_once_with()
         pool.join.assert_called_once_with()
 
+    @mock.patch('haas.plugins.parallel_runner.Pool')
+    def test_parallel_runner_fixture_results(self, pool_class):
+        # Given
+        class TestWithFixtures(unittest.TestCase):
+
+            @classmethod
+            def setUpClass(cls):
+                pass
+
+            @classmethod
+            def tearDownClass(cls):
+                pass
+
+            def test_method(self):
+                pass
+
+        pool = mock.Mock()
+        pool_class.return_value = pool
+        pool.apply_async.side_effect = apply_async
+        test_suite = TestSuite([TestWithFixtures('test_method')])
+        result_handler = ChildResultHandler()
+        result_collector = ResultCollector()
+        result_collector.add_result_handler(result_handler)
+        runner = ParallelTestRunner()
+
+        # When
+        runner.run(result_collector, test_suite)
+
+        # Then
+        self.assertEqual(len(result_handler.results), 1)
+        self.assertEqual(
+            [(fixture_result.fixture_name, fixture_result.succeeded)
+             for fixture_result in result_handler.fixture_results],
+            [('setUpClass', True), ('tearDownClass', True)])
+        self.assertTrue(all(
+            fixture_result.target.endswith('TestWithFixtures')
+            for fixture_result in result_handler.fixture_results))
+
+    @mock.patch('haas.plugins.parallel_runner.Pool')
+    def test_parallel_runner_fixture_error(self, pool_class):
+        # Given
+        class TestWithFailingFixture(unittest.TestCase):
+
+            @classmethod
+            def setUpClass(cls):
+                raise RuntimeError('setUpClass failed')
+
+            def test_method(self):
+                pass
+
+        pool = mock.Mock()
+        pool_class.return_value = pool
+        pool.apply_async.side_effect = apply_async
+        test_suite = TestSuite([TestWithFailingFixture('test_method')])
+        result_handler = ChildResultHandler()
+        result_collector = ResultCollector()
+        result_collector.add_result_handler(result_handler)
+        runner = ParallelTestRunner()
+
+        # When
+        runner.run(result_collector, test_suite)
+
+        # Then
+        result, = result_handler.results
+        self.assertTrue(result.is_fixture_error)
+        self.assertEqual(result.status, TestCompletionStatus.error)
+        self.assertEqual(
+            [(fixture_result.fixture_name, fixture_result.succeeded)
+             for fixture_result in result_handler.fixture_results],
+            [('setUpClass', False)])
+        self.assertEqual(result_collector.testsRun, 0)
+
     @mock.patch('haas.plugins.parallel_runner.Pool')
     def test_parallel_runner_single_start_stop_test_run(self, pool_class):
         # Given
@@ -174,7 +251,7 @@ class TestParallelTestRunner(unittest.TestCase):
         runner = ParallelTestRunner(processes, initializer=initializer)
 
         # When
-        with mock.patch('haas.result.datetime', new=MockDateTime(
+        with mock.patch('haas.result.time', new=MockPerfCounter(
                 [start_time, end_time])):
             runner.run(result_collector, test_suite)
 
@@ -218,7 +295,7 @@ class TestParallelTestRunner(unittest.TestCase):
         runner = ParallelTestRunner.from_args(args, dest_prefix)
 
         # When
-        with mock.patch('haas.result.datetime', new=MockDateTime(
+        with mock.patch('haas.result.time', new=MockPerfCounter(
                 [start_time, end_time])):
             runner.run(result_collector, test_suite)
 
@@ -262,7 +339,7 @@ class TestParallelTestRunner(unittest.TestCase):
         runner = ParallelTestRunner.from_args(args, dest_prefix)
 
         # When
-        with mock.patch('haas.result.datetime', new=MockDateTime(
+        with mock.patch('haas.result.time', new=MockPerfCounter(
                 [start_time, end_time])):
             runner.run(result_collector, test_suite)
 
@@ -276,6 +353,44 @@ class TestParallelTestRunner(unittest.TestCase):
         pool.close.assert_called_once_with()
         pool.join.assert_called_once_with()
 
+    @mock.patch('haas.plugins.parallel_runner.Pool')
+    def test_parallel_runner_registered_worker_initializer(self, pool_class):
+        # Given
+        pool = mock.Mock()
+        pool_class.return_value = pool
+        pool.apply_async.side_effect = apply_async
+        worker_initializer = mock.Mock()
+        initializer = mock.Mock()
+        register_worker_initializer(worker_initializer, 'arg')
+        self.addCleanup(
+            unregister_worker_initializer, worker_initializer, 'arg')
+
+        test_suite = TestSuite([_test_cases.TestCase('test_method')])
+        result_collector = ResultCollector()
+        runner = ParallelTestRunner(2, initializer=initializer)
+
+        # When
+        runner.run(result_collector, test_suite)
+
+        # Then
+        pool_class.assert_called_once_with(
+            processes=2, initializer=_initialize_worker,
+            initargs=([(worker_initializer, ('arg',))], initializer),
+            maxtasksperchild=None)
+
+    def test_initialize_worker(self):
+        # Given
+        calls = mock.Mock()
+
+        # When
+        _initialize_worker(
+            [(calls.first, ('arg',)), (calls.second, ())], calls.third)
+
+        # Then
+        self.assertEqual(
+            calls.mock_calls,
+            [mock.call.first('arg'), mock.call.second(), mock.call.third()])
+
 
 class TestParallelRunnerImportError(unittest.TestCase):
 
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2013-2014 Simon Jagoe
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the 3-clause BSD license.  See the LICENSE.txt file for details.
+import json
+import unittest
+
+from ..result import (
+    ClockAnchor, FixtureResult, ReplayedTestCase, TestCompletionStatus,
+    TestDuration, TestResult)
+from . import _test_cases
+from .fixtures import ExcInfoFixture
+
+
+def _round_trip(obj):
+    return type(obj).from_dict(json.loads(json.dumps(obj.to_dict())))
+
+
+class TestResultDict(ExcInfoFixture, unittest.TestCase):
+
+    def test_test_result_round_trip(self):
+        # Given
+        case = _test_cases.TestCase('test_method')
+        duration = TestDuration.from_counter(10, 2510, ClockAnchor())
+        with self.failure_exc_info() as exc_info:
+            result = TestResult.from_test_case(
+                case, TestCompletionStatus.failure, duration,
+                exception=exc_info)
+
+        # When
+        loaded = _round_trip(result)
+
+        # Then
+        self.assertEqual(loaded, result)
+        self.assertIs(loaded.test_class, _test_cases.TestCase)
+        self.assertEqual(loaded.exception, result.exception)
+        self.assertEqual(loaded.duration.nanoseconds, 2500)
+        self.assertEqual(loaded.duration.start_time, duration.start_time)
+
+    def test_test_class_not_imported(self):
+        # Given
+        data = TestResult(
+            _test_cases.TestCase, 'test_method', TestCompletionStatus.success,
+            TestDuration.from_nanoseconds(5)).to_dict()
+        data['test_module'] = 'not_imported.test_module'
+        data['test_class'] = 'TestOuter.TestInner'
+
+        # When
+        loaded = TestResult.from_dict(data)
+        test = loaded.test
+
+        # Then
+        self.assertTrue(issubclass(loaded.test_class, ReplayedTestCase))
+        self.assertIs(TestResult.from_dict(data).test_class,
+                      loaded.test_class)
+        self.assertEqual(
+            test.id(), 'not_imported.test_module.TestOuter.TestInner.'
+            'test_method')
+        self.assertIsNone(test.shortDescription())
+        self.assertIsNone(loaded.duration.start_time)
+
+    def test_fixture_result_round_trip(self):
+        # Given
+        fixture_result = FixtureResult(
+            'setUpModule', 'package.module', TestDuration.from_nanoseconds(7),
+            succeeded=False)
+
+        # When
+        loaded = _round_trip(fixture_result)
+
+        # Then
+        self.assertEqual(loaded, fixture_result)
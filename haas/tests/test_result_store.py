@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2013-2014 Simon Jagoe
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the 3-clause BSD license.  See the LICENSE.txt file for details.
+from datetime import timedelta
+import unittest
+
+from ..plugins.result_handler import QuietTestResultHandler
+from ..result import (
+    ResultCollector, ResultStore, TestCompletionStatus, TestDuration,
+    TestResult)
+from . import _test_cases
+from .fixtures import ExcInfoFixture
+
+
+def _create_result(status, seconds=1, **kwargs):
+    case = _test_cases.TestCase('test_method')
+    return TestResult.from_test_case(
+        case, status, TestDuration(timedelta(seconds=seconds)), **kwargs)
+
+
+class TestResultStore(ExcInfoFixture, unittest.TestCase):
+
+    def test_successes_recreated_from_arrays(self):
+        # Given
+        store = ResultStore()
+        result = _create_result(TestCompletionStatus.success, seconds=3)
+
+        # When
+        index = store.add(result)
+
+        # Then
+        self.assertEqual(index, 0)
+        self.assertEqual(len(store), 1)
+        self.assertEqual(list(store.durations), [3 * 10 ** 9])
+        self.assertEqual(store._details, {})
+        stored = store.get_result(index)
+        self.assertIsNot(stored, result)
+        self.assertEqual(stored, result)
+
+    def test_details_kept_for_other_results(self):
+        # Given
+        store = ResultStore()
+        with self.exc_info(RuntimeError) as exc_info:
+            error = _create_result(
+                TestCompletionStatus.error, exception=exc_info)
+        skip = _create_result(TestCompletionStatus.skipped, message='reason')
+        success = _create_result(TestCompletionStatus.success)
+
+        # When
+        for result in (error, success, skip):
+            store.add(result)
+
+        # Then
+        self.assertIs(store.get_result(0), error)
+        self.assertIs(store.get_result(2), skip)
+        self.assertEqual(store.get_results(TestCompletionStatus.error),
+                         [error])
+        self.assertEqual(store.get_results(TestCompletionStatus.success),
+                         [success])
+        self.assertEqual(store.get_results(), [error, success, skip])
+        self.assertEqual(store.count(TestCompletionStatus.skipped), 1)
+        self.assertEqual(store.count(TestCompletionStatus.failure), 0)
+        self.assertEqual(store.count(), 3)
+
+    def test_get_slowest(self):
+        # Given
+        store = ResultStore()
+        results = [
+            _create_result(TestCompletionStatus.success, seconds=seconds)
+            for seconds in (2, 5, 1, 5, 3)]
+        for result in results:
+            store.add(result)
+
+        # When
+        slowest = store.get_slowest(3)
+
+        # Then
+        self.assertEqual(
+            [result.duration.total_seconds for result in slowest],
+            [5, 5, 3])
+
+    def test_store_shared_with_result_handlers(self):
+        # Given
+        collector = ResultCollector()
+        handler = QuietTestResultHandler(test_count=1)
+        collector.add_result_handler(handler)
+        case = _test_cases.TestCase('test_method')
+
+        # When
+        with self.failure_exc_info() as exc_info:
+            collector.startTest(case)
+            collector.addFailure(case, exc_info)
+            collector.stopTest(case)
+
+        # Then
+        self.assertIs(handler._result_store, collector.result_store)
+        self.assertEqual(len(collector.result_store), 1)
+        self.assertEqual(handler.failures, collector.failures)
+        self.assertEqual(len(handler.failures), 1)
+        self.assertFalse(handler.was_successful())
@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2013-2014 Simon Jagoe
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the 3-clause BSD license.  See the LICENSE.txt file for details.
+from unittest import mock
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+try:
+    import coverage
+except ImportError:
+    coverage = None
+
+from ..exceptions import ChangedFilesError
+from ..import_graph import ImportGraph
+from ..loader import Loader
+from ..plugins.discoverer import Discoverer
+from ..selection import (
+    get_changed_files, get_changed_lines, get_listed_files,
+    select_changed_tests, select_covered_tests)
+from ..suite import find_test_cases
+from ..utils import cd
+from . import builder
+
+
+def _git(directory, *args):
+    subprocess.check_call(
+        ('git',) + args, cwd=directory,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+class TestGetChangedFiles(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp(prefix='haas-tests-')
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def test_file_list(self):
+        # When
+        changed = get_listed_files('a.py, pkg/b.py,')
+
+        # Then
+        self.assertEqual(changed, [
+            os.path.abspath('a.py'),
+            os.path.abspath(os.path.join('pkg', 'b.py')),
+        ])
+
+    @unittest.skipIf(shutil.which('git') is None, 'Requires git')
+    def test_git_revision(self):
+        # Given
+        _git(self.tempdir, 'init', '-q')
+        for name in ('committed.py', 'modified.py'):
+            with open(os.path.join(self.tempdir, name), 'w') as fh:
+                fh.write('VALUE = 1\n')
+        _git(self.tempdir, 'add', '.')
+        _git(self.tempdir, '-c', 'user.name=haas', '-c',
+             'user.email=haas@example.com', 'commit', '-q', '-m', 'Initial')
+        with open(os.path.join(self.tempdir, 'modified.py'), 'w') as fh:
+            fh.write('VALUE = 2\n')
+        with open(os.path.join(self.tempdir, 'untracked.py'), 'w') as fh:
+            fh.write('VALUE = 3\n')
+
+        # When
+        changed = get_changed_files('HEAD', self.tempdir)
+
+        # Then
+        self.assertEqual(sorted(changed), [
+            os.path.join(self.tempdir, 'modified.py'),
+            os.path.join(self.tempdir, 'untracked.py'),
+        ])
+
+    @unittest.skipIf(shutil.which('git') is None, 'Requires git')
+    def test_changed_lines(self):
+        # Given
+        _git(self.tempdir, 'init', '-q')
+        modified = os.path.join(self.tempdir, 'modified.py')
+        with open(modified, 'w') as fh:
+            fh.write(''.join('LINE_{0} = {0}\n'.format(i) for i in range(10)))
+        _git(self.tempdir, 'add', '.')
+        _git(self.tempdir, '-c', 'user.name=haas', '-c',
+             'user.email=haas@example.com', 'commit', '-q', '-m', 'Initial')
+        with open(modified) as fh:
+            lines = fh.readlines()
+        lines[1] = 'LINE_1 = 100\n'
+        del lines[5]
+        with open(modified, 'w') as fh:
+            fh.write(''.join(lines))
+        untracked = os.path.join(self.tempdir, 'untracked.py')
+        with open(untracked, 'w') as fh:
+            fh.write('VALUE = 3\n')
+
+        # When
+        changed = get_changed_lines('HEAD', self.tempdir)
+
+        # Then
+        self.assertEqual(changed, {modified: {2, 6}, untracked: None})
+
+    @unittest.skipIf(shutil.which('git') is None, 'Requires git')
+    def test_revision_named_like_existing_file(self):
+        # Given
+        _git(self.tempdir, 'init', '-q')
+        for name in ('release', 'modified.py'):
+            with open(os.path.join(self.tempdir, name), 'w') as fh:
+                fh.write('VALUE = 1\n')
+        _git(self.tempdir, 'add', '.')
+        _git(self.tempdir, '-c', 'user.name=haas', '-c',
+             'user.email=haas@example.com', 'commit', '-q', '-m', 'Initial')
+        _git(self.tempdir, 'branch', 'release')
+        modified = os.path.join(self.tempdir, 'modified.py')
+        with open(modified, 'w') as fh:
+            fh.write('VALUE = 2\n')
+
+        # When
+        with cd(self.tempdir):
+            changed = get_changed_files('release', self.tempdir)
+
+        # Then
+        self.assertEqual(changed, [modified])
+
+    @unittest.skipIf(shutil.which('git') is None, 'Requires git')
+    def test_git_error(self):
+        # Given
+        _git(self.tempdir, 'init', '-q')
+
+        # When/Then
+        with self.assertRaisesRegex(ChangedFilesError,
+                                    'Unknown git revision'):
+            get_changed_files('no-such-revision', self.tempdir)
+
+    @unittest.skipIf(shutil.which('git') is None, 'Requires git')
+    def test_not_a_git_checkout(self):
+        # Given
+        environment = {'GIT_CEILING_DIRECTORIES': self.tempdir}
+
+        # When/Then
+        with mock.patch.dict(os.environ, environment):
+            with self.assertRaisesRegex(ChangedFilesError,
+                                        'not a git repository'):
+                get_changed_lines('HEAD', self.tempdir)
+
+
+class TestSelectChangedTests(unittest.TestCase):
+
+    def setUp(self):
+        self.modules = sys.modules.copy()
+        self.tempdir = tempfile.mkdtemp(prefix='haas-tests-')
+        test_class = builder.Class(
+            'TestSomething', (builder.Method('test_method'),))
+        fixture = builder.Package(
+            'selected',
+            (
+                builder.Module(
+                    'core.py', (builder.RawText('', 'VALUE = 1'),)),
+                builder.Module(
+                    'api.py',
+                    (builder.RawText('', 'from .core import VALUE'),)),
+                builder.Module(
+                    'test_api.py',
+                    (builder.RawText('', 'from . import api'), test_class)),
+                builder.Module('test_other.py', (test_class,)),
+                builder.Module(
+                    'test_broken.py', (builder.RawText('', 'import api'),)),
+            ),
+        )
+        fixture.create(self.tempdir)
+
+    def tearDown(self):
+        if self.tempdir in sys.path:
+            sys.path.remove(self.tempdir)
+        for key in [key for key in sys.modules if key not in self.modules]:
+            del sys.modules[key]
+        shutil.rmtree(self.tempdir)
+
+    def test_select_transitive_importers(self):
+        # Given
+        suite = Discoverer(Loader()).discover(
+            os.path.join(self.tempdir, 'selected'), self.tempdir)
+        import_graph = ImportGraph(self.tempdir)
+        changed = [os.path.join(self.tempdir, 'selected', 'core.py')]
+
+        # When
+        selected = select_changed_tests(suite, import_graph, changed)
+
+        # Then
+        self.assertIsInstance(selected, type(suite))
+        tests = sorted(
+            type(test).__name__ for test in find_test_cases(selected))
+        self.assertEqual(tests, ['ModuleImportError', 'TestSomething'])
+        self.assertEqual(
+            [test.id() for test in find_test_cases(selected)
+             if type(test).__name__ == 'TestSomething'],
+            ['selected.test_api.TestSomething.test_method'])
+
+    def _write_coverage_data(self, contexts):
+        path = os.path.join(self.tempdir, '.coverage')
+        data = coverage.CoverageData(basename=path)
+        for context, lines in contexts.items():
+            data.set_context(context)
+            data.add_lines({
+                os.path.join(self.tempdir, 'selected', filename): linenos
+                for filename, linenos in lines.items()})
+        data.write()
+        return path
+
+    def _select_covered(self, changed_lines, contexts):
+        suite = Discoverer(Loader()).discover(
+            os.path.join(self.tempdir, 'selected'), self.tempdir)
+        data_file = self._write_coverage_data(contexts)
+        changed_lines = {
+            os.path.join(self.tempdir, 'selected', filename): lines
+            for filename, lines in changed_lines.items()}
+        selected = select_covered_tests(
+            suite, ImportGraph(self.tempdir), changed_lines, data_file)
+        return sorted(test.id() for test in find_test_cases(selected)
+                      if type(test).__name__ != 'ModuleImportError')
+
+    @unittest.skipIf(coverage is None, 'Coverage is not installed')
+    def test_select_covered_tests(self):
+        # When
+        tests = self._select_covered(
+            {'core.py': {3}},
+            {
+                '': {'core.py': [1]},
+                'selected.test_api.TestSomething.test_method': {
+                    'core.py': [2]},
+                'selected.test_other.TestSomething.test_method': {
+                    'core.py': [3]},
+            },
+        )
+
+        # Then
+        self.assertEqual(
+            tests, ['selected.test_other.TestSomething.test_method'])
+
+    @unittest.skipIf(coverage is None, 'Coverage is not installed')
+    def test_select_covered_tests_import_time_change(self):
+        # When
+        tests = self._select_covered(
+            {'core.py': {1}},
+            {
+                '': {'core.py': [1]},
+                'selected.test_api.TestSomething.test_method': {
+                    'core.py': [2]},
+                'selected.test_other.TestSomething.test_method': {
+                    'core.py': [3]},
+            },
+        )
+
+        # Then
+        self.assertEqual(
+            tests, ['selected.test_api.TestSomething.test_method'])
+
+    @unittest.skipIf(coverage is None, 'Coverage is not installed')
+    def test_select_covered_tests_unrecorded_test(self):
+        # When
+        tests = self._select_covered(
+            {'core.py': {3}},
+            {
+                'selected.test_api.TestSomething.test_method': {
+                    'core.py': [2]},
+            },
+        )
+
+        # Then
+        self.assertEqual(
+            tests, ['selected.test_other.TestSomething.test_method'])
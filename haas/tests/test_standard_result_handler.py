@@ -256,3 +256,25 @@ class TestStandardResultHandler(ExcInfoFixture, unittest.TestCase):
                 description))
         # The contents of unittest.TestCase should not be in the traceback
         self.assertNotIn('raise', output)
+
+    @mock.patch('sys.stderr', new_callable=StringIO)
+    def test_output_handle_results(self, stderr):
+        # Given
+        case = _test_cases.TestCase('test_method')
+        duration = TestDuration(timedelta(seconds=1))
+        handler = StandardTestResultHandler(test_count=2)
+        with self.exc_info(RuntimeError) as exc_info:
+            error = TestResult.from_test_case(
+                case, TestCompletionStatus.error, duration,
+                exception=exc_info)
+        success = TestResult.from_test_case(
+            case, TestCompletionStatus.success, duration)
+
+        # When
+        handler.handle_results([success, error])
+
+        # Then
+        self.assertEqual(stderr.getvalue(), '.E')
+        self.assertEqual(handler.tests_run, 2)
+        self.assertEqual(handler.errors, [error])
+        self.assertFalse(handler.was_successful())
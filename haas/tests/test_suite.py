@@ -6,12 +6,18 @@
 # of the 3-clause BSD license.  See the LICENSE.txt file for details.
 from contextlib import contextmanager
 from itertools import count
+from unittest import mock
+import gc
 import sys
 import unittest
+import weakref
 
 from ._test_cases import TestCase
+from ..module_import_error import ModuleImportError
 from ..result import ResultCollector
-from ..suite import TestSuite, _TestSuiteState
+from ..suite import (
+    LazyTestSuite, TestCaseHandle, TestSuite, _TestSuiteState, find_test_cases,
+    group_by_fixture, unique_tests)
 
 
 class MockModule:
@@ -139,6 +145,25 @@ class TestTestSuiteState(ResetClassStateMixin, unittest.TestCase):
     def test_teardown_no_prior_setup_does_not_raise(self):
         self.state.teardown()
 
+    def test_module_fixture_results_recorded(self):
+        # Given
+        module = MockModuleSetupTeardown()
+        fixture_results = []
+        result = ResultCollector()
+        result.add_fixture_result = fixture_results.append
+        state = _TestSuiteState(result)
+
+        # When
+        with self._temporary_module(MockTestCase, module):
+            state.setup(MockTestCase())
+            state.teardown()
+
+        # Then
+        self.assertEqual(
+            [(fixture.fixture_name, fixture.succeeded)
+             for fixture in fixture_results],
+            [('setUpModule', True), ('tearDownModule', True)])
+
     @contextmanager
     def _temporary_module(self, klass, module):
         module_name = 'haas_test_module_{0}'.format(next(self._name_count))
@@ -461,6 +486,55 @@ class TestTestSuiteCount(unittest.TestCase):
         )
         self.assertEqual(suite.countTestCases(), 2)
 
+    def test_count_cached(self):
+        # Given
+        test = TestCase('test_method')
+        suite = TestSuite([TestSuite([test]), TestSuite([test])])
+        self.assertEqual(suite.countTestCases(), 2)
+
+        # When
+        with mock.patch.object(
+                TestCase, 'countTestCases', return_value=5) as count:
+            count_ = suite.countTestCases()
+            test_cases = suite.get_test_cases()
+
+        # Then
+        self.assertEqual(count_, 2)
+        self.assertEqual(list(test_cases), [test, test])
+        count.assert_not_called()
+
+    def test_deeply_nested_suite(self):
+        # Given
+        test = TestCase('test_method')
+        suite = TestSuite([test])
+        for _ in range(sys.getrecursionlimit() + 100):
+            suite = TestSuite([suite])
+
+        # When
+        count = suite.countTestCases()
+        test_cases = list(find_test_cases(suite))
+
+        # Then
+        self.assertEqual(count, 1)
+        self.assertEqual(test_cases, [test])
+
+    def test_nested_index_reused(self):
+        # Given
+        tests = [TestCase('test_method'), TestCase('test_method')]
+        nested = TestSuite([TestSuite(tests)])
+        self.assertEqual(list(nested.get_test_cases()), tests)
+        suite = TestSuite([nested])
+
+        # When
+        with mock.patch.object(
+                TestSuite, '__iter__', autospec=True,
+                side_effect=TestSuite.__iter__) as iter_:
+            test_cases = list(find_test_cases(suite))
+
+        # Then
+        self.assertEqual(test_cases, tests)
+        self.assertEqual(iter_.call_count, 1)
+
 
 class TestTestSuiteEquality(unittest.TestCase):
 
@@ -587,3 +661,297 @@ class TestRunningTestSuite(ResetClassStateMixin, unittest.TestCase):
         suite.run(result)
         self.assertEqual(MockTestCaseSetupTeardown.setup_count, 1)
         self.assertEqual(MockTestCaseSetupTeardown.teardown_count, 1)
+
+
+class TestReleaseTests(unittest.TestCase):
+
+    def test_tests_released_after_running(self):
+        # Given
+        tests = [TestCase('test_method'), TestCase('test_method')]
+        refs = [weakref.ref(test) for test in tests]
+        suite = TestSuite(
+            [TestSuite(tests[:1]), TestSuite([TestSuite(tests[1:])])],
+            release_tests=True)
+        del tests
+
+        # When
+        result = unittest.TestResult()
+        suite.run(result)
+        gc.collect()
+
+        # Then
+        self.assertEqual(result.testsRun, 2)
+        self.assertEqual([ref() for ref in refs], [None, None])
+        self.assertEqual(list(suite), [])
+        self.assertEqual(suite.countTestCases(), 2)
+
+    def test_tests_kept_by_default(self):
+        # Given
+        tests = [TestCase('test_method'), TestCase('test_method')]
+        suite = TestSuite([TestSuite(tests)])
+
+        # When
+        suite.run(unittest.TestResult())
+
+        # Then
+        self.assertEqual(list(suite), [TestSuite(tests)])
+        self.assertEqual(suite.countTestCases(), 2)
+
+    def test_lazy_suite_counts_released_tests(self):
+        # Given
+        completed = []
+        tests = [TestCase('test_method'), TestCase('test_method'),
+                 TestCase('test_method')]
+        suite = LazyTestSuite(
+            iter(tests), release_tests=True,
+            on_complete=lambda s: completed.append(s.countTestCases()))
+
+        # When
+        result = unittest.TestResult()
+        suite.run(result)
+
+        # Then
+        self.assertEqual(result.testsRun, 3)
+        self.assertEqual(completed, [3])
+        self.assertEqual(list(suite), [])
+        self.assertEqual(suite.countTestCases(), 3)
+
+
+class TestFixtureResults(unittest.TestCase):
+
+    def test_fixture_results_recorded(self):
+        # Given
+        class Case(unittest.TestCase):
+
+            @classmethod
+            def setUpClass(cls):
+                raise RuntimeError()
+
+            def test_method(self):
+                pass
+
+        class OtherCase(unittest.TestCase):
+
+            def test_method(self):
+                pass
+
+        fixture_results = []
+        result = ResultCollector()
+        result.add_fixture_result = fixture_results.append
+        suite = TestSuite([Case('test_method'), OtherCase('test_method')])
+
+        # When
+        suite.run(result)
+
+        # Then
+        self.assertEqual(
+            [(fixture.description, fixture.succeeded)
+             for fixture in fixture_results],
+            [('setUpClass ({0}.{1})'.format(
+                __name__, Case.__qualname__), False)])
+        self.assertGreaterEqual(
+            fixture_results[0].duration.total_seconds, 0)
+        self.assertEqual(len(result.errors), 1)
+
+
+class TestTestCaseHandle(unittest.TestCase):
+
+    def test_instance_created_when_run_and_released(self):
+        # Given
+        instances = []
+
+        class Case(unittest.TestCase):
+            setup_count = 0
+
+            @classmethod
+            def setUpClass(cls):
+                cls.setup_count += 1
+
+            def __init__(self, *args, **kwargs):
+                super(Case, self).__init__(*args, **kwargs)
+                instances.append(weakref.ref(self))
+
+            def test_a(self):
+                pass
+
+            def test_b(self):
+                pass
+
+        suite = TestSuite(
+            [TestCaseHandle(Case, 'test_a'), TestCaseHandle(Case, 'test_b')])
+        self.assertEqual(instances, [])
+
+        # When
+        result = unittest.TestResult()
+        suite.run(result)
+        gc.collect()
+
+        # Then
+        self.assertEqual(result.testsRun, 2)
+        self.assertTrue(result.wasSuccessful())
+        self.assertEqual(Case.setup_count, 1)
+        self.assertEqual(len(instances), 2)
+        self.assertEqual([ref() for ref in instances], [None, None])
+
+    def test_behaves_like_test_case(self):
+        # Given
+        handle = TestCaseHandle(TestCase, 'test_method')
+        test = TestCase('test_method')
+
+        # Then
+        self.assertEqual(handle.id(), test.id())
+        self.assertEqual(handle.countTestCases(), 1)
+        self.assertEqual(handle, TestCaseHandle(TestCase, 'test_method'))
+        self.assertNotEqual(handle, TestCaseHandle(TestCase, 'test_other'))
+        self.assertIsInstance(handle.load(), TestCase)
+
+
+class TestLazyTestSuite(unittest.TestCase):
+
+    def _generate(self, tests, loaded):
+        for test in tests:
+            loaded.append(test)
+            yield test
+
+    def test_tests_loaded_one_ahead(self):
+        # Given
+        loaded = []
+        tests = [TestCase('test_method'), TestCase('test_method')]
+        suite = LazyTestSuite(self._generate(tests, loaded))
+
+        # When
+        iterator = iter(suite)
+        first = next(iterator)
+
+        # Then
+        self.assertIs(first, tests[0])
+        self.assertEqual(loaded, tests)
+        self.assertFalse(suite.is_complete)
+
+    def test_on_complete_called_before_last_test(self):
+        # Given
+        completed = []
+        tests = [TestCase('test_method'), TestCase('test_method')]
+        suite = LazyTestSuite(
+            iter(tests), on_complete=lambda s: completed.append(
+                s.countTestCases()))
+
+        # When
+        iterator = iter(suite)
+        next(iterator)
+        next(iterator)
+
+        # Then
+        self.assertEqual(completed, [2])
+        self.assertTrue(suite.is_complete)
+        self.assertEqual(list(iterator), [])
+
+    def test_equal_to_eager_suite(self):
+        # Given
+        tests = [TestCase('test_method'), TestSuite([TestCase('test_method')])]
+        suite = LazyTestSuite(iter(tests))
+
+        # Then
+        self.assertEqual(suite, TestSuite(tests))
+        self.assertEqual(suite.countTestCases(), 2)
+        self.assertEqual(list(suite), tests)
+
+    def test_repr_does_not_load(self):
+        # Given
+        loaded = []
+        suite = LazyTestSuite(
+            self._generate([TestCase('test_method')], loaded))
+
+        # When
+        representation = repr(suite)
+
+        # Then
+        self.assertEqual(representation, '<LazyTestSuite loading>')
+        self.assertEqual(loaded, [])
+
+
+class TestGroupByFixture(unittest.TestCase):
+
+    def test_tests_grouped_by_module_then_class(self):
+        # Given
+        class Case(unittest.TestCase):
+            setup_count = 0
+
+            @classmethod
+            def setUpClass(cls):
+                cls.setup_count += 1
+
+            def test_a(self):
+                pass
+
+            def test_b(self):
+                pass
+
+        class Other(unittest.TestCase):
+            __module__ = 'other_module'
+
+            def test_method(self):
+                pass
+
+        case_a = Case('test_a')
+        case_b = Case('test_b')
+        other = Other('test_method')
+        suite = TestSuite([
+            TestSuite([case_b, other]), TestCase('test_method'), case_a])
+
+        # When
+        grouped = TestSuite(group_by_fixture(suite))
+        grouped.run(unittest.TestResult())
+
+        # Then
+        self.assertEqual(
+            [test.id() for test in find_test_cases(grouped)],
+            [case_b.id(), case_a.id(), other.id(),
+             TestCase('test_method').id()])
+        self.assertEqual(len(list(grouped)), 3)
+        self.assertEqual(Case.setup_count, 1)
+
+
+class TestUniqueTests(unittest.TestCase):
+
+    def test_duplicates_removed_from_nested_suites(self):
+        # Given
+        case_1 = TestCase('test_method')
+        case_2 = TestCase('test_method')
+        suite = TestSuite([
+            TestSuite([case_1]),
+            TestSuite([TestSuite([case_2])]),
+        ])
+
+        # When
+        unique = TestSuite(unique_tests(suite))
+
+        # Then
+        self.assertEqual(unique.countTestCases(), 1)
+        self.assertEqual(
+            unique, TestSuite([TestSuite([case_1]), TestSuite([TestSuite()])]))
+        self.assertIs(list(list(unique)[0])[0], case_1)
+
+    def test_seen_ids_shared(self):
+        # Given
+        seen = {TestCase('test_method').id()}
+
+        # When
+        tests = list(unique_tests([TestCase('test_method')], seen))
+
+        # Then
+        self.assertEqual(tests, [])
+
+    def test_module_import_errors_kept(self):
+        # Given
+        class ImportErrorCase(ModuleImportError, unittest.TestCase):
+            def test_error(self):
+                pass
+
+        tests = [ImportErrorCase('test_error'), ImportErrorCase('test_error')]
+
+        # When
+        unique = list(unique_tests(tests))
+
+        # Then
+        self.assertEqual(unique, tests)
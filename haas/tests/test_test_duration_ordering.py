@@ -7,7 +7,7 @@
 import unittest
 from datetime import datetime, timedelta
 
-from ..result import TestDuration
+from ..result import ClockAnchor, TestDuration
 
 
 class TestTestDurationOrdering(unittest.TestCase):
@@ -144,3 +144,49 @@ class TestTestDurationOrdering(unittest.TestCase):
         with self.assertRaisesRegex(
                 self.failureException, 'not less than'):
             self.assertLess(duration1, duration2)
+
+
+class TestTestDurationFromCounter(unittest.TestCase):
+
+    def test_from_counter(self):
+        # Given
+        wall_time = datetime(2015, 12, 23, 8, 14, 12)
+        anchor = ClockAnchor(wall_time, 1000)
+
+        # When
+        duration = TestDuration.from_counter(
+            3000, 10 * 10 ** 9 + 3000, anchor)
+
+        # Then
+        self.assertEqual(duration.nanoseconds, 10 * 10 ** 9)
+        self.assertEqual(duration.total_seconds, 10)
+        self.assertEqual(duration.duration, timedelta(seconds=10))
+        self.assertEqual(duration.start_ns, 3000)
+        self.assertEqual(
+            duration.start_time, wall_time + timedelta(microseconds=2))
+        self.assertEqual(
+            duration.stop_time,
+            wall_time + timedelta(seconds=10, microseconds=2))
+        self.assertEqual(
+            duration, TestDuration(wall_time, wall_time + duration.duration))
+
+    def test_from_counter_without_anchor(self):
+        # When
+        duration = TestDuration.from_counter(3000, 5000)
+
+        # Then
+        self.assertEqual(duration.nanoseconds, 2000)
+        self.assertIsNone(duration.start_time)
+        self.assertIsNone(duration.stop_time)
+
+    def test_nanosecond_resolution(self):
+        # Given
+        duration1 = TestDuration.from_nanoseconds(1500)
+        duration2 = TestDuration.from_nanoseconds(1501)
+
+        # Then
+        self.assertLess(duration1, duration2)
+        self.assertNotEqual(duration1, duration2)
+        self.assertEqual(
+            (duration1 + duration2).nanoseconds, 3001)
+        self.assertEqual(TestDuration(1.5e-6), duration1)
@@ -10,10 +10,10 @@ import unittest
 
 from ..plugins.i_result_handler_plugin import IResultHandlerPlugin
 from ..result import (
-    ResultCollector, TestResult, TestCompletionStatus, TestDuration
-)
+    ClockAnchor, ResultCollector, TestResult, TestCompletionStatus,
+    TestDuration)
 from . import _test_cases, _test_case_data
-from .fixtures import ExcInfoFixture, MockDateTime
+from .fixtures import ExcInfoFixture, MockPerfCounter
 
 
 class TestTextTestResult(ExcInfoFixture, unittest.TestCase):
@@ -81,7 +81,7 @@ class TestTextTestResult(ExcInfoFixture, unittest.TestCase):
         case = _test_cases.TestCase('test_method')
 
         # When
-        with mock.patch('haas.result.datetime', new=MockDateTime(start_time)):
+        with mock.patch('haas.result.time', new=MockPerfCounter(start_time)):
             collector.startTest(case)
 
         # Then
@@ -96,7 +96,7 @@ class TestTextTestResult(ExcInfoFixture, unittest.TestCase):
                 exception=exc_info)
             # When
             with mock.patch(
-                    'haas.result.datetime', new=MockDateTime(end_time)):
+                    'haas.result.time', new=MockPerfCounter(end_time)):
                 collector.addError(case, exc_info)
 
         # Then
@@ -119,7 +119,7 @@ class TestTextTestResult(ExcInfoFixture, unittest.TestCase):
         case = _test_cases.TestCase('test_method')
 
         # When
-        with mock.patch('haas.result.datetime', new=MockDateTime(start_time)):
+        with mock.patch('haas.result.time', new=MockPerfCounter(start_time)):
             collector.startTest(case)
 
         # Then
@@ -135,7 +135,7 @@ class TestTextTestResult(ExcInfoFixture, unittest.TestCase):
 
             # When
             with mock.patch(
-                    'haas.result.datetime', new=MockDateTime(end_time)):
+                    'haas.result.time', new=MockPerfCounter(end_time)):
                 collector.addError(case, exc_info)
 
         # Then
@@ -158,7 +158,7 @@ class TestTextTestResult(ExcInfoFixture, unittest.TestCase):
         case = _test_cases.TestCase('test_method')
 
         # When
-        with mock.patch('haas.result.datetime', new=MockDateTime(start_time)):
+        with mock.patch('haas.result.time', new=MockPerfCounter(start_time)):
             collector.startTest(case)
 
         # Then
@@ -173,7 +173,7 @@ class TestTextTestResult(ExcInfoFixture, unittest.TestCase):
 
             # When
             with mock.patch(
-                    'haas.result.datetime', new=MockDateTime(end_time)):
+                    'haas.result.time', new=MockPerfCounter(end_time)):
                 collector.addFailure(case, exc_info)
 
         # Then
@@ -196,7 +196,7 @@ class TestTextTestResult(ExcInfoFixture, unittest.TestCase):
         case = _test_cases.TestCase('test_method')
 
         # When
-        with mock.patch('haas.result.datetime', new=MockDateTime(start_time)):
+        with mock.patch('haas.result.time', new=MockPerfCounter(start_time)):
             collector.startTest(case)
 
         # Then
@@ -208,7 +208,7 @@ class TestTextTestResult(ExcInfoFixture, unittest.TestCase):
             case, TestCompletionStatus.success, expected_duration)
 
         # When
-        with mock.patch('haas.result.datetime', new=MockDateTime(end_time)):
+        with mock.patch('haas.result.time', new=MockPerfCounter(end_time)):
             collector.addSuccess(case)
 
         # Then
@@ -219,6 +219,53 @@ class TestTextTestResult(ExcInfoFixture, unittest.TestCase):
         self.assertFalse(handler.stop_test.called)
         self.assertTrue(collector.wasSuccessful())
 
+    def test_result_wall_clock_times_from_clock_anchor(self):
+        # Given
+        wall_time = datetime(2015, 12, 23, 8, 14, 12)
+        start_time = datetime(2000, 1, 1, 0, 0, 5)
+        end_time = start_time + timedelta(seconds=10)
+        clock = ClockAnchor(wall_time, 0)
+        collector = ResultCollector(clock=clock)
+        case = _test_cases.TestCase('test_method')
+
+        # When
+        with mock.patch('haas.result.time', new=MockPerfCounter(
+                [start_time, end_time])):
+            collector.startTest(case)
+            result = collector._handle_result(
+                case, TestCompletionStatus.success)
+
+        # Then
+        self.assertEqual(result.duration.total_seconds, 10)
+        self.assertEqual(
+            result.duration.start_time, wall_time + timedelta(seconds=5))
+        self.assertEqual(
+            result.duration.stop_time, wall_time + timedelta(seconds=15))
+
+    def test_result_collector_add_results(self):
+        # Given
+        handler = mock.Mock(spec=IResultHandlerPlugin)
+        collector = ResultCollector()
+        collector.add_result_handler(handler)
+        case = _test_cases.TestCase('test_method')
+        duration = TestDuration(timedelta(seconds=1))
+        results = [
+            TestResult.from_test_case(
+                case, TestCompletionStatus.success, duration),
+            TestResult.from_test_case(
+                case, TestCompletionStatus.unexpected_success, duration),
+        ]
+
+        # When
+        collector.add_results(iter(results))
+
+        # Then
+        handler.handle_results.assert_called_once_with(results)
+        self.assertFalse(handler.called)
+        self.assertFalse(handler.start_test.called)
+        self.assertEqual(collector.testsRun, 2)
+        self.assertFalse(collector.wasSuccessful())
+
     def test_result_collector_calls_handlers_on_skip(self):
         # Given
         handler = mock.Mock(spec=IResultHandlerPlugin)
@@ -231,7 +278,7 @@ class TestTextTestResult(ExcInfoFixture, unittest.TestCase):
         case = _test_cases.TestCase('test_method')
 
         # When
-        with mock.patch('haas.result.datetime', new=MockDateTime(start_time)):
+        with mock.patch('haas.result.time', new=MockPerfCounter(start_time)):
             collector.startTest(case)
 
         # Then
@@ -244,7 +291,7 @@ class TestTextTestResult(ExcInfoFixture, unittest.TestCase):
             message='reason')
 
         # When
-        with mock.patch('haas.result.datetime', new=MockDateTime(end_time)):
+        with mock.patch('haas.result.time', new=MockPerfCounter(end_time)):
             collector.addSkip(case, 'reason')
 
         # Then
@@ -267,7 +314,7 @@ class TestTextTestResult(ExcInfoFixture, unittest.TestCase):
         case = _test_cases.TestCase('test_method')
 
         # When
-        with mock.patch('haas.result.datetime', new=MockDateTime(start_time)):
+        with mock.patch('haas.result.time', new=MockPerfCounter(start_time)):
             collector.startTest(case)
 
         # Then
@@ -282,7 +329,7 @@ class TestTextTestResult(ExcInfoFixture, unittest.TestCase):
 
             # When
             with mock.patch(
-                    'haas.result.datetime', new=MockDateTime(end_time)):
+                    'haas.result.time', new=MockPerfCounter(end_time)):
                 collector.addExpectedFailure(case, exc_info)
 
         # Then
@@ -305,7 +352,7 @@ class TestTextTestResult(ExcInfoFixture, unittest.TestCase):
         case = _test_cases.TestCase('test_method')
 
         # When
-        with mock.patch('haas.result.datetime', new=MockDateTime(start_time)):
+        with mock.patch('haas.result.time', new=MockPerfCounter(start_time)):
             collector.startTest(case)
 
         # Then
@@ -317,7 +364,7 @@ class TestTextTestResult(ExcInfoFixture, unittest.TestCase):
             case, TestCompletionStatus.unexpected_success, expected_duration)
 
         # When
-        with mock.patch('haas.result.datetime', new=MockDateTime(end_time)):
+        with mock.patch('haas.result.time', new=MockPerfCounter(end_time)):
             collector.addUnexpectedSuccess(case)
 
         # Then
@@ -352,10 +399,24 @@ class TestTextTestResult(ExcInfoFixture, unittest.TestCase):
 
         # When
         with mock.patch(
-                'haas.result.datetime',
-                new=MockDateTime(
+                'haas.result.time',
+                new=MockPerfCounter(
                     [start_time, test_end_time, tear_down_end_time])):
             case.run(collector)
 
         # Then
         self.assertEqual(len(collector.errors), 2)
+
+    def test_start_times_released_when_tests_stop(self):
+        # Given
+        collector = ResultCollector()
+        cases = [_test_cases.TestCase('test_method'),
+                 _test_case_data.TestWithTwoErrors('test_with_two_errors')]
+
+        # When
+        for case in cases:
+            case.run(collector)
+
+        # Then
+        self.assertEqual(len(collector.errors), 2)
+        self.assertEqual(collector._test_timing, {})
@@ -4,11 +4,14 @@
 #
 # This software may be modified and distributed under the terms
 # of the 3-clause BSD license.  See the LICENSE.txt file for details.
+import os
+import shutil
+import tempfile
 import unittest
 from unittest import mock
 
 import haas
-from ..utils import configure_logging
+from ..utils import CACHE_DIRECTORY, configure_logging, get_cache_directory
 
 
 class TestConfigureLogging(unittest.TestCase):
@@ -17,3 +20,23 @@ class TestConfigureLogging(unittest.TestCase):
     def test_configure_logging(self, get_logger):
         configure_logging('debug')
         get_logger.assert_called_once_with(haas.__name__)
+
+
+class TestGetCacheDirectory(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp(prefix='haas-tests-')
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def test_creates_ignored_cache_directory(self):
+        # When
+        cache_directory = get_cache_directory(self.tempdir)
+
+        # Then
+        self.assertEqual(
+            cache_directory, os.path.join(self.tempdir, CACHE_DIRECTORY))
+        with open(os.path.join(cache_directory, '.gitignore')) as fh:
+            self.assertIn('*', fh.read().splitlines())
+        self.assertEqual(get_cache_directory(self.tempdir), cache_directory)
@@ -4,12 +4,13 @@
 #
 # This software may be modified and distributed under the terms
 # of the 3-clause BSD license.  See the LICENSE.txt file for details.
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from time import ctime
 from io import StringIO
 from unittest import mock
 import unittest
 
+from ..error_holder import ErrorHolder
 from ..plugins.result_handler import VerboseTestResultHandler
 from ..result import (
     TestResult, TestCompletionStatus, TestDuration)
@@ -65,6 +66,27 @@ class TestVerboseResultHandler(ExcInfoFixture, unittest.TestCase):
             output, '[{0}] (1/1) {1} ... '.format(
                 expected_time, expected_description))
 
+    @mock.patch('time.ctime')
+    @mock.patch('sys.stderr', new_callable=StringIO)
+    def test_output_start_test_unknown_count(self, stderr, mock_ctime):
+        # Given
+        case = _test_cases.TestCase('test_method')
+        handler = VerboseTestResultHandler(test_count=None)
+        mock_ctime.return_value = expected_time = ctime()
+        expected_description = handler.get_test_description(case)
+
+        # When
+        handler.start_test(case)
+        handler.update_test_count(12)
+        handler.start_test(case)
+
+        # Then
+        output = stderr.getvalue()
+        self.assertEqual(
+            output,
+            '[{0}] (1/?) {1} ... [{0}] ( 2/12) {1} ... '.format(
+                expected_time, expected_description))
+
     @mock.patch('sys.stderr', new_callable=StringIO)
     def test_no_output_stop_test(self, stderr):
         # Given
@@ -262,3 +284,104 @@ class TestVerboseResultHandler(ExcInfoFixture, unittest.TestCase):
                 description))
         # The contents of unittest.TestCase should not be in the traceback
         self.assertNotIn('raise', output)
+
+    @mock.patch('time.ctime')
+    @mock.patch('sys.stderr', new_callable=StringIO)
+    def test_output_handle_results(self, stderr, mock_ctime):
+        # Given
+        case = _test_cases.TestCase('test_method')
+        duration = TestDuration(timedelta(seconds=1))
+        mock_ctime.return_value = ctime()
+        success = TestResult.from_test_case(
+            case, TestCompletionStatus.success, duration)
+        skip = TestResult.from_test_case(
+            case, TestCompletionStatus.skipped, duration, message='reason')
+        handler = VerboseTestResultHandler(test_count=2)
+        for result in (success, skip):
+            handler.start_test(case)
+            handler(result)
+            handler.stop_test(case)
+        expected_output = stderr.getvalue()
+        stderr.seek(0)
+        stderr.truncate()
+        handler = VerboseTestResultHandler(test_count=2)
+
+        # When
+        handler.handle_results([success, skip])
+
+        # Then
+        self.assertEqual(stderr.getvalue(), expected_output)
+        self.assertEqual(handler.tests_run, 2)
+        self.assertEqual(handler.skipped, [skip])
+
+    @mock.patch('time.ctime')
+    @mock.patch('sys.stderr', new_callable=StringIO)
+    def test_output_handle_results_start_time(self, stderr, mock_ctime):
+        # Given
+        case = _test_cases.TestCase('test_method')
+        start_time = datetime(2020, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+        duration = TestDuration(start_time, start_time + timedelta(seconds=1))
+        mock_ctime.return_value = 'Reported later'
+        result = TestResult.from_test_case(
+            case, TestCompletionStatus.success, duration)
+        handler = VerboseTestResultHandler(test_count=1)
+
+        # When
+        handler.handle_results([result])
+
+        # Then
+        self.assertEqual(
+            stderr.getvalue(), '[{0}] (1/1) {1} ... ok\n'.format(
+                start_time.astimezone().ctime(),
+                handler.get_test_description(case)))
+
+    @mock.patch('sys.stderr', new_callable=StringIO)
+    def test_output_handle_results_fixture_error(self, stderr):
+        # Given
+        holder = ErrorHolder('setUpClass (haas.tests._test_cases.TestCase)')
+        with self.exc_info(RuntimeError) as exc_info:
+            result = TestResult.from_test_case(
+                holder, TestCompletionStatus.error, TestDuration(0),
+                exception=exc_info)
+        handler = VerboseTestResultHandler(test_count=1)
+        handler(result)
+        expected_output = stderr.getvalue()
+        stderr.seek(0)
+        stderr.truncate()
+        handler = VerboseTestResultHandler(test_count=1)
+
+        # When
+        handler.handle_results([result])
+
+        # Then
+        self.assertEqual(stderr.getvalue(), expected_output)
+        self.assertEqual(handler.tests_run, 0)
+        self.assertEqual(handler.errors, [result])
+
+    @mock.patch('sys.stderr', new_callable=StringIO)
+    def test_handle_results_does_not_create_test_cases(self, stderr):
+        # Given
+        class DocumentedTestCase(unittest.TestCase):
+
+            def test_method(self):
+                """The first line.
+
+                The second line.
+                """
+
+        case = DocumentedTestCase('test_method')
+        duration = TestDuration(timedelta(seconds=1))
+        result = TestResult.from_test_case(
+            case, TestCompletionStatus.success, duration)
+        handler = VerboseTestResultHandler(test_count=1)
+
+        # When
+        with mock.patch.object(
+                TestResult, 'test', new_callable=mock.PropertyMock,
+                side_effect=AssertionError('Test case created')):
+            handler.handle_results([result])
+
+        # Then
+        description = handler.get_test_description(case)
+        self.assertIn('The first line.', description)
+        self.assertIn('{0} ... ok\n'.format(description), stderr.getvalue())
@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2013-2014 Simon Jagoe
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the 3-clause BSD license.  See the LICENSE.txt file for details.
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from ..watcher import InotifyWatcher, PollingWatcher
+
+
+class WatcherTestMixin:
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp(prefix='haas-tests-')
+        os.makedirs(os.path.join(self.tempdir, 'package'))
+        self.module = os.path.join(self.tempdir, 'package', 'module.py')
+        with open(self.module, 'w') as fh:
+            fh.write('VALUE = 1\n')
+        self.watcher = self.create_watcher(self.tempdir)
+
+    def tearDown(self):
+        self.watcher.close()
+        shutil.rmtree(self.tempdir)
+
+    def test_no_change(self):
+        # When
+        changed = self.watcher.wait(timeout=0.05)
+
+        # Then
+        self.assertEqual(changed, set())
+
+    def test_modified_file(self):
+        # Given
+        with open(self.module, 'w') as fh:
+            fh.write('VALUE = 12\n')
+
+        # When
+        changed = self.watcher.wait(timeout=1)
+
+        # Then
+        self.assertEqual(changed, {self.module})
+
+    def test_created_and_deleted_files(self):
+        # Given
+        created = os.path.join(self.tempdir, 'package', 'other.py')
+        with open(created, 'w') as fh:
+            fh.write('VALUE = 2\n')
+        with open(os.path.join(self.tempdir, 'notes.txt'), 'w') as fh:
+            fh.write('Not a source file\n')
+        os.remove(self.module)
+
+        # When
+        changed = self.watcher.wait(timeout=1)
+
+        # Then
+        self.assertEqual(changed, {created, self.module})
+
+    def test_excluded_directory(self):
+        # Given
+        directory = os.path.join(self.tempdir, 'build')
+        os.makedirs(directory)
+        with open(os.path.join(directory, 'module.py'), 'w') as fh:
+            fh.write('VALUE = 2\n')
+
+        # When
+        changed = self.watcher.wait(timeout=0.05)
+
+        # Then
+        self.assertEqual(changed, set())
+
+    def test_build_package_watched(self):
+        # Given
+        directory = os.path.join(self.tempdir, 'build')
+        os.makedirs(directory)
+        with open(os.path.join(directory, '__init__.py'), 'w') as fh:
+            fh.write('')
+        self.watcher.close()
+        self.watcher = self.create_watcher(self.tempdir)
+        module = os.path.join(directory, 'module.py')
+        with open(module, 'w') as fh:
+            fh.write('VALUE = 2\n')
+
+        # When
+        changed = self.watcher.wait(timeout=1)
+
+        # Then
+        self.assertEqual(changed, {module})
+
+
+class TestPollingWatcher(WatcherTestMixin, unittest.TestCase):
+
+    def create_watcher(self, directory):
+        return PollingWatcher(directory, interval=0.01)
+
+
+@unittest.skipUnless(sys.platform.startswith('linux'), 'Requires inotify')
+class TestInotifyWatcher(WatcherTestMixin, unittest.TestCase):
+
+    def create_watcher(self, directory):
+        return InotifyWatcher(directory)
+
+    def test_new_directory_watched(self):
+        # Given
+        directory = os.path.join(self.tempdir, 'package', 'subpackage')
+        os.makedirs(directory)
+        self.watcher.wait(timeout=0.05)
+        module = os.path.join(directory, 'module.py')
+        with open(module, 'w') as fh:
+            fh.write('VALUE = 2\n')
+
+        # When
+        changed = self.watcher.wait(timeout=1)
+
+        # Then
+        self.assertEqual(changed, {module})
+
+    def test_nested_new_directories_watched(self):
+        # Given
+        directory = os.path.join(self.tempdir, 'package', 'a', 'b')
+        os.makedirs(directory)
+        self.watcher.wait(timeout=0.05)
+        module = os.path.join(directory, 'module.py')
+        with open(module, 'w') as fh:
+            fh.write('VALUE = 2\n')
+
+        # When
+        changed = self.watcher.wait(timeout=1)
+
+        # Then
+        self.assertEqual(changed, {module})
+
+    def test_directory_moved_in_watched(self):
+        # Given
+        outside = tempfile.mkdtemp(prefix='haas-tests-')
+        self.addCleanup(shutil.rmtree, outside)
+        os.makedirs(os.path.join(outside, 'moved', 'nested'))
+        with open(os.path.join(outside, 'moved', 'nested', 'module.py'),
+                  'w') as fh:
+            fh.write('VALUE = 2\n')
+        directory = os.path.join(self.tempdir, 'package', 'moved')
+        module = os.path.join(directory, 'nested', 'module.py')
+
+        # When
+        os.rename(os.path.join(outside, 'moved'), directory)
+        moved_in = self.watcher.wait(timeout=1)
+        with open(module, 'w') as fh:
+            fh.write('VALUE = 3\n')
+        modified = self.watcher.wait(timeout=1)
+
+        # Then
+        self.assertEqual(moved_in, {module})
+        self.assertEqual(modified, {module})
+
+    def test_directory_moved_within_tree(self):
+        # Given
+        package = os.path.join(self.tempdir, 'package')
+        renamed = os.path.join(self.tempdir, 'renamed')
+        module = os.path.join(renamed, 'module.py')
+
+        # When
+        os.rename(package, renamed)
+        moved = self.watcher.wait(timeout=1)
+        with open(module, 'w') as fh:
+            fh.write('VALUE = 3\n')
+        modified = self.watcher.wait(timeout=1)
+
+        # Then
+        self.assertEqual(moved, {module})
+        self.assertEqual(modified, {module})
+
+    def test_directory_moved_out_unwatched(self):
+        # Given
+        outside = tempfile.mkdtemp(prefix='haas-tests-')
+        self.addCleanup(shutil.rmtree, outside)
+        moved = os.path.join(outside, 'package')
+        os.rename(os.path.join(self.tempdir, 'package'), moved)
+        self.watcher.wait(timeout=0.05)
+
+        # When
+        with open(os.path.join(moved, 'module.py'), 'w') as fh:
+            fh.write('VALUE = 3\n')
+        changed = self.watcher.wait(timeout=0.05)
+
+        # Then
+        self.assertEqual(changed, set())
+
+    def test_directory_removed_before_watched(self):
+        # Given
+        directory = os.path.join(self.tempdir, 'package', 'removed')
+
+        # When
+        self.watcher._watch_tree(directory)
+
+        # Then
+        self.assertNotIn(directory, self.watcher._watches.values())
@@ -35,6 +35,30 @@ def configure_logging(level):
                 logging.getLevelName(actual_level))
 
 
+#: The directory, relative to the project top-level directory, in which
+#: haas keeps state between test runs.
+CACHE_DIRECTORY = '.haas_cache'
+
+
+def get_cache_directory(top_level_directory):
+    """Return the haas cache directory of a project, creating it if
+    required.
+
+    Parameters
+    ----------
+    top_level_directory : str
+        The path to the top-level directory of the project.
+
+    """
+    cache_directory = os.path.join(top_level_directory, CACHE_DIRECTORY)
+    if not os.path.isdir(cache_directory):
+        os.makedirs(cache_directory, exist_ok=True)
+        gitignore = os.path.join(cache_directory, '.gitignore')
+        with open(gitignore, 'w') as fh:
+            fh.write('# Created by haas\n*\n')
+    return cache_directory
+
+
 UNCAMELCASE_FIRST_PASS = re.compile(
     r'(?P<before>.)(?P<caps>[A-Z]+)')
 UNCAMELCASE_SECOND_PASS = re.compile(
@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2013-2014 Simon Jagoe
+# All rights reserved.
+#
+# This software may be modified and distributed under the terms
+# of the 3-clause BSD license.  See the LICENSE.txt file for details.
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import select
+import struct
+import sys
+import time
+
+from .plugins.discoverer import DEFAULT_EXCLUDE, is_build_directory
+
+logger = logging.getLogger(__name__)
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_CLOEXEC = 0o2000000
+
+_WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM |
+               IN_MOVED_TO | IN_CREATE | IN_DELETE)
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+def _is_source_file(name):
+    return name.endswith('.py')
+
+
+def _walk_directories(directory, exclude):
+    """Generate a directory and all directories below it that are not
+    hidden or excluded.
+
+    """
+    stack = [directory]
+    while stack:
+        directory = stack.pop()
+        yield directory
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.name.startswith('.') or entry.name in exclude:
+                continue
+            if entry.is_dir(follow_symlinks=False) and \
+                    not is_build_directory(entry.path):
+                stack.append(entry.path)
+
+
+def _find_source_files(directory, exclude):
+    for path in _walk_directories(directory, exclude):
+        try:
+            entries = list(os.scandir(path))
+        except OSError:
+            continue
+        for entry in entries:
+            if _is_source_file(entry.name) and entry.is_file():
+                yield entry.path
+
+
+class PollingWatcher:
+    """Watch the Python source files below a directory for changes by
+    periodically comparing their modification times and sizes.
+
+    """
+
+    def __init__(self, directory, exclude=DEFAULT_EXCLUDE, interval=0.5):
+        self.directory = os.path.abspath(directory)
+        self._exclude = frozenset(exclude)
+        self._interval = interval
+        self._snapshot = self._take_snapshot()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+
+    def _take_snapshot(self):
+        snapshot = {}
+        for path in _find_source_files(self.directory, self._exclude):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def wait(self, timeout=None):
+        """Wait for source files to be created, modified or deleted.
+
+        Returns the set of paths that changed, which is empty if the
+        timeout expired first.
+
+        Parameters
+        ----------
+        timeout : float
+            [Optional] The maximum number of seconds to wait.
+
+        """
+        if timeout is not None:
+            deadline = time.monotonic() + timeout
+        while True:
+            snapshot = self._take_snapshot()
+            changed = {
+                path for path in set(snapshot) | set(self._snapshot)
+                if snapshot.get(path) != self._snapshot.get(path)
+            }
+            self._snapshot = snapshot
+            if changed:
+                return changed
+            if timeout is not None and time.monotonic() >= deadline:
+                return set()
+            time.sleep(self._interval)
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """Watch the Python source files below a directory for changes
+    using the Linux ``inotify`` API.
+
+    """
+
+    #: Time to keep collecting events after the first change, so that
+    #: a save touching several files is reported as one change.
+    settle_time = 0.1
+
+    def __init__(self, directory, exclude=DEFAULT_EXCLUDE):
+        self.directory = os.path.abspath(directory)
+        self._exclude = frozenset(exclude)
+        library = ctypes.util.find_library('c')
+        self._libc = libc = ctypes.CDLL(library, use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [
+            ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._rm_watch = libc.inotify_rm_watch
+        self._rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        self._fd = libc.inotify_init1(IN_CLOEXEC)
+        if self._fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        self._watches = {}
+        try:
+            self._watch_tree(self.directory)
+        except OSError:
+            self.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+
+    def _watch_tree(self, directory):
+        for path in _walk_directories(directory, self._exclude):
+            wd = self._add_watch(self._fd, os.fsencode(path), _WATCH_MASK)
+            if wd < 0:
+                error = ctypes.get_errno()
+                if path != self.directory and \
+                        error in (errno.ENOENT, errno.ENOTDIR):
+                    # Removed again before it could be watched
+                    continue
+                raise OSError(error, os.strerror(error), path)
+            self._watches[wd] = path
+
+    def _unwatch_tree(self, directory):
+        # The watches of a directory moved out of the tree would
+        # otherwise keep reporting changes under its old path.
+        prefix = directory + os.sep
+        for wd, path in list(self._watches.items()):
+            if path == directory or path.startswith(prefix):
+                del self._watches[wd]
+                self._rm_watch(self._fd, wd)
+
+    def _read_events(self):
+        changed = set()
+        data = os.read(self._fd, 64 * 1024)
+        offset = 0
+        while offset < len(data):
+            wd, mask, cookie, length = _EVENT_HEADER.unpack_from(
+                data, offset)
+            offset += _EVENT_HEADER.size
+            name = os.fsdecode(
+                data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                logger.warning('inotify event queue overflowed')
+                changed.update(
+                    _find_source_files(self.directory, self._exclude))
+                continue
+            if mask & IN_IGNORED:
+                self._watches.pop(wd, None)
+                continue
+            directory = self._watches.get(wd)
+            if directory is None or not name:
+                continue
+            path = os.path.join(directory, name)
+            if mask & IN_ISDIR:
+                if name.startswith('.') or name in self._exclude:
+                    continue
+                if mask & IN_MOVED_FROM:
+                    self._unwatch_tree(path)
+                elif mask & (IN_CREATE | IN_MOVED_TO):
+                    if is_build_directory(path):
+                        continue
+                    # Directories created or moved into the tree are
+                    # watched along with the directories below them.
+                    self._watch_tree(path)
+                    changed.update(_find_source_files(path, self._exclude))
+            elif _is_source_file(name):
+                changed.add(path)
+        return changed
+
+    def wait(self, timeout=None):
+        """Wait for source files to be created, modified or deleted.
+
+        Returns the set of paths that changed, which is empty if the
+        timeout expired first.
+
+        Parameters
+        ----------
+        timeout : float
+            [Optional] The maximum number of seconds to wait.
+
+        """
+        changed = set()
+        if timeout is not None:
+            deadline = time.monotonic() + timeout
+        while True:
+            if changed:
+                wait_time = self.settle_time
+            elif timeout is not None:
+                wait_time = max(deadline - time.monotonic(), 0)
+            else:
+                wait_time = None
+            readable, _, _ = select.select([self._fd], [], [], wait_time)
+            if readable:
+                changed.update(self._read_events())
+            elif changed or timeout is not None:
+                return changed
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+def create_watcher(directory, exclude=DEFAULT_EXCLUDE, interval=0.5):
+    """Create a watcher for the Python source files below a directory,
+    using ``inotify`` where it is available and polling otherwise.
+
+    Parameters
+    ----------
+    directory : str
+        The directory to watch.
+    exclude : iterable
+        Names of directories not to watch.
+    interval : float
+        The polling interval in seconds, if polling is used.
+
+    """
+    if sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(directory, exclude=exclude)
+        except (OSError, AttributeError):
+            logger.info('inotify unavailable, polling for changes',
+                        exc_info=True)
+    return PollingWatcher(directory, exclude=exclude, interval=interval)